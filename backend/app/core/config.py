@@ -7,6 +7,81 @@ class Settings(BaseSettings):
     SILVER_DB: str = "silver_db"
     GOLD_DB: str = "gold_db"
 
+    # SQL Server connection pool, shared by every module through app.core.database.engine
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_FAST_EXECUTEMANY: bool = True
+    DB_ASYNC_POOL_SIZE: int = 10  # aioodbc pool behind the async read routes
+
+    # The LangChain agent blocks while the LLM thinks, so it runs on its own bounded pool
+    AGENT_MAX_WORKERS: int = 4
+    AGENT_TIMEOUT_SECONDS: float = 300.0
+
+    # /query/ai-sql answer and tool-output caches, cleared on every lineage write
+    AGENT_CACHE_ENABLED: bool = True
+    AGENT_ANSWER_CACHE_SIZE: int = 500
+    AGENT_ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    AGENT_TOOL_CACHE_SIZE: int = 2000
+    AGENT_TOOL_CACHE_TTL_SECONDS: float = 900.0
+
+    # LLM lineage extraction
+    PARSER_FAST_PATH_ENABLED: bool = True
+    PARSE_MAX_WORKERS: int = 0  # 0 = one process per CPU
+    PARSE_CHUNK_SIZE: int = 4
+    PARSE_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_WORKERS: int = 8  # also the cap on LLM calls in flight, chunk calls included
+    LLM_MAX_RETRIES: int = 5
+    LLM_BACKOFF_SECONDS: float = 2.0
+    # Procs whose prompt would exceed this many tokens are extracted in statement chunks
+    LLM_CHUNK_TOKEN_BUDGET: int = 6000
+    LLM_CHUNK_WORKERS: int = 4
+    ANALYZE_SAVE_BATCH_SIZE: int = 20
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 5000
+
+    # INFORMATION_SCHEMA catalog snapshot
+    CATALOG_SNAPSHOT_ENABLED: bool = True
+    CATALOG_TTL_SECONDS: float = 900.0
+    CATALOG_CHECK_SECONDS: float = 60.0
+
+    # Stage -> bronze table matching (app/services/lineage/matching.py)
+    MATCH_STRIP_PREFIXES: list[str] = ["stg_", "stage_", "src_", "raw_", "landing_", "brz_", "bronze_", "dat_", "tbl_"]
+    MATCH_STRIP_SUFFIXES: list[str] = ["_stg", "_stage", "_src", "_raw", "_brz", "_bronze", "_tbl"]
+    MATCH_NAME_WEIGHT: float = 0.6  # the rest of the confidence comes from column-set overlap
+    MATCH_MIN_CONFIDENCE: float = 0.6
+    MATCH_TOP_K: int = 3
+    MATCH_MINHASH_PERMUTATIONS: int = 64
+    MATCH_LSH_BANDS: int = 16
+    MATCH_MAX_BUCKET: int = 50
+    MATCH_COLUMN_MIN_SCORE: float = 0.6  # renamed columns below this score are left unmatched
+
+    # Background jobs (aud.job / aud.job_item)
+    JOB_MAX_WORKERS: int = 2
+    JOB_HEARTBEAT_SECONDS: float = 30.0
+    JOB_STALE_SECONDS: float = 300.0  # a running job with an older heartbeat is resumed at startup
+    JOB_RESUME_ON_STARTUP: bool = True
+
+    # Concurrent stages in run_full_lineage_population
+    PIPELINE_MAX_WORKERS: int = 4
+
+    # Read flat lineage from the materialized aud.flat_* tables once they are built
+    FLAT_LINEAGE_MATERIALIZED: bool = True
+
+    # Versioned Arrow/Parquet lineage snapshots (app/services/lineage/export.py)
+    LINEAGE_EXPORT_DIR: str = "lineage_snapshots"
+    LINEAGE_EXPORT_KEEP: int = 5
+    LINEAGE_EXPORT_PARQUET: bool = True
+    # Serve /flat, /extract/bronze-to-silver and get_column_lineage from the latest snapshot;
+    # the populate pipeline then exports a new one after materializing
+    LINEAGE_READ_FROM_SNAPSHOT: bool = False
+    LINEAGE_SNAPSHOT_CHECK_SECONDS: float = 30.0
+
+    # Impact queries: graph components above this many nodes keep no closure bitsets (n² / 8 bytes)
+    LINEAGE_CLOSURE_MAX_COMPONENT: int = 20000
+
     class Config:
         env_file = ".env"
 
@@ -1,27 +1,152 @@
 # backend/app/core/database.py
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import QueuePool
+from dotenv import load_dotenv
 import os
+import threading
+import time
 
-# You can set this in your .env file and load it with os.getenv
+from app.core.config import settings
+
+# You can set this in your .env file and load it with os.getenv. The URL is built at
+# import time, so .env has to be loaded before it rather than by whichever module
+# happens to call load_dotenv() later.
+# The older SQL_* names are still honoured so every module shares this one engine.
+load_dotenv()
 DATABASE_URL = URL.create(
     "mssql+pyodbc",
-    username=os.getenv("DB_SQL_USER", "sa"),
-    password=os.getenv("DB_SQL_PASSWORD", ""),
-    host=os.getenv("DB_SQL_SERVER", "localhost"),
-    database=os.getenv("DB_SQL_DB", "ai_assistant"),
+    username=os.getenv("DB_SQL_USER", os.getenv("SQL_USER", "sa")),
+    password=os.getenv("DB_SQL_PASSWORD", os.getenv("SQL_PASSWORD", "")),
+    host=os.getenv("DB_SQL_SERVER", os.getenv("SQL_SERVER", "localhost")),
+    database=os.getenv("DB_SQL_DB", os.getenv("SQL_DB", "ai_assistant")),
     query={
         "driver": "ODBC Driver 18 for SQL Server",
         "TrustServerCertificate": "yes",
     },
 )
+
+
+class PoolMetrics:
+    """Checkout counts and time spent waiting for a pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.waits = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+
+    def record_wait(self, elapsed_ms: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_total_ms += elapsed_ms
+            self.wait_max_ms = max(self.wait_max_ms, elapsed_ms)
+            self.timeouts += timed_out
+
+    def count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total_ms / self.waits, 3) if self.waits else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(QueuePool):
+    # Times every checkout, including the wait for a free connection when the pool
+    # and its overflow are exhausted
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            pool_metrics.record_wait((time.perf_counter() - started) * 1000, timed_out)
+
+
 # Create engine and session factory
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=MeteredQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    fast_executemany=settings.DB_FAST_EXECUTEMANY,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+event.listen(engine, "connect", lambda *args: pool_metrics.count("connects"))
+event.listen(engine, "checkout", lambda *args: pool_metrics.count("checkouts"))
+event.listen(engine, "checkin", lambda *args: pool_metrics.count("checkins"))
+event.listen(engine, "invalidate", lambda *args: pool_metrics.count("invalidations"))
+
+
+def get_pool_status() -> dict:
+    """Current pool occupancy plus cumulative checkout/wait metrics."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        **pool_metrics.snapshot(),
+    }
+
+
+# Async engine for read-only routes, so they don't hold a worker thread while SQL Server
+# works. Created on first use; needs the aioodbc driver.
+ASYNC_DATABASE_URL = DATABASE_URL.set(drivername="mssql+aioodbc")
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+_async_engine = None
+_async_engine_lock = threading.Lock()
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        with _async_engine_lock:
+            if _async_engine is None:
+                _async_engine = create_async_engine(
+                    ASYNC_DATABASE_URL,
+                    pool_size=settings.DB_ASYNC_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                    pool_timeout=settings.DB_POOL_TIMEOUT,
+                    pool_recycle=settings.DB_POOL_RECYCLE,
+                    pool_pre_ping=settings.DB_POOL_PRE_PING,
+                )
+    return _async_engine
+
+
 # Base class for models
 Base = declarative_base()
 
@@ -31,4 +156,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async counterpart of get_db for read-only routes
+async def get_async_db():
+    db: AsyncSession = AsyncSessionLocal(bind=get_async_engine())
+    try:
+        yield db
+    finally:
+        await db.close()
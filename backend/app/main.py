@@ -1,8 +1,26 @@
+from contextlib import asynccontextmanager
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import settings
+from app.services.lineage.jobs import get_job_runner
 from app.services.lineage.routes import router as lineage_router
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up jobs left queued or running by a previous process
+    if settings.JOB_RESUME_ON_STARTUP:
+        try:
+            resumed = get_job_runner().resume_abandoned()
+            if resumed:
+                logging.info(f"Resumed {len(resumed)} background jobs")
+        except Exception as ex:
+            logging.error(f"Could not resume background jobs: {ex}")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow frontend to call backend locally
 app.add_middleware(
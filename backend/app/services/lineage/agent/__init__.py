@@ -1 +1 @@
-from .agent import run_agent_query
\ No newline at end of file
+from .agent import run_agent_query, run_agent_query_async
\ No newline at end of file
@@ -1,33 +1,96 @@
+from app.services.lineage.agent_cache import get_cached_answer, put_cached_answer, request_memo
+from app.core.config import settings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
 
+# LangChain, the OpenAI client and the tools are only loaded on the first agent request,
+# so app startup doesn't pay for them and doesn't need the Azure settings.
+agent_executor = None
+_agent_lock = threading.Lock()
+
+# What LangChain answers when early_stopping_method="force" cuts a run short
+STOPPED_ANSWER = "Agent stopped due to iteration limit or time limit."
+
+
+def get_llm():
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
+        azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT", "model-router"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+        temperature=0,
+        max_tokens=2048,
+        streaming=True,  # lets /query/ai-sql/stream forward answer tokens as they arrive
+    )
 
-from langchain.agents import initialize_agent, AgentType
-from langchain_openai import AzureChatOpenAI
-from app.services.lineage.agent.tools import tools, AGENT_SYSTEM_MESSAGE
-import os
 
-# tools are imported from tools.py
+def get_agent_executor():
+    """The LangChain agent, built on first use and shared by every request after that."""
+    global agent_executor
+    if agent_executor is None:
+        with _agent_lock:
+            if agent_executor is None:
+                from langchain.agents import initialize_agent, AgentType
+                from app.services.lineage.agent.tools import tools, AGENT_SYSTEM_MESSAGE
 
-# Initialize the LangChain agent
-llm = AzureChatOpenAI(
-    azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT", "model-router"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
-    temperature=0,
-    max_tokens=2048,
-)
+                agent_executor = initialize_agent(
+                    tools,
+                    get_llm(),
+                    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+                    verbose=True,
+                    agent_kwargs={"system_message": AGENT_SYSTEM_MESSAGE},
+                    handle_parsing_errors=True,
+                    # Backstop for runs nobody is waiting on any more
+                    max_execution_time=settings.AGENT_TIMEOUT_SECONDS,
+                    early_stopping_method="force",
+                )
+    return agent_executor
 
-agent_executor = initialize_agent(
-    tools,
-    llm,
-    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-    verbose=True,
-    agent_kwargs={"system_message": AGENT_SYSTEM_MESSAGE},
-    handle_parsing_errors=True
-)
+
+def _run_agent(question: str, callbacks: list = None):
+    # Tool calls repeated within this reasoning chain are answered from the request memo
+    with request_memo():
+        answer = get_agent_executor().run(question, callbacks=callbacks)
+    response = {"answer": answer}
+    # A run stopped by the time or iteration limit has no answer worth reusing
+    if answer != STOPPED_ANSWER:
+        put_cached_answer(question, response)
+    return response
 
 
 # Utility function to run agent query
 def run_agent_query(question: str):
-    answer = agent_executor.run(question)
-    return {"answer": answer}
\ No newline at end of file
+    cached = get_cached_answer(question)
+    if cached is not None:
+        return cached
+    return _run_agent(question)
+
+
+# Agent runs are blocking (LLM round trips plus tool SQL), so async routes hand them to
+# this pool instead of running them on the event loop. Extra requests queue here
+# rather than tying up FastAPI's shared threadpool.
+_agent_executor = ThreadPoolExecutor(max_workers=settings.AGENT_MAX_WORKERS, thread_name_prefix="agent")
+
+
+async def run_agent_query_async(question: str):
+    """
+    run_agent_query on the agent pool; raises asyncio.TimeoutError after AGENT_TIMEOUT_SECONDS.
+    A timed out (or abandoned) run is stopped at its next callback so it gives its worker back.
+    """
+    from app.services.lineage.agent.streaming import AgentEventHandler
+
+    # Repeated questions don't need to wait for a free agent worker
+    cached = get_cached_answer(question)
+    if cached is not None:
+        return cached
+    loop = asyncio.get_running_loop()
+    handler = AgentEventHandler(lambda event: None)
+    future = loop.run_in_executor(_agent_executor, _run_agent, question, [handler])
+    try:
+        return await asyncio.wait_for(future, timeout=settings.AGENT_TIMEOUT_SECONDS)
+    finally:
+        handler.cancelled = True
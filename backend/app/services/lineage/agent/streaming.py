@@ -0,0 +1,139 @@
+# backend/app/services/lineage/agent/streaming.py
+#
+# Progressive output for /query/ai-sql/stream. A LangChain callback handler turns the
+# ReAct loop into events (tool calls, tool result summaries, final-answer tokens) and
+# hands them from the agent worker thread to the event loop, which streams them as
+# NDJSON or server-sent events while the agent is still thinking.
+import asyncio
+import json
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.core.config import settings
+from app.services.lineage.agent import agent as agent_module
+from app.services.lineage.agent_cache import get_cached_answer
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+TOOL_SUMMARY_CHARS = 500
+
+
+class AgentCancelled(Exception):
+    pass
+
+
+class AgentEventHandler(BaseCallbackHandler):
+    """Forwards agent progress to emit(event); raising from a callback aborts the run."""
+
+    raise_error = True
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.cancelled = False
+        self._text = ""
+        self._answer_started = False
+        self._answer_emitted = False
+        self._tools = {}  # run_id -> tool name
+
+    def _check(self):
+        if self.cancelled:
+            raise AgentCancelled()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._check()
+        self._text = ""
+        self._answer_started = False
+        self._answer_emitted = False
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.on_llm_start(serialized, [], **kwargs)
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self._check()
+        # Only the text after "Final Answer:" is the answer; the rest is ReAct scaffolding
+        if not self._answer_started:
+            self._text += token
+            marker = self._text.find(FINAL_ANSWER_MARKER)
+            if marker < 0:
+                return
+            self._answer_started = True
+            token = self._text[marker + len(FINAL_ANSWER_MARKER):]
+        if not self._answer_emitted:
+            # Drop the whitespace between the marker and the answer
+            token = token.lstrip()
+            self._answer_emitted = bool(token)
+        if token:
+            self.emit({"event": "token", "text": token})
+
+    def on_agent_action(self, action, **kwargs):
+        self._check()
+        thought = action.log.split("Action:")[0].strip() if action.log else ""
+        self.emit({"event": "tool_start", "tool": action.tool, "input": action.tool_input, "thought": thought})
+
+    def on_tool_start(self, serialized, input_str, run_id=None, **kwargs):
+        self._tools[run_id] = (serialized or {}).get("name") or kwargs.get("name")
+
+    def on_tool_end(self, output, run_id=None, **kwargs):
+        output = output if isinstance(output, str) else str(getattr(output, "content", output))
+        self.emit({
+            "event": "tool_end",
+            "tool": self._tools.pop(run_id, None),
+            "summary": output[:TOOL_SUMMARY_CHARS],
+            "length": len(output),
+        })
+        self._check()
+
+    def on_tool_error(self, error, run_id=None, **kwargs):
+        self.emit({"event": "tool_error", "tool": self._tools.pop(run_id, None), "detail": str(error)})
+
+
+async def stream_agent_events(question: str):
+    """
+    Async generator of agent events for one question: start, then tool_start/tool_end
+    and token events as they happen, then final (or error). If the consumer goes away
+    the agent is stopped at its next callback.
+    """
+    started = time.perf_counter()
+    yield {"event": "start", "question": question}
+
+    cached = get_cached_answer(question)
+    if cached is not None:
+        yield {"event": "final", "cached": True, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1), **cached}
+        return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    handler = AgentEventHandler(lambda event: loop.call_soon_threadsafe(queue.put_nowait, event))
+    future = loop.run_in_executor(agent_module._agent_executor, agent_module._run_agent, question, [handler])
+
+    def finished(done):
+        # Completion is signalled through the same loop, so it arrives after every event.
+        # Touching the exception keeps an abandoned run from logging "never retrieved".
+        if not done.cancelled():
+            done.exception()
+        queue.put_nowait(None)
+
+    future.add_done_callback(finished)
+    deadline = loop.time() + settings.AGENT_TIMEOUT_SECONDS
+    try:
+        while True:
+            event = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+            if event is None:
+                break
+            yield event
+        response = future.result()
+        yield {"event": "final", "cached": False, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1), **response}
+    except asyncio.TimeoutError:
+        yield {"event": "error", "detail": "Agent query timed out"}
+    except Exception as ex:
+        yield {"event": "error", "detail": str(ex)}
+    finally:
+        handler.cancelled = True
+
+
+def to_ndjson(event: dict) -> str:
+    return json.dumps(event, default=str) + "\n"
+
+
+def to_sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -1,9 +1,14 @@
 from langchain_core.tools import tool
 from langchain_core.tools import Tool
-import os
 from sqlmodel import Session
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from app.core.database import engine
+from app.services.lineage.agent_cache import memoize_tool
+from app.services.lineage.catalog import lookup_table_metadata
+from app.services.lineage.export import read_snapshot
+from app.services.lineage.materialize import flat_column_relation, flat_table_relation
+from app.services.lineage.metadata import format_column_info, format_table_info
+from app.services.lineage.search_index import get_search_index
 from pydantic import BaseModel
 
 class TableArgs(BaseModel):
@@ -31,221 +36,179 @@ Use the following strategies when responding to user questions:
 Prioritize using these tools before forming your answer. Do not rely on assumptions when metadata or lineage can be queried directly.
 '''
 
+# Ranked (schema, table) name variants from the in-memory name index
+def find_table_variants(session, keyword: str, limit: int = 50) -> list[tuple]:
+    matches = get_search_index(session).search(keyword, kinds=("table",), limit=limit)
+    variants = []
+    for match in matches:
+        pair = (match["schema"].lower(), match["table"].lower())
+        if pair not in variants:
+            variants.append(pair)
+    return variants
+
 # Tool to resolve table name variants across layers
 @tool
+@memoize_tool
 def resolve_table_variants(keyword: str) -> str:
     """
-    Given a keyword, searches vw_flat_table_lineage for related table names across layers.
-    Returns a deduplicated list of actual table names that match the keyword.
+    Given a keyword, searches every layer for related table names, ignoring prefixes like stage_/dat_/dim_/fact_.
+    Returns a deduplicated list of actual table names that match the keyword, best match first.
     """
     with Session(engine) as session:
-        query = text("""
-            SELECT DISTINCT LOWER(stage_schema) as schema_name, LOWER(stage_table) as table_name FROM aud.vw_flat_table_lineage WHERE LOWER(stage_table) LIKE :kw
-            UNION
-            SELECT DISTINCT LOWER(bronze_schema), LOWER(bronze_table) FROM aud.vw_flat_table_lineage WHERE LOWER(bronze_table) LIKE :kw
-            UNION
-            SELECT DISTINCT LOWER(silver_schema), LOWER(silver_table) FROM aud.vw_flat_table_lineage WHERE LOWER(silver_table) LIKE :kw
-            UNION
-            SELECT DISTINCT LOWER(gold_schema), LOWER(gold_table) FROM aud.vw_flat_table_lineage WHERE LOWER(gold_table) LIKE :kw
-        """)
-        result = session.execute(query, {"kw": f"%{keyword.lower()}%"}).fetchall()
-        if not result:
+        variants = find_table_variants(session, keyword)
+        if not variants:
             return f"No table name variants found for keyword: {keyword}"
-        return "\n".join(sorted(set(f"{row[0]}.{row[1]}" for row in result if row[0] and row[1])))
+        return "\n".join(f"{schema_name}.{table_name}" for schema_name, table_name in variants)
 
 @tool
+@memoize_tool
 def get_info_for_table_variants(keyword: str) -> str:
     """
-    Resolves table name variants using lineage view, then retrieves table metadata for each match (now includes schema name).
+    Resolves table name variants across layers, then retrieves table metadata for each match (now includes schema name).
     """
     with Session(engine) as session:
-        variant_query = text("""
-            SELECT DISTINCT LOWER(stage_schema) as schema_name, LOWER(stage_table) as table_name FROM aud.vw_flat_table_lineage WHERE LOWER(stage_table) LIKE :kw
-            UNION
-            SELECT DISTINCT LOWER(bronze_schema), LOWER(bronze_table) FROM aud.vw_flat_table_lineage WHERE LOWER(bronze_table) LIKE :kw
-            UNION
-            SELECT DISTINCT LOWER(silver_schema), LOWER(silver_table) FROM aud.vw_flat_table_lineage WHERE LOWER(silver_table) LIKE :kw
-            UNION
-            SELECT DISTINCT LOWER(gold_schema), LOWER(gold_table) FROM aud.vw_flat_table_lineage WHERE LOWER(gold_table) LIKE :kw
-        """)
-        results = session.execute(variant_query, {"kw": f"%{keyword.lower()}%"}).fetchall()
-        # set of (table_name, schema_name) pairs, skip any where table_name is None/empty
-        table_schema_pairs = sorted(set(
-            (row[1], row[0]) for row in results if row[1] and row[0]
-        ))
+        # (table_name, schema_name) pairs, best match first
+        table_schema_pairs = [(table_name, schema_name) for schema_name, table_name in find_table_variants(session, keyword)]
 
         if not table_schema_pairs:
             return f"No table name variants found for keyword: {keyword}"
 
+        # One metadata lookup for every variant and layer
+        metadata = lookup_table_metadata(
+            session, [(schema_name, table_name) for table_name, schema_name in table_schema_pairs], include_columns=False
+        )
+
         combined_info = []
         for table_name, schema_name in table_schema_pairs:
-            info = get_table_info_all_layers(table_name, schema_name)
-            combined_info.append(f"== {schema_name}.{table_name.upper()} ==\n{info}")
+            matches = {
+                layer: [t for t in tables if t["table_schema"].lower() == schema_name and t["table_name"].lower() == table_name]
+                for layer, tables in metadata.items()
+            }
+            combined_info.append(f"== {schema_name}.{table_name.upper()} ==\n{format_table_info(matches)}")
         return "\n\n".join(combined_info)
 
 @tool
+@memoize_tool
 def get_column_lineage(column_name: str) -> str:
     """Returns a verbose breakdown of the lineage path for a given column, including stage, bronze, silver, and gold layers."""
-    with Session(engine) as session:
-        query = text("""
-            SELECT
-                stage_db, stage_schema, stage_table, stage_column,
-                bronze_db, bronze_schema, bronze_table, bronze_column,
-                silver_db, silver_schema, silver_table, silver_column, silver_transform_expr,
-                gold_db, gold_schema, gold_table, gold_column, gold_transform_expr
-            FROM aud.vw_flat_column_lineage
-            WHERE
-                LOWER(stage_column) = LOWER(:column) OR
-                LOWER(bronze_column) = LOWER(:column) OR
-                LOWER(silver_column) = LOWER(:column) OR
-                LOWER(gold_column) = LOWER(:column)
-        """)
-        result = session.execute(query, {"column": column_name}).fetchall()
-
-        if not result:
-            return f"No lineage found for column '{column_name}'"
-
-        lines = []
-        for row in result:
-            lines.append(f"""
+    snapshot = read_snapshot()
+    if snapshot is not None:
+        result = snapshot.column_lineage(column_name)
+    else:
+        with Session(engine) as session:
+            query = text(f"""
+                SELECT
+                    stage_db, stage_schema, stage_table, stage_column,
+                    bronze_db, bronze_schema, bronze_table, bronze_column,
+                    silver_db, silver_schema, silver_table, silver_column, silver_transform_expr,
+                    gold_db, gold_schema, gold_table, gold_column, gold_transform_expr
+                FROM {flat_column_relation(session)}
+                WHERE
+                    LOWER(stage_column) = LOWER(:column) OR
+                    LOWER(bronze_column) = LOWER(:column) OR
+                    LOWER(silver_column) = LOWER(:column) OR
+                    LOWER(gold_column) = LOWER(:column)
+            """)
+            result = session.execute(query, {"column": column_name}).mappings().all()
+
+    if not result:
+        return f"No lineage found for column '{column_name}'"
+
+    lines = []
+    for row in result:
+        lines.append(f"""
 ───── {column_name} LINEAGE ─────
-Stage:  {row.stage_db}.{row.stage_schema}.{row.stage_table}.{row.stage_column}
-Bronze: {row.bronze_db}.{row.bronze_schema}.{row.bronze_table}.{row.bronze_column}
-Silver: {row.silver_db}.{row.silver_schema}.{row.silver_table}.{row.silver_column}
-  ↳ Transform: {row.silver_transform_expr}
-Gold:   {row.gold_db}.{row.gold_schema}.{row.gold_table}.{row.gold_column}
-  ↳ Transform: {row.gold_transform_expr}
-            """.strip())
+Stage:  {row['stage_db']}.{row['stage_schema']}.{row['stage_table']}.{row['stage_column']}
+Bronze: {row['bronze_db']}.{row['bronze_schema']}.{row['bronze_table']}.{row['bronze_column']}
+Silver: {row['silver_db']}.{row['silver_schema']}.{row['silver_table']}.{row['silver_column']}
+  ↳ Transform: {row['silver_transform_expr']}
+Gold:   {row['gold_db']}.{row['gold_schema']}.{row['gold_table']}.{row['gold_column']}
+  ↳ Transform: {row['gold_transform_expr']}
+        """.strip())
 
-        return "\n\n".join(lines)
+    return "\n\n".join(lines)
 
 
-# Helper function to run SQL query and return formatted result
-def run_sql_query(query: str) -> str:
+# Table/column metadata helpers, served from the catalog snapshot
+@memoize_tool
+def get_table_info(table_name: str, schema_name: str = 'dbo', layers=None) -> str:
     with Session(engine) as session:
-        result = session.execute(text(query)).fetchall()
-        if not result:
-            return "No results found."
-        return "\n".join([str(dict(row._mapping)) for row in result])
-
+        metadata = lookup_table_metadata(session, [(schema_name, table_name)], layers, include_columns=False)
+    return format_table_info(metadata)
 
-def get_column_info_stage(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('STAGE_DB')}.INFORMATION_SCHEMA.COLUMNS "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
-
-def get_column_info_bronze(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('BRONZE_DB')}.INFORMATION_SCHEMA.COLUMNS "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
-
-def get_column_info_silver(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('SILVER_DB')}.INFORMATION_SCHEMA.COLUMNS "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
-
-def get_column_info_gold(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('GOLD_DB')}.INFORMATION_SCHEMA.COLUMNS "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
-
-
-# Table info functions
-def get_table_info_stage(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('STAGE_DB')}.INFORMATION_SCHEMA.TABLES "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
-
-def get_table_info_bronze(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('BRONZE_DB')}.INFORMATION_SCHEMA.TABLES "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
-
-def get_table_info_silver(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('SILVER_DB')}.INFORMATION_SCHEMA.TABLES "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
-
-def get_table_info_gold(table_name: str, schema_name: str = 'dbo') -> str:
-    return run_sql_query(
-        f"SELECT * FROM {os.getenv('GOLD_DB')}.INFORMATION_SCHEMA.TABLES "
-        f"WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    )
+@memoize_tool
+def get_column_info(table_name: str, schema_name: str = 'dbo', layers=None) -> str:
+    with Session(engine) as session:
+        metadata = lookup_table_metadata(session, [(schema_name, table_name)], layers)
+    return format_column_info(metadata)
 
 def get_table_info_all_layers(table_name: str, schema_name: str = 'dbo') -> str:
-    queries = [
-        f"SELECT 'stage' AS layer, * FROM {os.getenv('STAGE_DB')}.INFORMATION_SCHEMA.TABLES WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')",
-        f"SELECT 'bronze' AS layer, * FROM {os.getenv('BRONZE_DB')}.INFORMATION_SCHEMA.TABLES WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')",
-        f"SELECT 'silver' AS layer, * FROM {os.getenv('SILVER_DB')}.INFORMATION_SCHEMA.TABLES WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')",
-        f"SELECT 'gold' AS layer, * FROM {os.getenv('GOLD_DB')}.INFORMATION_SCHEMA.TABLES WHERE LOWER(TABLE_NAME) = LOWER('{table_name}') AND LOWER(TABLE_SCHEMA) = LOWER('{schema_name}')"
-    ]
-    combined_results = []
-    with Session(engine) as session:
-        for query in queries:
-            result = session.execute(text(query)).fetchall()
-            if result:
-                for row in result:
-                    combined_results.append(str(dict(row._mapping)))
-    if not combined_results:
-        return "No results found."
-    return "\n".join(combined_results)
+    return get_table_info(table_name, schema_name)
+
+
+# Exact names for a keyword from the name index, so the lineage views are filtered with
+# equality IN lists instead of LOWER(...) LIKE '%kw%' scans
+def find_matching_names(session, keyword: str, kinds=("table", "column"), limit: int = 200) -> dict:
+    return get_search_index(session).matching_names(keyword, kinds=kinds, limit=limit)
 
 
 @tool
+@memoize_tool
 def search_lineage_view(keyword: str) -> str:
     """
     Search the vw_flat_column_lineage view for any table or column names that match the given keyword.
     Helps determine which layer(s) a table or column appears in.
     """
     with Session(engine) as session:
+        names = find_matching_names(session, keyword)
+        if not names["table"] and not names["column"]:
+            return f"No matches found in vw_flat_column_lineage for keyword: {keyword}"
+        # Empty IN lists are not valid T-SQL; '' never matches a real name
         query = text(f"""
             SELECT
                 stage_db, stage_schema, stage_table, stage_column,
                 bronze_db, bronze_schema, bronze_table, bronze_column,
                 silver_db, silver_schema, silver_table, silver_column,
                 gold_db, gold_schema, gold_table, gold_column
-            FROM aud.vw_flat_column_lineage
+            FROM {flat_column_relation(session)}
             WHERE
-                LOWER(stage_table) LIKE :kw OR LOWER(stage_column) LIKE :kw OR
-                LOWER(bronze_table) LIKE :kw OR LOWER(bronze_column) LIKE :kw OR
-                LOWER(silver_table) LIKE :kw OR LOWER(silver_column) LIKE :kw OR
-                LOWER(gold_table) LIKE :kw OR LOWER(gold_column) LIKE :kw
-        """)
-        result = session.execute(query, {"kw": f"%{keyword.lower()}%"}).fetchall()
+                stage_table IN :tables OR stage_column IN :columns OR
+                bronze_table IN :tables OR bronze_column IN :columns OR
+                silver_table IN :tables OR silver_column IN :columns OR
+                gold_table IN :tables OR gold_column IN :columns
+        """).bindparams(bindparam("tables", expanding=True), bindparam("columns", expanding=True))
+        result = session.execute(query, {"tables": names["table"] or [""], "columns": names["column"] or [""]}).fetchall()
         if not result:
             return f"No matches found in vw_flat_column_lineage for keyword: {keyword}"
-        return "\n".join([str(dict(row)) for row in result])
+        return "\n".join([str(dict(row._mapping)) for row in result])
 
 
 @tool
+@memoize_tool
 def search_table_lineage_view(keyword: str) -> str:
     """
     Search the vw_flat_table_lineage view for any table names that match the given keyword.
     Helps determine which layer(s) a table appears in.
     """
     with Session(engine) as session:
-        query = text("""
+        tables = find_matching_names(session, keyword, kinds=("table",))["table"]
+        if not tables:
+            return f"No matches found in vw_flat_table_lineage for keyword: {keyword}"
+        query = text(f"""
             SELECT
                 stage_db, stage_schema, stage_table,
                 bronze_db, bronze_schema, bronze_table,
                 silver_db, silver_schema, silver_table,
                 gold_db, gold_schema, gold_table,
                 lineage_id
-            FROM aud.vw_flat_table_lineage
+            FROM {flat_table_relation(session)}
             WHERE
-                LOWER(stage_table) LIKE :kw OR
-                LOWER(bronze_table) LIKE :kw OR
-                LOWER(silver_table) LIKE :kw OR
-                LOWER(gold_table) LIKE :kw
-        """)
-        result = session.execute(query, {"kw": f"%{keyword.lower()}%"}).fetchall()
+                stage_table IN :tables OR
+                bronze_table IN :tables OR
+                silver_table IN :tables OR
+                gold_table IN :tables
+        """).bindparams(bindparam("tables", expanding=True))
+        result = session.execute(query, {"tables": tables}).fetchall()
         if not result:
             return f"No matches found in vw_flat_table_lineage for keyword: {keyword}"
         return "\n".join([str(dict(row._mapping)) for row in result])
@@ -255,49 +218,49 @@ def search_table_lineage_view(keyword: str) -> str:
 def get_column_info_stage_single(table: str) -> str:
     """Get column metadata for a STAGE table. Provide input as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_column_info_stage(table_name.strip(), schema_name.strip())
+    return get_column_info(table_name.strip(), schema_name.strip(), ['stage'])
 
 @tool
 def get_column_info_bronze_single(table: str) -> str:
     """Get column metadata for a BRONZE table. Provide input as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_column_info_bronze(table_name.strip(), schema_name.strip())
+    return get_column_info(table_name.strip(), schema_name.strip(), ['bronze'])
 
 @tool
 def get_column_info_silver_single(table: str) -> str:
     """Get column metadata for a SILVER table. Provide input as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_column_info_silver(table_name.strip(), schema_name.strip())
+    return get_column_info(table_name.strip(), schema_name.strip(), ['silver'])
 
 @tool
 def get_column_info_gold_single(table: str) -> str:
     """Get column metadata for a GOLD table. Provide input as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_column_info_gold(table_name.strip(), schema_name.strip())
+    return get_column_info(table_name.strip(), schema_name.strip(), ['gold'])
 
 @tool
 def get_table_info_stage_single(table: str) -> str:
     """Get table metadata for a STAGE table. Provide input as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_table_info_stage(table_name.strip(), schema_name.strip())
+    return get_table_info(table_name.strip(), schema_name.strip(), ['stage'])
 
 @tool
 def get_table_info_bronze_single(table: str) -> str:
     """Get table metadata for a BRONZE table. Provide input as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_table_info_bronze(table_name.strip(), schema_name.strip())
+    return get_table_info(table_name.strip(), schema_name.strip(), ['bronze'])
 
 @tool
 def get_table_info_silver_single(table: str) -> str:
     """Get table metadata for a SILVER table. Provide input as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_table_info_silver(table_name.strip(), schema_name.strip())
+    return get_table_info(table_name.strip(), schema_name.strip(), ['silver'])
 
 @tool
 def get_table_info_gold_single(table: str) -> str:
     """Get metadata for a single GOLD layer table, specified as 'table_name;schema_name'."""
     table_name, schema_name = (table.split(";") + ['dbo'])[:2]
-    return get_table_info_gold(table_name.strip(), schema_name.strip())
+    return get_table_info(table_name.strip(), schema_name.strip(), ['gold'])
 
 
 # List of tools to register with the agent
@@ -0,0 +1,168 @@
+# backend/app/services/lineage/agent_cache.py
+#
+# Caching for /query/ai-sql at two levels:
+#   - a per-request memo (a contextvar set around one agent run), so a reasoning chain
+#     that calls the same tool with the same input twice only runs it once;
+#   - process-wide LRU caches with a TTL for normalized question -> answer and
+#     (tool, input) -> output, shared across requests.
+# Both process-wide caches are cleared whenever lineage is written.
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import threading
+import time
+
+from app.core.config import settings
+from app.services.lineage.events import on_lineage_change
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ttl_seconds after being stored."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """The cached value, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+answer_cache = TTLCache(settings.AGENT_ANSWER_CACHE_SIZE, settings.AGENT_ANSWER_CACHE_TTL_SECONDS)
+tool_cache = TTLCache(settings.AGENT_TOOL_CACHE_SIZE, settings.AGENT_TOOL_CACHE_TTL_SECONDS)
+
+_request_memo = ContextVar("agent_request_memo", default=None)
+_memo_lock = threading.Lock()
+_memo_hits = 0
+_memo_misses = 0
+
+
+def normalize_text(value) -> str:
+    """Case- and whitespace-insensitive cache key; trailing punctuation on questions is ignored."""
+    return " ".join(str(value).split()).lower().rstrip("?.! ")
+
+
+@contextmanager
+def request_memo():
+    """Memoize tool calls made by the current agent run (the current thread or task)."""
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+def _count_memo(hit: bool):
+    global _memo_hits, _memo_misses
+    with _memo_lock:
+        if hit:
+            _memo_hits += 1
+        else:
+            _memo_misses += 1
+
+
+def memoize_tool(func):
+    """
+    Cache a tool function's string output per request and across requests, keyed on
+    the tool name and its normalized arguments. Apply below @tool so LangChain still
+    sees the original signature and docstring.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.AGENT_CACHE_ENABLED:
+            return func(*args, **kwargs)
+        key = (func.__name__,) + tuple(normalize_text(a) for a in args) + tuple(
+            (name, normalize_text(value)) for name, value in sorted(kwargs.items())
+        )
+        memo = _request_memo.get()
+        if memo is not None:
+            if key in memo:
+                _count_memo(True)
+                return memo[key]
+            _count_memo(False)
+        output = tool_cache.get(key)
+        if output is None:
+            output = func(*args, **kwargs)
+            tool_cache.put(key, output)
+        if memo is not None:
+            memo[key] = output
+        return output
+    return wrapper
+
+
+def get_cached_answer(question: str):
+    if not settings.AGENT_CACHE_ENABLED:
+        return None
+    return answer_cache.get(normalize_text(question))
+
+
+def put_cached_answer(question: str, answer: dict):
+    if settings.AGENT_CACHE_ENABLED:
+        answer_cache.put(normalize_text(question), answer)
+
+
+def clear_agent_cache():
+    answer_cache.clear()
+    tool_cache.clear()
+
+
+def agent_cache_stats() -> dict:
+    with _memo_lock:
+        lookups = _memo_hits + _memo_misses
+        memo = {
+            "hits": _memo_hits,
+            "misses": _memo_misses,
+            "hit_rate": round(_memo_hits / lookups, 3) if lookups else 0.0,
+        }
+    return {
+        "enabled": settings.AGENT_CACHE_ENABLED,
+        "answers": answer_cache.stats(),
+        "tools": tool_cache.stats(),
+        "request_memo": memo,
+    }
+
+
+@on_lineage_change
+def _clear_on_lineage_change(db, table_map_ids):
+    # Any answer may rest on the lineage that just changed
+    clear_agent_cache()
@@ -0,0 +1,357 @@
+# backend/app/services/lineage/analyze.py
+#
+# LLM lineage extraction for stored procedures, plus a bounded-concurrency pipeline
+# that analyzes many procs in parallel while the caller batches the DB writes.
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import traceback
+
+from app.core.config import settings
+from app.services.lineage.chunking import chunk_procedure, chunk_text, estimate_tokens, merge_chunk_mappings, procedure_header
+
+LINEAGE_PROMPT = """
+You are an expert at SQL Server ETL lineage extraction.
+Given this stored procedure, extract a JSON array of all column-level mappings in the format:
+
+[
+  {{
+    "source_db": "...",
+    "source_schema": "...",
+    "source_table": "...",
+    "source_column": "...",
+    "target_db": "...",
+    "target_schema": "...",
+    "target_table": "...",
+    "target_column": "...",
+    "transform_expr": ""
+  }}
+]
+
+If a mapping does not use a transform, leave transform_expr blank.
+
+- `source_db` is the database the source table is read from (e.g. "wh_bronze").
+- `source_schema` is the schema of the source table.
+- `source_table` is the table name in the FROM clause.
+- `source_column` is the original column.
+- `target_db` is the database the procedure writes into (use the database context or variable if present; otherwise, infer based on naming).
+- `target_schema` and `target_table` are the schema and table being inserted into.
+- `target_column` is the destination column.
+- `transform_expr` is any transformation expression applied to the column (otherwise blank).
+
+Return ONLY the JSON array. Do not explain.
+
+Procedure:
+---
+{proc_code}
+---
+"""
+
+# Part of the extraction cache key: editing the prompt invalidates cached results
+PROMPT_VERSION = hashlib.sha256(LINEAGE_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
+def get_model_deployment() -> str:
+    return os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o")
+
+
+@lru_cache()
+def get_llm():
+    """
+    Shared Azure OpenAI client for lineage extraction. The client is thread-safe,
+    so one instance serves every worker in the pipeline.
+    """
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
+        azure_deployment=get_model_deployment(),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+        temperature=0,
+        max_tokens=2048,
+        # Retries are handled by invoke_with_backoff so workers can back off together
+        max_retries=0,
+    )
+
+
+def _is_rate_limit(ex: Exception) -> bool:
+    return (
+        "RateLimit" in type(ex).__name__
+        or getattr(ex, "status_code", None) == 429
+        or "429" in str(ex)
+    )
+
+
+def _retry_after(ex: Exception):
+    response = getattr(ex, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# Every LLM call goes through invoke_with_backoff, so this caps calls in flight across
+# proc workers and their chunk workers alike
+_llm_slots = threading.BoundedSemaphore(settings.LLM_MAX_WORKERS)
+
+
+def invoke_with_backoff(llm, prompt: str):
+    """
+    Call llm.invoke, retrying rate-limit errors with exponential backoff and jitter.
+    A Retry-After header from the service takes precedence over the computed delay.
+    At most LLM_MAX_WORKERS calls run at once; a call backing off gives up its slot.
+    """
+    attempt = 0
+    while True:
+        try:
+            with _llm_slots:
+                return llm.invoke(prompt)
+        except Exception as ex:
+            if not _is_rate_limit(ex) or attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            delay = _retry_after(ex)
+            if delay is None:
+                delay = settings.LLM_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+            logging.warning(f"LLM rate limited, retrying in {delay:.1f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+            attempt += 1
+
+
+def parse_mappings_response(ai_text: str):
+    """
+    Pull the JSON array of mappings out of a raw LLM response.
+    Returns a tuple (mappings, error).
+    """
+    # Remove triple backticks, language identifiers, and whitespace
+    ai_text_clean = re.sub(r"^```(?:json)?|```$", "", ai_text.strip(), flags=re.MULTILINE).strip()
+    # Try to find the JSON array
+    match = re.search(r'\[[\s\S]*\]', ai_text_clean)
+    if not match:
+        logging.error(f"LLM lineage extraction failed. Raw response:\n{ai_text}")
+        return None, "Could not find a JSON array in LLM output"
+    json_str = match.group(0)
+    try:
+        mappings = json.loads(json_str)
+    except Exception as ex:
+        logging.error(f"Failed to parse LLM JSON: {ex}\nRaw string: {json_str}")
+        return None, f"Failed to parse mappings JSON: {str(ex)}"
+    if not all(isinstance(m, dict) for m in mappings):
+        logging.error(f"LLM mappings are not all JSON objects. Raw string: {json_str}")
+        return None, "Mappings JSON must be an array of objects"
+    return mappings, None
+
+
+def _extract_from_prompt(proc_code: str, llm):
+    result = invoke_with_backoff(llm, LINEAGE_PROMPT.format(proc_code=proc_code))
+    ai_text = getattr(result, "content", None) or str(result)
+    return parse_mappings_response(ai_text)
+
+
+def _extract_chunk(header: str, statements: list[str], llm):
+    """
+    Extract one chunk. If the response can't be parsed (typically JSON cut off at
+    max_tokens because the chunk has too many columns) the chunk is halved and retried.
+    """
+    mappings, error = _extract_from_prompt(chunk_text(header, statements), llm)
+    if mappings is not None or len(statements) < 2:
+        return mappings, error
+    middle = len(statements) // 2
+    first, error = _extract_chunk(header, statements[:middle], llm)
+    if first is None:
+        return None, error
+    second, error = _extract_chunk(header, statements[middle:], llm)
+    if second is None:
+        return None, error
+    return first + second, None
+
+
+def extract_column_mappings_chunked(proc_definition: str, llm, token_budget: int = None):
+    """
+    Extract a large procedure chunk by chunk, in parallel, and merge the results.
+    token_budget bounds each chunk's statements (default LLM_CHUNK_TOKEN_BUDGET less the
+    prompt itself). Returns (mappings, error); any chunk failing fails the whole
+    procedure, so partial lineage is never saved (or cached) as if it were complete.
+    """
+    token_budget = token_budget or settings.LLM_CHUNK_TOKEN_BUDGET - estimate_tokens(LINEAGE_PROMPT)
+    chunks = chunk_procedure(proc_definition, max(token_budget, 1))
+    if not chunks:
+        return None, "No INSERT, MERGE, UPDATE or SELECT INTO statements found to chunk"
+    header = procedure_header(proc_definition)
+    logging.info(f"Extracting procedure in {len(chunks)} chunks")
+    with ThreadPoolExecutor(max_workers=settings.LLM_CHUNK_WORKERS) as pool:
+        results = list(pool.map(lambda statements: _extract_chunk(header, statements, llm), chunks))
+    errors = [error for mappings, error in results if mappings is None]
+    if errors:
+        return None, f"{len(errors)} of {len(chunks)} chunks failed: {errors[0]}"
+    return merge_chunk_mappings([mappings for mappings, _ in results]), None
+
+
+# Helper function to extract column mappings from LLM given a procedure definition
+def extract_column_mappings_from_llm(proc_definition: str, llm=None):
+    """
+    Given a stored procedure definition, use LLM to extract column-level lineage mappings.
+    Returns a tuple (mappings, error): mappings is a list of dicts, error is None if success, else error message.
+    Pass llm to use a different client (e.g. a stand-in for tests); it only needs an invoke(prompt) method.
+    Procedures whose prompt would exceed LLM_CHUNK_TOKEN_BUDGET are extracted in chunks.
+    """
+    from app.services.lineage.parse import split_statements
+
+    try:
+        llm = llm or get_llm()
+        prompt_tokens = estimate_tokens(LINEAGE_PROMPT) + estimate_tokens(proc_definition)
+        if prompt_tokens > settings.LLM_CHUNK_TOKEN_BUDGET:
+            return extract_column_mappings_chunked(proc_definition, llm)
+        mappings, error = _extract_from_prompt(proc_definition, llm)
+        if mappings is None and len(split_statements(proc_definition)) > 1:
+            # Usually JSON cut off at max_tokens: retry in halves rather than failing the proc
+            half = max(estimate_tokens(proc_definition) // 2, 1)
+            chunked, _ = extract_column_mappings_chunked(proc_definition, llm, token_budget=half)
+            if chunked is not None:
+                return chunked, None
+        return mappings, error
+    except Exception as ex:
+        logging.error(f"Exception in extract_column_mappings_from_llm: {ex}\n{traceback.format_exc()}")
+        return None, f"Failed to analyze procedure: {str(ex)}"
+
+
+def extract_column_mappings(proc_definition: str, default_db: str = "", llm=None):
+    """
+    Extract mappings with the sqlglot parser, falling back to the LLM only when the
+    parser cannot fully resolve the procedure. Returns (mappings, error, method) where
+    method is "parser" or "llm".
+    """
+    if settings.PARSER_FAST_PATH_ENABLED:
+        # sqlglot is only loaded once something is analyzed
+        from app.services.lineage.parse import extract_column_mappings_from_sql
+        try:
+            mappings, unresolved = extract_column_mappings_from_sql(proc_definition, default_db)
+            if mappings and not unresolved:
+                return mappings, None, "parser"
+            logging.info(f"Parser could not resolve procedure, using LLM: {unresolved[:3]}")
+        except Exception as ex:
+            logging.warning(f"Parser failed, using LLM: {ex}")
+    mappings, error = extract_column_mappings_from_llm(proc_definition, llm=llm)
+    return mappings, error, "llm"
+
+
+def _result(row: dict, mappings, error, method: str, elapsed_ms: float) -> dict:
+    proc_db = row.get("source_db") or ""
+    for m in mappings or []:
+        m["target_db"] = proc_db
+    return {
+        "proc_hash": row["proc_hash"],
+        "status": "error" if error else "success",
+        "detail": error,
+        "mappings": mappings,
+        "method": method,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+def _analyze_one(row: dict, llm=None) -> dict:
+    started = time.perf_counter()
+    try:
+        mappings, error = extract_column_mappings_from_llm(row["proc_definition"], llm=llm)
+        return _result(row, mappings, error, "llm", round((time.perf_counter() - started) * 1000, 1))
+    except Exception as ex:
+        # One bad proc must not abort the whole run through future.result()
+        logging.error(f"Failed to analyze procedure {row['proc_hash']}: {ex}\n{traceback.format_exc()}")
+        return _result(row, None, f"Failed to analyze procedure: {str(ex)}", "llm", round((time.perf_counter() - started) * 1000, 1))
+
+
+def analyze_procedures(rows: list[dict], llm=None, max_workers: int = None, cached: dict = None):
+    """
+    Extract mappings for each proc row (proc_hash, proc_definition, source_db) and yield
+    one result dict per proc as soon as it completes. Rows whose proc_hash is in cached
+    ({proc_hash: mappings}) skip extraction entirely; the rest are parsed on a process
+    pool, and only procs the parser cannot resolve go to the LLM on a bounded thread pool.
+    """
+    cached = cached or {}
+    pending = []
+    for row in rows:
+        if row["proc_hash"] in cached:
+            mappings = [dict(m) for m in cached[row["proc_hash"]]]
+            yield _result(row, mappings, None, "cache", 0.0)
+        else:
+            pending.append(row)
+
+    if settings.PARSER_FAST_PATH_ENABLED and pending:
+        from app.services.lineage.parse_batch import parse_procedures_parallel
+        parsed = parse_procedures_parallel(pending)
+        unresolved = []
+        for row, result in zip(pending, parsed):
+            if result["mappings"] and not result["unresolved"]:
+                yield _result(row, result["mappings"], None, "parser", result["elapsed_ms"])
+            else:
+                unresolved.append(row)
+        pending = unresolved
+
+    pool = ThreadPoolExecutor(max_workers=max_workers or settings.LLM_MAX_WORKERS)
+    try:
+        futures = [pool.submit(_analyze_one, row, llm) for row in pending]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # If the consumer stops early (client disconnect), drop the queued work
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_analysis_pipeline(
+    rows: list[dict],
+    save_batch,
+    llm=None,
+    max_workers: int = None,
+    batch_size: int = None,
+    cached: dict = None,
+):
+    """
+    Analyze procs concurrently and hand successful results to save_batch in groups of
+    batch_size. save_batch runs on the calling thread (DB sessions are not thread-safe)
+    and returns an error message or None. Yields NDJSON-friendly progress events.
+    """
+    batch_size = batch_size or settings.ANALYZE_SAVE_BATCH_SIZE
+    total = len(rows)
+    completed = 0
+    pending = []
+
+    def flush():
+        error = save_batch(pending)
+        event = {
+            "event": "saved",
+            "proc_hashes": [r["proc_hash"] for r in pending],
+            "status": "error" if error else "success",
+            "detail": error or f"{sum(len(r['mappings']) for r in pending)} mappings saved.",
+        }
+        pending.clear()
+        return event
+
+    for result in analyze_procedures(rows, llm=llm, max_workers=max_workers, cached=cached):
+        completed += 1
+        yield {
+            "event": "analyzed",
+            "proc_hash": result["proc_hash"],
+            "status": result["status"],
+            "detail": result["detail"] or f"{len(result['mappings'])} mappings extracted.",
+            "mapping_count": len(result["mappings"] or []),
+            "method": result["method"],
+            "elapsed_ms": result["elapsed_ms"],
+            "completed": completed,
+            "total": total,
+        }
+        if result["status"] == "success":
+            pending.append(result)
+            if len(pending) >= batch_size:
+                yield flush()
+
+    if pending:
+        yield flush()
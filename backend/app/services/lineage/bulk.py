@@ -0,0 +1,224 @@
+# backend/app/services/lineage/bulk.py
+#
+# Set-based persistence helpers. A batch of rows is staged in a temp table with a
+# single executemany, then resolved against the aud.* target with one MERGE
+# (SQL Server) or one INSERT ... WHERE NOT EXISTS (any other dialect, e.g. SQLite).
+from sqlalchemy import text
+
+# Column types used for the staging temp tables
+COLUMN_TYPES = {
+    "proc_id": "INT",
+    "table_map_id": "INT",
+    "table_source_id": "INT",
+    "dest_db": "NVARCHAR(100)",
+    "dest_schema": "NVARCHAR(100)",
+    "dest_table": "NVARCHAR(100)",
+    "src_db": "NVARCHAR(100)",
+    "src_schema": "NVARCHAR(100)",
+    "src_table": "NVARCHAR(100)",
+    "role": "VARCHAR(20)",
+    "join_predicate": "NVARCHAR(MAX)",
+    "dest_column": "NVARCHAR(200)",
+    "src_column": "NVARCHAR(200)",
+    "transform_expr": "NVARCHAR(MAX)",
+}
+
+TABLE_MAP_KEYS = ("dest_db", "dest_schema", "dest_table")
+TABLE_SOURCE_KEYS = ("table_map_id", "src_db", "src_schema", "src_table", "role")
+COLUMN_MAP_KEYS = ("table_source_id", "dest_column", "src_column")
+
+
+def _is_mssql(db) -> bool:
+    return db.get_bind().dialect.name == "mssql"
+
+
+def _column_type(db, column: str) -> str:
+    col_type = COLUMN_TYPES.get(column, "NVARCHAR(MAX)")
+    if _is_mssql(db):
+        # #temp tables otherwise take tempdb's collation, and comparing them with the
+        # aud columns fails when that differs from the warehouse database's
+        return col_type if col_type == "INT" else f"{col_type} COLLATE DATABASE_DEFAULT"
+    return "INTEGER" if col_type == "INT" else "TEXT"
+
+
+def _match_clause(columns, left: str = "t", right: str = "s") -> str:
+    # NULL-safe equality so rows with e.g. proc_id = NULL still match
+    return " AND ".join(
+        f"({left}.{c} = {right}.{c} OR ({left}.{c} IS NULL AND {right}.{c} IS NULL))"
+        for c in columns
+    )
+
+
+def _key_folder(db):
+    """
+    How keys compare in the target: SQL Server's default collation (and the unique
+    indexes on the aud tables) ignore case, so two rows differing only in case are
+    the same key there.
+    """
+    if _is_mssql(db):
+        return lambda key: tuple(v.lower() if isinstance(v, str) else v for v in key)
+    return lambda key: key
+
+
+def _dedupe(rows: list[dict], columns, key_columns, fold=lambda key: key) -> list[dict]:
+    seen = {}
+    for row in rows:
+        key = fold(tuple(row.get(c) for c in key_columns))
+        # Last write wins for non-key columns, same as the per-row loop did
+        seen[key] = {c: row.get(c) for c in columns}
+    return list(seen.values())
+
+
+def stage_rows(db, name: str, columns, rows: list[dict]) -> str:
+    """
+    Create a session temp table and load rows into it with a single executemany.
+    Returns the table name to select from.
+    """
+    stage_table = f"#{name}" if _is_mssql(db) else name
+    column_defs = ", ".join(f"{c} {_column_type(db, c)}" for c in columns)
+    db.execute(text(f"DROP TABLE IF EXISTS {stage_table}"))
+    if _is_mssql(db):
+        db.execute(text(f"CREATE TABLE {stage_table} ({column_defs})"))
+    else:
+        db.execute(text(f"CREATE TEMP TABLE {stage_table} ({column_defs})"))
+    if rows:
+        placeholders = ", ".join(f":{c}" for c in columns)
+        db.execute(
+            text(f"INSERT INTO {stage_table} ({', '.join(columns)}) VALUES ({placeholders})"),
+            rows,
+        )
+    return stage_table
+
+
+def drop_stage(db, stage_table: str):
+    db.execute(text(f"DROP TABLE IF EXISTS {stage_table}"))
+
+
+def bulk_upsert(
+    db,
+    target: str,
+    key_columns,
+    rows: list[dict],
+    extra_columns=(),
+    update_columns=(),
+    return_ids: bool = False,
+) -> dict:
+    """
+    Upsert rows into target keyed on key_columns in one set-based statement.
+    Non-key columns in extra_columns are written on insert; update_columns are also
+    refreshed on matched rows. Returns {"inserted", "matched", "updated", "ids"} where
+    ids maps each key tuple to the target id (only when return_ids is set). On SQL
+    Server keys differing only in case are one row; ids holds every spelling passed in.
+    """
+    key_columns = tuple(key_columns)
+    columns = key_columns + tuple(c for c in extra_columns if c not in key_columns)
+    fold = _key_folder(db)
+    keys = {tuple(row.get(c) for c in key_columns) for row in rows} if return_ids else ()
+    rows = _dedupe(rows, columns, key_columns, fold)
+    result = {"inserted": 0, "matched": 0, "updated": 0, "ids": {}}
+    if not rows:
+        return result
+
+    stage_name = "bulk_" + target.split(".")[-1]
+    stage_table = stage_rows(db, stage_name, columns, rows)
+    col_list = ", ".join(columns)
+    match = _match_clause(key_columns)
+    try:
+        if _is_mssql(db):
+            update_sql = ""
+            if update_columns:
+                changed = " OR ".join(
+                    f"ISNULL(t.{c}, '') <> ISNULL(s.{c}, '')" for c in update_columns
+                )
+                assignments = ", ".join(f"{c} = s.{c}" for c in update_columns)
+                update_sql = f"WHEN MATCHED AND ({changed}) THEN UPDATE SET {assignments}"
+            actions = db.execute(text(f"""
+                MERGE {target} WITH (HOLDLOCK) AS t
+                USING (SELECT {col_list} FROM {stage_table}) AS s
+                ON ({match})
+                {update_sql}
+                WHEN NOT MATCHED BY TARGET THEN
+                    INSERT ({col_list})
+                    VALUES ({', '.join(f's.{c}' for c in columns)})
+                OUTPUT $action;
+            """)).fetchall()
+            result["inserted"] = sum(1 for a in actions if a[0] == "INSERT")
+            result["updated"] = sum(1 for a in actions if a[0] == "UPDATE")
+        else:
+            if update_columns:
+                assignments = ", ".join(
+                    f"{c} = (SELECT s.{c} FROM {stage_table} s WHERE {_match_clause(key_columns, target, 's')})"
+                    for c in update_columns
+                )
+                changed = " OR ".join(
+                    f"COALESCE({target}.{c}, '') <> COALESCE(s.{c}, '')" for c in update_columns
+                )
+                updated = db.execute(text(f"""
+                    UPDATE {target} SET {assignments}
+                    WHERE EXISTS (
+                        SELECT 1 FROM {stage_table} s
+                        WHERE {_match_clause(key_columns, target, 's')} AND ({changed})
+                    )
+                """))
+                result["updated"] = updated.rowcount
+            inserted = db.execute(text(f"""
+                INSERT INTO {target} ({col_list})
+                SELECT {', '.join(f's.{c}' for c in columns)}
+                FROM {stage_table} s
+                WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE {match})
+            """))
+            result["inserted"] = inserted.rowcount
+
+        result["matched"] = len(rows) - result["inserted"]
+
+        if return_ids:
+            key_list = ", ".join(f"s.{c}" for c in key_columns)
+            id_rows = db.execute(text(f"""
+                SELECT {key_list}, MIN(t.id) AS id
+                FROM {stage_table} s
+                JOIN {target} t ON {match}
+                GROUP BY {key_list}
+            """)).fetchall()
+            ids = {fold(tuple(r[:-1])): r[-1] for r in id_rows}
+            result["ids"] = {key: ids[fold(key)] for key in keys if fold(key) in ids}
+    finally:
+        drop_stage(db, stage_table)
+
+    return result
+
+
+def bulk_upsert_table_map(db, rows: list[dict], with_proc_id: bool = False, return_ids: bool = True) -> dict:
+    """
+    Upsert aud.table_map rows. With with_proc_id the proc_id is part of the key
+    (silver/gold procs); otherwise destinations are matched by name only.
+    """
+    keys = (("proc_id",) if with_proc_id else ()) + TABLE_MAP_KEYS
+    return bulk_upsert(db, "aud.table_map", keys, rows, return_ids=return_ids)
+
+
+def bulk_upsert_table_source(db, rows: list[dict], return_ids: bool = False) -> dict:
+    """
+    Upsert aud.table_source rows keyed on (table_map_id, src_db, src_schema, src_table, role).
+    """
+    extra = ("join_predicate",) if any(r.get("join_predicate") for r in rows) else ()
+    return bulk_upsert(db, "aud.table_source", TABLE_SOURCE_KEYS, rows, extra_columns=extra, return_ids=return_ids)
+
+
+def bulk_upsert_column_map(db, rows: list[dict]) -> dict:
+    """
+    Upsert aud.column_map rows keyed on (table_source_id, dest_column, src_column).
+    transform_expr is refreshed on rows that already exist.
+    """
+    return bulk_upsert(
+        db,
+        "aud.column_map",
+        COLUMN_MAP_KEYS,
+        rows,
+        extra_columns=("transform_expr",),
+        update_columns=("transform_expr",),
+    )
+
+
+def counts(result: dict) -> dict:
+    """Strip the id lookup from a bulk_upsert result for API responses."""
+    return {k: v for k, v in result.items() if k != "ids"}
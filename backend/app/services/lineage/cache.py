@@ -0,0 +1,135 @@
+# backend/app/services/lineage/cache.py
+#
+# Persistent cache of LLM extraction results in aud.extraction_cache, keyed on
+# (proc_hash, prompt_version, model_deployment). A proc whose definition, prompt and
+# model are unchanged never goes back to the LLM.
+from datetime import datetime
+import json
+
+from sqlalchemy import bindparam, text
+
+from app.core.config import settings
+from app.services.lineage.analyze import PROMPT_VERSION, get_model_deployment
+
+# Stay well below SQL Server's 2100 parameter limit
+LOOKUP_CHUNK_SIZE = 1000
+
+
+def get_cached_mappings(db, proc_hashes: list[str]) -> dict:
+    """
+    Look up cached mappings for the given proc hashes under the current prompt version
+    and model deployment. Returns {proc_hash: mappings}; misses are simply absent.
+    """
+    if not settings.EXTRACTION_CACHE_ENABLED or not proc_hashes:
+        return {}
+
+    query = text("""
+        SELECT id, proc_hash, mappings_json
+        FROM aud.extraction_cache
+        WHERE proc_hash IN :proc_hashes
+          AND prompt_version = :prompt_version
+          AND model_deployment = :model_deployment
+    """).bindparams(bindparam("proc_hashes", expanding=True))
+
+    hits = {}
+    hit_ids = []
+    unique_hashes = list(dict.fromkeys(proc_hashes))
+    for i in range(0, len(unique_hashes), LOOKUP_CHUNK_SIZE):
+        rows = db.execute(query, {
+            "proc_hashes": unique_hashes[i:i + LOOKUP_CHUNK_SIZE],
+            "prompt_version": PROMPT_VERSION,
+            "model_deployment": get_model_deployment(),
+        }).fetchall()
+        for row in rows:
+            hits[row.proc_hash] = json.loads(row.mappings_json)
+            hit_ids.append({"id": row.id, "now": datetime.utcnow()})
+
+    # Track usage for LRU eviction
+    if hit_ids:
+        db.execute(text("""
+            UPDATE aud.extraction_cache
+            SET hit_count = hit_count + 1, last_used_datetime = :now
+            WHERE id = :id
+        """), hit_ids)
+    return hits
+
+
+def put_cached_mappings(db, entries: dict):
+    """
+    Store {proc_hash: mappings} for the current prompt version and model deployment,
+    replacing any existing entries. Does not commit.
+    """
+    if not settings.EXTRACTION_CACHE_ENABLED or not entries:
+        return
+    key = {"prompt_version": PROMPT_VERSION, "model_deployment": get_model_deployment()}
+    now = datetime.utcnow()
+    db.execute(text("""
+        DELETE FROM aud.extraction_cache
+        WHERE proc_hash = :proc_hash
+          AND prompt_version = :prompt_version
+          AND model_deployment = :model_deployment
+    """), [{"proc_hash": h, **key} for h in entries])
+    db.execute(text("""
+        INSERT INTO aud.extraction_cache
+            (proc_hash, prompt_version, model_deployment, mappings_json, hit_count, last_used_datetime, record_insert_datetime)
+        VALUES (:proc_hash, :prompt_version, :model_deployment, :mappings_json, 0, :now, :now)
+    """), [
+        {"proc_hash": h, "mappings_json": json.dumps(m), "now": now, **key}
+        for h, m in entries.items()
+    ])
+
+
+def invalidate_cache(db, proc_hash: str = None) -> int:
+    """
+    Drop cached results for one proc (all prompt versions and models), or everything
+    when proc_hash is None. Returns the number of entries removed.
+    """
+    if proc_hash:
+        result = db.execute(text("DELETE FROM aud.extraction_cache WHERE proc_hash = :proc_hash"), {"proc_hash": proc_hash})
+    else:
+        result = db.execute(text("DELETE FROM aud.extraction_cache"))
+    db.commit()
+    return result.rowcount
+
+
+def evict_cache(db, max_entries: int = None) -> int:
+    """
+    Bound the cache to max_entries by removing entries from older prompt versions or
+    models first, then the least recently used. Returns the number of entries removed.
+    """
+    max_entries = settings.EXTRACTION_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    rows = db.execute(text("""
+        SELECT id, prompt_version, model_deployment
+        FROM aud.extraction_cache
+        ORDER BY last_used_datetime DESC, id DESC
+    """)).fetchall()
+    if len(rows) <= max_entries:
+        return 0
+
+    def is_current(row):
+        return row.prompt_version == PROMPT_VERSION and row.model_deployment == get_model_deployment()
+
+    # Stable sort keeps LRU order within the current and stale groups
+    ranked = sorted(rows, key=lambda r: not is_current(r))
+    evicted = [{"id": r.id} for r in ranked[max_entries:]]
+    db.execute(text("DELETE FROM aud.extraction_cache WHERE id = :id"), evicted)
+    db.commit()
+    return len(evicted)
+
+
+def cache_stats(db) -> dict:
+    row = db.execute(text("""
+        SELECT
+            COUNT(*) AS entries,
+            COALESCE(SUM(hit_count), 0) AS total_hits,
+            SUM(CASE WHEN prompt_version = :prompt_version AND model_deployment = :model_deployment THEN 1 ELSE 0 END) AS current_entries
+        FROM aud.extraction_cache
+    """), {"prompt_version": PROMPT_VERSION, "model_deployment": get_model_deployment()}).fetchone()
+    return {
+        "entries": row.entries,
+        "current_entries": row.current_entries or 0,
+        "total_hits": row.total_hits,
+        "max_entries": settings.EXTRACTION_CACHE_MAX_ENTRIES,
+        "prompt_version": PROMPT_VERSION,
+        "model_deployment": get_model_deployment(),
+    }
@@ -0,0 +1,171 @@
+# backend/app/services/lineage/catalog.py
+#
+# In-memory snapshot of INFORMATION_SCHEMA TABLES and COLUMNS for all four layers.
+# The agent tools and extractors read from the snapshot instead of re-querying the
+# catalog views. A cheap sys.objects check (object count + max modify_date per layer)
+# runs at most every CATALOG_CHECK_SECONDS and triggers a reload when the schema
+# changed; the snapshot is also reloaded once it is older than CATALOG_TTL_SECONDS.
+from bisect import bisect_left
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services.lineage.metadata import COLUMN_FIELDS, LAYER_DBS, TABLE_FIELDS, fetch_table_metadata
+
+
+def _union(select: str) -> str:
+    return "\n    UNION ALL\n".join(select.format(layer=layer, db=db_name) for layer, db_name in LAYER_DBS.items())
+
+
+VERSION_SQL = _union("""
+    SELECT '{layer}' AS layer, COUNT_BIG(*) AS object_count, MAX(modify_date) AS last_modified
+    FROM [{db}].sys.objects
+    WHERE type IN ('U', 'V')""")
+
+TABLES_SQL = _union("""
+    SELECT '{layer}' AS layer, TABLE_CATALOG AS table_catalog, TABLE_SCHEMA AS table_schema,
+           TABLE_NAME AS table_name, TABLE_TYPE AS table_type
+    FROM [{db}].INFORMATION_SCHEMA.TABLES""")
+
+COLUMNS_SQL = _union("""
+    SELECT '{layer}' AS layer, TABLE_SCHEMA AS table_schema, TABLE_NAME AS table_name,
+           COLUMN_NAME AS column_name, ORDINAL_POSITION AS ordinal_position,
+           DATA_TYPE AS data_type, IS_NULLABLE AS is_nullable,
+           CHARACTER_MAXIMUM_LENGTH AS character_maximum_length,
+           NUMERIC_PRECISION AS numeric_precision, NUMERIC_SCALE AS numeric_scale,
+           COLUMN_DEFAULT AS column_default
+    FROM [{db}].INFORMATION_SCHEMA.COLUMNS""") + "\n    ORDER BY layer, table_schema, table_name, ordinal_position"
+
+
+def read_catalog_version(db) -> tuple:
+    rows = db.execute(text(VERSION_SQL)).fetchall()
+    return tuple(sorted((row.layer, row.object_count, str(row.last_modified)) for row in rows))
+
+
+class CatalogSnapshot:
+    """
+    Immutable per-layer view of the catalog. Tables are stored as
+    (table_catalog, table_schema, table_name, table_type, columns) tuples keyed by
+    lower-cased (schema, table); columns are tuples in COLUMN_FIELDS order.
+    """
+
+    def __init__(self, tables, columns, version):
+        self.version = version
+        self.loaded_at = time.time()
+        self._tables = {layer: {} for layer in LAYER_DBS}
+        self._by_name = {layer: {} for layer in LAYER_DBS}
+
+        grouped = {}
+        for row in columns:
+            key = (row.layer, row.table_schema.lower(), row.table_name.lower())
+            grouped.setdefault(key, []).append(tuple(getattr(row, f) for f in COLUMN_FIELDS))
+        for row in tables:
+            key = (row.table_schema.lower(), row.table_name.lower())
+            self._tables[row.layer][key] = (
+                row.table_catalog, row.table_schema, row.table_name, row.table_type,
+                tuple(grouped.get((row.layer,) + key, ())),
+            )
+            self._by_name[row.layer].setdefault(key[1], []).append(key)
+        # Sorted (table, schema) keys for prefix search
+        self._sorted = {layer: sorted((t, s) for s, t in entries) for layer, entries in self._tables.items()}
+
+    def _layers(self, layers):
+        return list(layers or LAYER_DBS)
+
+    def tables(self, layer: str, table_type: str = None) -> list[tuple]:
+        return [t for t in self._tables[layer].values() if table_type is None or t[3] == table_type]
+
+    def get_table(self, layer: str, schema: str, table: str):
+        return self._tables[layer].get(((schema or "dbo").lower(), table.lower()))
+
+    def find_table(self, table: str, layers=None) -> list[tuple]:
+        """(layer, table) for every schema holding a table with this name, case-insensitively."""
+        found = []
+        for layer in self._layers(layers):
+            for key in self._by_name[layer].get(table.lower(), ()):
+                found.append((layer, self._tables[layer][key]))
+        return found
+
+    def columns(self, layer: str, schema: str, table: str) -> tuple:
+        entry = self.get_table(layer, schema, table)
+        return entry[4] if entry else ()
+
+    def search_prefix(self, prefix: str, layers=None, limit: int = 50) -> list[tuple]:
+        """(layer, table) for tables whose name starts with prefix, in name order per layer."""
+        prefix = prefix.lower()
+        found = []
+        for layer in self._layers(layers):
+            names = self._sorted[layer]
+            i = bisect_left(names, (prefix, ""))
+            while i < len(names) and names[i][0].startswith(prefix) and len(found) < limit:
+                table, schema = names[i]
+                found.append((layer, self._tables[layer][(schema, table)]))
+                i += 1
+        return found
+
+    def table_metadata(self, pairs, layers=None, include_columns: bool = True) -> dict:
+        """Same result shape as metadata.fetch_table_metadata, served from memory."""
+        result = {}
+        for layer in self._layers(layers):
+            result[layer] = []
+            for schema, table in sorted({((s or "dbo").lower(), t.lower()) for s, t in pairs if t}):
+                entry = self._tables[layer].get((schema, table))
+                if entry is None:
+                    continue
+                item = dict(zip(TABLE_FIELDS, entry[:4]))
+                item["columns"] = [dict(zip(COLUMN_FIELDS, c)) for c in entry[4]] if include_columns else []
+                result[layer].append(item)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "loaded_at": self.loaded_at,
+            "layers": {
+                layer: {"tables": len(entries), "columns": sum(len(t[4]) for t in entries.values())}
+                for layer, entries in self._tables.items()
+            },
+        }
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def read_catalog(db, version: tuple = None) -> CatalogSnapshot:
+    """Read the catalog from the database without making it the current snapshot."""
+    version = version if version is not None else read_catalog_version(db)
+    tables = db.execute(text(TABLES_SQL)).fetchall()
+    columns = db.execute(text(COLUMNS_SQL)).fetchall()
+    return CatalogSnapshot(tables, columns, version)
+
+
+def load_catalog(db) -> CatalogSnapshot:
+    """Reload the snapshot from the database and make it current."""
+    global _snapshot, _checked_at
+    with _lock:
+        _snapshot = read_catalog(db)
+        _checked_at = time.time()
+        return _snapshot
+
+
+def get_catalog(db) -> CatalogSnapshot:
+    """The current snapshot, reloaded first if it expired or the schema changed."""
+    global _checked_at
+    snapshot, now = _snapshot, time.time()
+    if snapshot is None or now - snapshot.loaded_at > settings.CATALOG_TTL_SECONDS:
+        return load_catalog(db)
+    if now - _checked_at > settings.CATALOG_CHECK_SECONDS:
+        _checked_at = now
+        if read_catalog_version(db) != snapshot.version:
+            return load_catalog(db)
+    return snapshot
+
+
+def lookup_table_metadata(db, pairs, layers=None, include_columns: bool = True) -> dict:
+    """Table/column metadata from the snapshot, or straight from INFORMATION_SCHEMA when it is disabled."""
+    if settings.CATALOG_SNAPSHOT_ENABLED:
+        return get_catalog(db).table_metadata(pairs, layers, include_columns)
+    return fetch_table_metadata(db, pairs, layers, include_columns)
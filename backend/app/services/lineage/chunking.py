@@ -0,0 +1,122 @@
+# backend/app/services/lineage/chunking.py
+#
+# Splits procedures that are too big for one extraction prompt into chunks of whole
+# DML statements (each INSERT / MERGE / UPDATE / SELECT INTO together with its CTEs),
+# packed up to a token budget, and merges the per-chunk mappings back together.
+import logging
+import re
+from functools import lru_cache
+
+# Used when tiktoken (installed with langchain-openai) is not available
+CHARS_PER_TOKEN = 4
+
+_PROC_HEADER = re.compile(r"\bCREATE\s+(?:OR\s+ALTER\s+)?PROC(?:EDURE)?\s+[^\s(]+", re.IGNORECASE)
+
+MAPPING_KEY_FIELDS = (
+    "source_db", "source_schema", "source_table", "source_column",
+    "target_db", "target_schema", "target_table", "target_column",
+)
+
+
+@lru_cache()
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def procedure_header(proc_definition: str) -> str:
+    """The CREATE PROCEDURE line, repeated on every chunk so the model knows which proc it reads."""
+    header = _PROC_HEADER.search(proc_definition)
+    return f"{header.group(0)}\nAS\n" if header else ""
+
+
+def chunk_text(header: str, statements: list[str]) -> str:
+    return header + ";\n\n".join(statements) + ";"
+
+
+def chunk_procedure(proc_definition: str, token_budget: int) -> list[list[str]]:
+    """
+    Group a procedure's DML statements into chunks of at most token_budget tokens,
+    keeping statement order. A single statement over the budget becomes its own chunk.
+    Returns [] when no DML statements are found.
+    """
+    from app.services.lineage.parse import split_statements
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for statement in split_statements(proc_definition):
+        tokens = estimate_tokens(statement)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        if tokens > token_budget:
+            logging.warning(f"Statement of ~{tokens} tokens exceeds the chunk budget of {token_budget}")
+        current.append(statement)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _key(mapping: dict) -> tuple:
+    return tuple((mapping.get(field) or "").strip().lower() for field in MAPPING_KEY_FIELDS)
+
+
+def _is_temp(table) -> bool:
+    return (table or "").strip().startswith("#")
+
+
+def merge_chunk_mappings(chunk_mappings: list[list[dict]]) -> list[dict]:
+    """
+    Combine per-chunk mappings in chunk order: duplicates are dropped, and since a temp
+    table may be filled in one chunk and read in another, reads from a temp table are
+    traced back to what was written into it. Mappings into temp tables are then dropped,
+    matching what a single-prompt extraction returns.
+    """
+    merged = {}
+    for mappings in chunk_mappings:
+        for m in mappings:
+            merged.setdefault(_key(m), m)
+    mappings = list(merged.values())
+
+    # temp table column -> mappings that wrote it
+    writes = {}
+    for m in mappings:
+        if _is_temp(m.get("target_table")):
+            writes.setdefault(((m["target_table"] or "").lower(), (m.get("target_column") or "").lower()), []).append(m)
+
+    def resolve(m, seen):
+        if not _is_temp(m.get("source_table")):
+            return [m]
+        key = ((m["source_table"] or "").lower(), (m.get("source_column") or "").lower())
+        if key in seen or key not in writes:
+            return [m]
+        resolved = []
+        for upstream in writes[key]:
+            transforms = [t for t in (upstream.get("transform_expr"), m.get("transform_expr")) if t]
+            hop = {
+                **m,
+                **{field: upstream.get(field) for field in MAPPING_KEY_FIELDS if field.startswith("source_")},
+                "transform_expr": " -> ".join(transforms),
+            }
+            resolved.extend(resolve(hop, seen | {key}))
+        return resolved
+
+    result = {}
+    for m in mappings:
+        if _is_temp(m.get("target_table")):
+            continue
+        for r in resolve(m, frozenset()):
+            result.setdefault(_key(r), r)
+    return list(result.values())
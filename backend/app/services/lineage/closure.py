@@ -0,0 +1,185 @@
+# backend/app/services/lineage/closure.py
+#
+# Precomputed transitive closure over the in-memory lineage graph (graph.py), so impact
+# queries read a node's whole downstream set instead of walking the graph.
+#   - Nodes are grouped into weakly connected components and every node keeps its
+#     descendants as a bitset (a Python int) over its component's members, so a bitset
+#     is only as wide as the component, not the whole graph.
+#   - The initial build visits strongly connected components in reverse topological
+#     order, so each bitset is the OR of its successors' bitsets.
+#   - A new edge s -> d is applied in place: every node that reaches s (and s itself)
+#     gains d and everything below d. An edge joining two components merges them first.
+#   - Components larger than LINEAGE_CLOSURE_MAX_COMPONENT nodes keep no bitsets
+#     (n² / 8 bytes each); their nodes are walked instead.
+
+
+class _Component:
+    __slots__ = ("members", "desc")
+
+    def __init__(self, members: list, desc):
+        self.members = members  # position -> node id
+        self.desc = desc        # position -> descendant bitset over positions; None when too large
+
+
+def _sccs(out: list, count: int):
+    """Tarjan's algorithm without recursion; yields SCCs in reverse topological order."""
+    index = [-1] * count
+    low = [0] * count
+    on_stack = bytearray(count)
+    stack = []
+    counter = 0
+    for root in range(count):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, 0)]
+        while work:
+            node, i = work[-1]
+            edges = out[node]
+            if i < len(edges):
+                work[-1] = (node, i + 1)
+                nxt = edges[i]
+                if index[nxt] == -1:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = 1
+                    work.append((nxt, 0))
+                elif on_stack[nxt] and index[nxt] < low[node]:
+                    low[node] = index[nxt]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == index[node]:
+                scc = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    scc.append(member)
+                    if member == node:
+                        break
+                yield scc
+
+
+class TransitiveClosure:
+    def __init__(self, max_component: int):
+        self.max_component = max_component
+        self._component = []  # node id -> _Component
+        self._position = []   # node id -> position within its component
+
+    def build(self, out: list, inbound: list):
+        """Compute the closure of a graph given as forward / reverse adjacency lists."""
+        count = len(out)
+        component = [None] * count
+        position = [0] * count
+        for start in range(count):
+            if component[start] is not None:
+                continue
+            members = [start]
+            current = _Component(members, None)
+            component[start] = current
+            i = 0
+            while i < len(members):
+                node = members[i]
+                i += 1
+                for adjacency in (out, inbound):
+                    for nxt in adjacency[node]:
+                        if component[nxt] is None:
+                            component[nxt] = current
+                            members.append(nxt)
+            for pos, node in enumerate(members):
+                position[node] = pos
+            if len(members) <= self.max_component:
+                current.desc = [0] * len(members)
+
+        for scc in _sccs(out, count):
+            desc = component[scc[0]].desc
+            if desc is None:
+                continue
+            reach = 0
+            inside = None
+            if len(scc) > 1:
+                # Every member of a cycle reaches every member, itself included
+                inside = set(scc)
+                for member in scc:
+                    reach |= 1 << position[member]
+            for member in scc:
+                for nxt in out[member]:
+                    if inside is None or nxt not in inside:
+                        reach |= (1 << position[nxt]) | desc[position[nxt]]
+            for member in scc:
+                desc[position[member]] = reach
+        self._component, self._position = component, position
+        return self
+
+    def _grow(self, count: int):
+        for node in range(len(self._component), count):
+            self._component.append(_Component([node], [0]))
+            self._position.append(0)
+
+    def _merge(self, a: _Component, b: _Component) -> _Component:
+        if len(a.members) < len(b.members):
+            a, b = b, a
+        offset = len(a.members)
+        for node in b.members:
+            self._component[node] = a
+            self._position[node] += offset
+        a.members.extend(b.members)
+        if a.desc is None or b.desc is None or len(a.members) > self.max_component:
+            a.desc = None
+        else:
+            a.desc.extend(bits << offset for bits in b.desc)
+        return a
+
+    def add_edge(self, src: int, dest: int, count: int):
+        """Apply a new edge src -> dest; count is the graph's node count after adding it."""
+        self._grow(count)
+        current = self._component[src]
+        if current is not self._component[dest]:
+            current = self._merge(current, self._component[dest])
+        desc = current.desc
+        if desc is None:
+            return
+        src_pos, dest_pos = self._position[src], self._position[dest]
+        gained = (1 << dest_pos) | desc[dest_pos]
+        if desc[src_pos] & gained == gained:
+            return  # src already reached all of it
+        src_bit = 1 << src_pos
+        for pos, bits in enumerate(desc):
+            if bits & src_bit or pos == src_pos:
+                desc[pos] = bits | gained
+
+    def descendants(self, node: int):
+        """Node ids downstream of node, or None when its component is too large to keep bitsets."""
+        if node >= len(self._component):
+            return []
+        current = self._component[node]
+        if current.desc is None:
+            return None
+        pos = self._position[node]
+        bits = current.desc[pos] & ~(1 << pos)
+        if not bits:
+            return []
+        # Lowest bit first; str.find keeps the scan in C
+        digits = bin(bits)[:1:-1]
+        members = current.members
+        result = []
+        i = digits.find("1")
+        while i != -1:
+            result.append(members[i])
+            i = digits.find("1", i + 1)
+        return result
+
+    def stats(self) -> dict:
+        components = {id(c): c for c in self._component}.values()
+        cached = [c for c in components if c.desc is not None]
+        return {
+            "components": len(components),
+            "largest_component": max((len(c.members) for c in components), default=0),
+            "uncached_components": len(components) - len(cached),
+            "bitset_bytes": sum((bits.bit_length() + 7) // 8 for c in cached for bits in c.desc),
+        }
@@ -0,0 +1,186 @@
+# backend/app/services/lineage/column_matching.py
+#
+# Column lineage between layers that are loaded by copy rather than by procs
+# (stage -> bronze, bronze -> silver). Tables are paired first (matching.py), then the
+# columns of each table pair are matched on a fingerprint of normalized name, type
+# family, length and ordinal position:
+#   - a hash index on the fingerprint / normalized name answers exact matches;
+#   - leftover columns are compared only against columns of the same table pair that
+#     share a name trigram (an inverted index), so renames are scored without an
+#     all-pairs comparison.
+from collections import namedtuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services.lineage.catalog import get_catalog
+from app.services.lineage.matching import load_layer_tables, match_tables, normalize_column
+from app.services.lineage.metadata import LAYER_DBS
+
+LAYER_PAIRS = {
+    "stage-bronze": ("stage", "bronze"),
+    "bronze-silver": ("bronze", "silver"),
+}
+
+TYPE_FAMILIES = {
+    "string": ("char", "varchar", "nchar", "nvarchar", "text", "ntext", "sysname", "xml"),
+    "integer": ("tinyint", "smallint", "int", "bigint"),
+    "numeric": ("decimal", "numeric", "money", "smallmoney", "float", "real"),
+    "temporal": ("date", "datetime", "datetime2", "smalldatetime", "datetimeoffset", "time"),
+    "boolean": ("bit",),
+    "guid": ("uniqueidentifier",),
+    "binary": ("binary", "varbinary", "image", "timestamp", "rowversion"),
+}
+_FAMILY_OF = {data_type: family for family, types in TYPE_FAMILIES.items() for data_type in types}
+
+# Rename score weights; exact fingerprints score 1.0 and same-name/different-type 0.9
+NAME_WEIGHT, TYPE_WEIGHT, POSITION_WEIGHT = 0.6, 0.25, 0.15
+
+Fingerprint = namedtuple("Fingerprint", "name normalized family length ordinal")
+
+
+def fingerprint(name: str, ordinal, data_type, length) -> Fingerprint:
+    data_type = (data_type or "").lower()
+    return Fingerprint(name, normalize_column(name), _FAMILY_OF.get(data_type, data_type), length, ordinal or 0)
+
+
+def load_layer_columns(db, layer: str) -> dict:
+    """{(schema, table): [Fingerprint, ...] in ordinal order} for every table in a layer."""
+    if settings.CATALOG_SNAPSHOT_ENABLED:
+        return {
+            (t[1], t[2]): [fingerprint(c[0], c[1], c[2], c[4]) for c in t[4]]
+            for t in get_catalog(db).tables(layer)
+        }
+    rows = db.execute(text(f"""
+        SELECT TABLE_SCHEMA AS table_schema, TABLE_NAME AS table_name, COLUMN_NAME AS column_name,
+               ORDINAL_POSITION AS ordinal_position, DATA_TYPE AS data_type,
+               CHARACTER_MAXIMUM_LENGTH AS character_maximum_length
+        FROM [{LAYER_DBS[layer]}].INFORMATION_SCHEMA.COLUMNS
+        ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION
+    """)).fetchall()
+    columns = {}
+    for row in rows:
+        columns.setdefault((row.table_schema, row.table_name), []).append(
+            fingerprint(row.column_name, row.ordinal_position, row.data_type, row.character_maximum_length)
+        )
+    return columns
+
+
+def _trigrams(name: str) -> set:
+    padded = f"^{name}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} or {padded}
+
+
+def match_columns(src: list, dest: list, min_score: float = None) -> list[tuple]:
+    """
+    One-to-one (src Fingerprint, dest Fingerprint, match, score) for a table pair.
+    match is "exact" (same fingerprint), "name" (same normalized name, different type)
+    or "renamed" (scored on name trigrams, type family and relative position).
+    """
+    min_score = settings.MATCH_COLUMN_MIN_SCORE if min_score is None else min_score
+    matches = []
+    used = set()
+
+    # Hash index: full fingerprint first, then normalized name alone
+    by_fingerprint, by_name = {}, {}
+    for i, column in enumerate(src):
+        by_fingerprint.setdefault((column.normalized, column.family, column.length), i)
+        by_name.setdefault(column.normalized, i)
+    unmatched = []
+    for column in dest:
+        i = by_fingerprint.get((column.normalized, column.family, column.length))
+        kind, score = "exact", 1.0
+        if i is None or i in used:
+            i, kind, score = by_name.get(column.normalized), "name", 0.9
+        if i is not None and i not in used:
+            used.add(i)
+            matches.append((src[i], column, kind, score))
+        else:
+            unmatched.append(column)
+    if not unmatched or len(used) == len(src):
+        return matches
+
+    # Blocked rename search: candidates share at least one name trigram
+    grams = {}
+    index = {}
+    for i, column in enumerate(src):
+        if i not in used:
+            grams[i] = _trigrams(column.normalized)
+            for gram in grams[i]:
+                index.setdefault(gram, []).append(i)
+    width = max(len(src), len(dest), 1)
+    candidates = []
+    for column in unmatched:
+        dest_grams = _trigrams(column.normalized)
+        shared = {}
+        for gram in dest_grams:
+            for i in index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        for i, count in shared.items():
+            name_sim = count / (len(dest_grams) + len(grams[i]) - count)
+            type_sim = 1.0 if src[i].family == column.family else 0.0
+            position_sim = 1.0 - abs(src[i].ordinal - column.ordinal) / width
+            score = NAME_WEIGHT * name_sim + TYPE_WEIGHT * type_sim + POSITION_WEIGHT * position_sim
+            if score >= min_score:
+                candidates.append((score, i, column))
+    # Greedy one-to-one assignment, best score first
+    taken = set()
+    for score, i, column in sorted(candidates, key=lambda c: (-c[0], c[1], c[2].ordinal)):
+        if i in used or column.name in taken:
+            continue
+        used.add(i)
+        taken.add(column.name)
+        matches.append((src[i], column, "renamed", round(score, 3)))
+    return matches
+
+
+def _table_pairs(db, src_layer: str, dest_layer: str, stage_to_bronze: list = None) -> list[tuple]:
+    """((src_schema, src_table), (dest_schema, dest_table)) for the best table match per dest table."""
+    if (src_layer, dest_layer) == ("stage", "bronze"):
+        if stage_to_bronze is None:
+            from app.services.lineage.extract import extract_stage_to_bronze_mappings
+            stage_to_bronze = extract_stage_to_bronze_mappings(db)
+        return [
+            ((m["stage_schema"], m["stage_table_name"]), (m["bronze_schema"], m["bronze_table_name"]))
+            for m in stage_to_bronze
+            if m["stage_table_name"]
+        ]
+    dest_tables = load_layer_tables(db, dest_layer)
+    src_tables = load_layer_tables(db, src_layer)
+    return [
+        ((src_tables[m["right"]][0], src_tables[m["right"]][1]), (dest_tables[m["left"]][0], dest_tables[m["left"]][1]))
+        for m in match_tables(dest_tables, src_tables, top_k=1)
+    ]
+
+
+def match_layer_columns(
+    db, layers=("stage-bronze", "bronze-silver"), min_score: float = None, stage_to_bronze: list = None
+) -> list[dict]:
+    """
+    Column matches for each requested layer pair (keys of LAYER_PAIRS). stage_to_bronze
+    takes already extracted stage -> bronze table mappings instead of matching again.
+    """
+    results = []
+    columns = {}
+    for pair in layers:
+        src_layer, dest_layer = LAYER_PAIRS[pair]
+        for layer in (src_layer, dest_layer):
+            if layer not in columns:
+                columns[layer] = load_layer_columns(db, layer)
+        for src_key, dest_key in _table_pairs(db, src_layer, dest_layer, stage_to_bronze):
+            src_columns = columns[src_layer].get(src_key, [])
+            dest_columns = columns[dest_layer].get(dest_key, [])
+            for src, dest, kind, score in match_columns(src_columns, dest_columns, min_score):
+                results.append({
+                    "src_layer": src_layer,
+                    "src_schema": src_key[0],
+                    "src_table": src_key[1],
+                    "src_column": src.name,
+                    "dest_layer": dest_layer,
+                    "dest_schema": dest_key[0],
+                    "dest_table": dest_key[1],
+                    "dest_column": dest.name,
+                    "match": kind,
+                    "score": score,
+                })
+    return results
@@ -0,0 +1,217 @@
+# backend/app/services/lineage/discovery.py
+#
+# Stored procedure discovery for the silver and gold databases. The incremental mode
+# compares sys.procedures (object_id, modify_date) against aud.proc_watermark and only
+# fetches and hashes definitions for procs that were added or modified.
+import hashlib
+
+from sqlalchemy import bindparam, text
+
+from app.core.config import settings, SILVER_DB, GOLD_DB
+
+# Stay well below SQL Server's 2100 parameter limit
+FETCH_CHUNK_SIZE = 1000
+
+MERGE_PROC_METADATA = text("""
+    MERGE aud.proc_metadata AS target
+    USING (SELECT
+               :source_db AS source_db,
+               :schema_name AS source_schema,
+               :proc_name AS proc_name,
+               :proc_definition AS proc_definition,
+               :proc_hash AS proc_hash
+          ) AS src
+    ON (target.source_db = src.source_db
+        AND target.source_schema = src.source_schema
+        AND target.proc_name = src.proc_name
+        AND target.proc_hash = src.proc_hash)
+    WHEN NOT MATCHED THEN
+        INSERT (source_db, source_schema, proc_name, proc_definition, proc_hash, record_insert_datetime)
+        VALUES (src.source_db, src.source_schema, src.proc_name, src.proc_definition, src.proc_hash, GETDATE());
+""")
+
+
+def hash_definition(definition: str) -> str:
+    return hashlib.sha256((definition or "").encode("utf-8")).hexdigest()
+
+
+def save_proc_metadata(db, rows: list[dict]):
+    """
+    MERGE discovered procs into aud.proc_metadata in one executemany, avoiding duplicates.
+    Rows need source_db, schema_name, proc_name, proc_definition and proc_hash.
+    """
+    if not rows:
+        return
+    db.execute(MERGE_PROC_METADATA, [
+        {
+            "source_db": row["source_db"],
+            "schema_name": row["schema_name"],
+            "proc_name": row["proc_name"],
+            "proc_definition": row["proc_definition"],
+            "proc_hash": row["proc_hash"],
+        }
+        for row in rows
+    ])
+
+
+def list_procedures(db, db_name: str) -> list[dict]:
+    """List procs in db_name with their modify_date, without pulling definitions."""
+    rows = db.execute(text(f"""
+        SELECT
+            p.object_id,
+            s.name AS schema_name,
+            p.name AS proc_name,
+            p.modify_date
+        FROM {db_name}.sys.procedures p
+        JOIN {db_name}.sys.schemas s ON p.schema_id = s.schema_id
+    """)).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def fetch_definitions(db, db_name: str, object_ids: list[int]) -> dict:
+    """Fetch sys.sql_modules definitions for the given object_ids. Returns {object_id: definition}."""
+    query = text(f"""
+        SELECT m.object_id, m.definition
+        FROM {db_name}.sys.sql_modules m
+        WHERE m.object_id IN :object_ids
+    """).bindparams(bindparam("object_ids", expanding=True))
+    definitions = {}
+    for i in range(0, len(object_ids), FETCH_CHUNK_SIZE):
+        rows = db.execute(query, {"object_ids": object_ids[i:i + FETCH_CHUNK_SIZE]}).fetchall()
+        definitions.update({row.object_id: row.definition for row in rows})
+    return definitions
+
+
+def load_watermark(db, db_name: str) -> dict:
+    rows = db.execute(text("""
+        SELECT object_id, source_schema, proc_name, modify_date, proc_hash
+        FROM aud.proc_watermark
+        WHERE source_db = :source_db
+    """), {"source_db": db_name}).mappings().all()
+    return {row["object_id"]: dict(row) for row in rows}
+
+
+def _write_watermark(db, db_name: str, procs: list[dict], dropped_ids: list[int]):
+    stale_ids = [p["object_id"] for p in procs] + dropped_ids
+    if stale_ids:
+        db.execute(text("""
+            DELETE FROM aud.proc_watermark
+            WHERE source_db = :source_db AND object_id = :object_id
+        """), [{"source_db": db_name, "object_id": object_id} for object_id in stale_ids])
+    if procs:
+        db.execute(text("""
+            INSERT INTO aud.proc_watermark (source_db, object_id, source_schema, proc_name, modify_date, proc_hash)
+            VALUES (:source_db, :object_id, :source_schema, :proc_name, :modify_date, :proc_hash)
+        """), [
+            {
+                "source_db": db_name,
+                "object_id": p["object_id"],
+                "source_schema": p["schema_name"],
+                "proc_name": p["proc_name"],
+                "modify_date": p["modify_date"],
+                "proc_hash": p["proc_hash"],
+            }
+            for p in procs
+        ])
+
+
+def discover_procs_incremental(db, databases: list[str] = None) -> dict:
+    """
+    Discover silver/gold procs that changed since the last run. Only definitions of
+    procs whose object_id is new or whose modify_date moved are fetched and hashed.
+    Returns {"added": [...], "changed": [...], "dropped": [...], "unchanged": n}; a
+    touched proc whose definition hash is identical is counted as unchanged.
+    The first run against an empty watermark reports every proc as added.
+    """
+    report = {"added": [], "changed": [], "dropped": [], "unchanged": 0}
+
+    for db_name in databases or [SILVER_DB, GOLD_DB]:
+        current = list_procedures(db, db_name)
+        watermark = load_watermark(db, db_name)
+
+        candidates = []
+        for proc in current:
+            known = watermark.get(proc["object_id"])
+            if (
+                known
+                and known["modify_date"] == proc["modify_date"]
+                and known["source_schema"] == proc["schema_name"]
+                and known["proc_name"] == proc["proc_name"]
+            ):
+                report["unchanged"] += 1
+            else:
+                candidates.append(proc)
+
+        current_ids = {proc["object_id"] for proc in current}
+        dropped_ids = [object_id for object_id in watermark if object_id not in current_ids]
+        for object_id in dropped_ids:
+            known = watermark[object_id]
+            report["dropped"].append({
+                "source_db": db_name,
+                "schema_name": known["source_schema"],
+                "proc_name": known["proc_name"],
+                "proc_hash": known["proc_hash"],
+            })
+
+        definitions = fetch_definitions(db, db_name, [p["object_id"] for p in candidates])
+        changed_rows = []
+        for proc in candidates:
+            definition = definitions.get(proc["object_id"])
+            proc["proc_hash"] = hash_definition(definition)
+            known = watermark.get(proc["object_id"])
+            if known and known["proc_hash"] == proc["proc_hash"]:
+                # modify_date moved but the text did not (e.g. a recompile or rename-back)
+                report["unchanged"] += 1
+                continue
+            row = {
+                "source_db": db_name,
+                "schema_name": proc["schema_name"],
+                "proc_name": proc["proc_name"],
+                "proc_definition": definition,
+                "proc_hash": proc["proc_hash"],
+            }
+            changed_rows.append(row)
+            summary = {k: v for k, v in row.items() if k != "proc_definition"}
+            report["changed" if known else "added"].append(summary)
+
+        save_proc_metadata(db, changed_rows)
+        _write_watermark(db, db_name, candidates, dropped_ids)
+
+    db.commit()
+    return report
+
+
+def unanalyzed_proc_hashes(db, databases=None) -> list[str]:
+    """
+    Current proc hashes (per aud.proc_watermark) with no saved lineage: no table_map row
+    for the proc and no extraction cache entry (an LLM result, even an empty one, is
+    cached in the same transaction as its mappings). Discovery moves the watermark
+    before anything is extracted, so this is what picks up procs whose extraction or
+    save failed on an earlier run.
+    """
+    from app.services.lineage.analyze import PROMPT_VERSION, get_model_deployment
+
+    cached = ""
+    params = {"prompt_version": PROMPT_VERSION, "model_deployment": get_model_deployment()}
+    if settings.EXTRACTION_CACHE_ENABLED:
+        cached = """
+          AND NOT EXISTS (
+              SELECT 1 FROM aud.extraction_cache c
+              WHERE c.proc_hash = w.proc_hash
+                AND c.prompt_version = :prompt_version
+                AND c.model_deployment = :model_deployment
+          )"""
+    query = text(f"""
+        SELECT DISTINCT w.proc_hash
+        FROM aud.proc_watermark w
+        JOIN aud.proc_metadata pm
+          ON pm.proc_hash = w.proc_hash AND pm.source_db = w.source_db
+        WHERE w.source_db IN :databases
+          AND pm.proc_definition IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM aud.table_map tm
+              JOIN aud.proc_metadata saved ON saved.id = tm.proc_id
+              WHERE saved.proc_hash = w.proc_hash
+          ){cached}
+    """).bindparams(bindparam("databases", expanding=True))
+    return list(db.execute(query, {"databases": list(databases or [SILVER_DB, GOLD_DB]), **params}).scalars())
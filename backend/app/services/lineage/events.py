@@ -0,0 +1,31 @@
+# backend/app/services/lineage/events.py
+#
+# In-process notifications for lineage writes. Anything that writes aud.table_map /
+# table_source / column_map calls publish_lineage_change after committing, and
+# in-memory indexes subscribe with on_lineage_change to refresh just what changed.
+import logging
+import traceback
+
+_subscribers = []
+
+
+def on_lineage_change(callback):
+    """
+    Register callback(db, table_map_ids) to run after lineage edges are written.
+    Usable as a decorator.
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def publish_lineage_change(db, table_map_ids):
+    """Notify subscribers that edges for these table_map ids were written and committed."""
+    table_map_ids = sorted({i for i in table_map_ids if i is not None})
+    if not table_map_ids:
+        return
+    for callback in list(_subscribers):
+        try:
+            callback(db, table_map_ids)
+        except Exception as ex:
+            # A stale index must never fail the write that triggered it
+            logging.error(f"Lineage change subscriber {callback.__name__} failed: {ex}\n{traceback.format_exc()}")
@@ -0,0 +1,352 @@
+# backend/app/services/lineage/export.py
+#
+# Versioned columnar snapshots of the lineage tables, and a read mode that serves
+# lineage queries from the latest one instead of SQL Server.
+#
+#   <LINEAGE_EXPORT_DIR>/<version>/<name>.arrow      Arrow IPC, uncompressed
+#   <LINEAGE_EXPORT_DIR>/<version>/<name>.parquet    zstd Parquet, for analysts
+#   <LINEAGE_EXPORT_DIR>/<version>/manifest.json     row counts and columns
+#   <LINEAGE_EXPORT_DIR>/LATEST                      newest complete version
+#   <LINEAGE_EXPORT_DIR>/STALE                       touched on every lineage write
+#
+# A version directory is written under a temporary name and renamed into place before
+# LATEST moves, so readers never see a partial snapshot. Arrow files are memory-mapped:
+# row data stays in the OS page cache, shared by every worker process, and is only
+# copied when rows are returned. Flat table paths are sorted on flat.SORT_COLUMNS so
+# keyset cursors work the same as against SQL. pyarrow is imported on first use.
+# Lineage written after an export started makes that snapshot stale: reads go back to
+# SQL Server until the next export, in every worker, since STALE is a file.
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services.lineage.events import on_lineage_change
+from app.services.lineage.flat import SORT_COLUMNS, decode_cursor, encode_cursor
+from app.services.lineage.materialize import (
+    FLAT_COLUMN_COLUMNS,
+    FLAT_TABLE_COLUMNS,
+    flat_column_relation,
+    flat_table_relation,
+)
+
+LATEST_FILE = "LATEST"
+MANIFEST_FILE = "manifest.json"
+STALE_FILE = "STALE"
+VERSION_FORMAT = "%Y%m%dT%H%M%S%fZ"
+
+# Rows per Arrow record batch in the exported files
+EXPORT_BATCH_ROWS = 65536
+# Rows filtered at a time when paging or streaming from a snapshot
+SCAN_WINDOW_ROWS = 8192
+
+_AUDIT_DATETIME = ("record_insert_datetime", "timestamp")
+
+# name -> (relation, [(column, type)], sort columns); relation is a table name or a
+# function of the session, like flat_table_relation
+EXPORT_TABLES = {
+    "table_map": (
+        "aud.table_map",
+        [("id", "int32"), ("proc_id", "int32"), ("dest_db", "string"), ("dest_schema", "string"),
+         ("dest_table", "string"), _AUDIT_DATETIME],
+        None,
+    ),
+    "table_source": (
+        "aud.table_source",
+        [("id", "int32"), ("table_map_id", "int32"), ("src_db", "string"), ("src_schema", "string"),
+         ("src_table", "string"), ("role", "string"), ("join_predicate", "string"), _AUDIT_DATETIME],
+        None,
+    ),
+    "column_map": (
+        "aud.column_map",
+        [("id", "int32"), ("table_source_id", "int32"), ("dest_column", "string"), ("src_column", "string"),
+         ("transform_expr", "string"), _AUDIT_DATETIME],
+        None,
+    ),
+    "flat_table_lineage": (
+        flat_table_relation,
+        [("lineage_id", "int32")] + [(c, "string") for c in FLAT_TABLE_COLUMNS if c != "lineage_id"],
+        SORT_COLUMNS,
+    ),
+    "flat_column_lineage": (
+        flat_column_relation,
+        [(c, "string") for c in FLAT_COLUMN_COLUMNS],
+        None,
+    ),
+}
+
+
+@lru_cache()
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _require_pyarrow():
+    if not pyarrow_available():
+        raise RuntimeError("Lineage snapshots need pyarrow; install it with `pip install pyarrow`")
+    import pyarrow
+    import pyarrow.ipc
+    return pyarrow
+
+
+def _schema(pa, columns):
+    types = {"int32": pa.int32(), "string": pa.string(), "timestamp": pa.timestamp("ms")}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _read_table(pa, db, relation: str, schema):
+    query = text(f"SELECT {', '.join(schema.names)} FROM {relation}")
+    result = db.execute(query, execution_options={"stream_results": True, "yield_per": EXPORT_BATCH_ROWS})
+    batches = [
+        pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*partition), schema)], schema=schema
+        )
+        for partition in result.partitions(EXPORT_BATCH_ROWS)
+    ]
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+def _write_latest(directory: str, version: str):
+    pointer = os.path.join(directory, LATEST_FILE)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+
+def read_latest_version(directory: str = None):
+    try:
+        with open(os.path.join(directory or settings.LINEAGE_EXPORT_DIR, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(directory: str = None) -> list[str]:
+    """Complete snapshot versions, oldest first."""
+    directory = directory or settings.LINEAGE_EXPORT_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.isfile(os.path.join(directory, name, MANIFEST_FILE))
+    )
+
+
+def _prune(directory: str, keep: int, latest: str):
+    # Linux keeps unlinked files readable for workers that still have them mapped
+    for version in list_versions(directory)[:-keep or None]:
+        if version != latest:
+            shutil.rmtree(os.path.join(directory, version), ignore_errors=True)
+
+
+def export_lineage_snapshot(db, directory: str = None, parquet: bool = None) -> dict:
+    """
+    Write table_map, table_source, column_map and both flat lineage relations to a new
+    snapshot version, point LATEST at it and drop versions beyond LINEAGE_EXPORT_KEEP.
+    Returns the manifest.
+    """
+    pa = _require_pyarrow()
+    directory = directory or settings.LINEAGE_EXPORT_DIR
+    parquet = settings.LINEAGE_EXPORT_PARQUET if parquet is None else parquet
+    started = time.perf_counter()
+    version = datetime.now(timezone.utc).strftime(VERSION_FORMAT)
+    staging = os.path.join(directory, f".{version}.tmp")
+    os.makedirs(staging)
+    try:
+        tables = {}
+        for name, (relation, columns, sort) in EXPORT_TABLES.items():
+            schema = _schema(pa, columns)
+            table = _read_table(pa, db, relation(db) if callable(relation) else relation, schema)
+            if sort:
+                table = table.sort_by([(column, "ascending") for column in sort])
+            with pa.OSFile(os.path.join(staging, f"{name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_table(table, max_chunksize=EXPORT_BATCH_ROWS)
+            if parquet:
+                import pyarrow.parquet
+                pyarrow.parquet.write_table(table, os.path.join(staging, f"{name}.parquet"), compression="zstd")
+            tables[name] = {"rows": table.num_rows, "columns": schema.names}
+        manifest = {
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "formats": ["arrow", "parquet"] if parquet else ["arrow"],
+            "tables": tables,
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, os.path.join(directory, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _write_latest(directory, version)
+    _prune(directory, settings.LINEAGE_EXPORT_KEEP, version)
+    return {**manifest, "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
+
+class LineageSnapshot:
+    """One exported version; each table is memory-mapped the first time it is used."""
+
+    def __init__(self, directory: str, version: str):
+        self.version = version
+        self.path = os.path.join(directory, version)
+        with open(os.path.join(self.path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name: str):
+        if name not in self._tables:
+            pa = _require_pyarrow()
+            with self._lock:
+                if name not in self._tables:
+                    source = pa.memory_map(os.path.join(self.path, f"{name}.arrow"), "r")
+                    self._tables[name] = pa.ipc.open_file(source).read_all()
+        return self._tables[name]
+
+    # Flat table lineage, same filters and cursors as flat.py
+
+    def _after_cursor(self, table, cursor: str) -> int:
+        """Index of the first row sorting after the cursor's key (binary search on SORT_COLUMNS)."""
+        key = decode_cursor(cursor)
+        columns = [table.column(c) for c in SORT_COLUMNS]
+        lo, hi = 0, table.num_rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if [column[mid].as_py() for column in columns] <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_flat_rows(self, layer: str = None, schema: str = None, cursor: str = None):
+        """Yield flat table lineage rows as dicts in SORT_COLUMNS order."""
+        import pyarrow.compute as pc
+
+        table = self.table("flat_table_lineage")
+        start = self._after_cursor(table, cursor) if cursor else 0
+        for offset in range(start, table.num_rows, SCAN_WINDOW_ROWS):
+            window = table.slice(offset, SCAN_WINDOW_ROWS)
+            mask = None
+            if layer:
+                mask = pc.not_equal(window[f"{layer}_table"], "")
+            if schema:
+                schema_mask = None
+                for l in ([layer] if layer else ("stage", "bronze", "silver", "gold")):
+                    match = pc.equal(window[f"{l}_schema"], schema)
+                    schema_mask = match if schema_mask is None else pc.or_(schema_mask, match)
+                mask = schema_mask if mask is None else pc.and_(mask, schema_mask)
+            if mask is not None:
+                window = window.filter(mask)
+            yield from window.to_pylist()
+
+    def fetch_flat_page(self, limit: int, layer: str = None, schema: str = None, cursor: str = None) -> dict:
+        rows = list(islice(self.iter_flat_rows(layer, schema, cursor), limit + 1))
+        items = rows[:limit]
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(items[-1]) if len(rows) > limit else None,
+        }
+
+    def table_hops(self, src_layer: str, dest_layer: str) -> list[dict]:
+        """{src,dest}_{db,schema,table} of every flat path that runs through both layers."""
+        import pyarrow.compute as pc
+
+        table = self.table("flat_table_lineage")
+        mask = pc.and_(pc.not_equal(table[f"{src_layer}_db"], ""), pc.not_equal(table[f"{dest_layer}_db"], ""))
+        columns = [f"{layer}_{part}" for layer in (src_layer, dest_layer) for part in ("db", "schema", "table")]
+        return table.filter(mask).select(columns).to_pylist()
+
+    # Flat column lineage
+
+    def column_lineage(self, column_name: str) -> list[dict]:
+        """Column paths where any layer's column equals column_name, case-insensitively."""
+        import pyarrow.compute as pc
+
+        table = self.table("flat_column_lineage")
+        wanted = column_name.lower()
+        mask = None
+        for layer in ("stage", "bronze", "silver", "gold"):
+            match = pc.equal(pc.utf8_lower(table[f"{layer}_column"]), wanted)
+            mask = match if mask is None else pc.or_(mask, match)
+        return table.filter(mask).to_pylist()
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "tables": self.manifest["tables"],
+            "mapped": sorted(self._tables),
+        }
+
+
+_snapshot = None
+_checked_at = None
+_snapshot_lock = threading.Lock()
+
+
+def _written_since(directory: str, version: str) -> bool:
+    """Whether lineage was written after this version's export started."""
+    try:
+        written_at = os.path.getmtime(os.path.join(directory, STALE_FILE))
+    except FileNotFoundError:
+        return False
+    started_at = datetime.strptime(version, VERSION_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    return written_at >= started_at
+
+
+def get_lineage_snapshot(directory: str = None):
+    """
+    The latest snapshot, or None if nothing was exported yet or lineage was written
+    since. LATEST is re-read at most every LINEAGE_SNAPSHOT_CHECK_SECONDS, so every
+    worker moves to a new export on its own.
+    """
+    global _snapshot, _checked_at
+    directory = directory or settings.LINEAGE_EXPORT_DIR
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < settings.LINEAGE_SNAPSHOT_CHECK_SECONDS:
+        return _snapshot
+    with _snapshot_lock:
+        _checked_at = now
+        version = read_latest_version(directory)
+        if version is None or _written_since(directory, version):
+            _snapshot = None
+        elif _snapshot is None or _snapshot.version != version or _snapshot.path != os.path.join(directory, version):
+            _snapshot = LineageSnapshot(directory, version)
+    return _snapshot
+
+
+@on_lineage_change
+def _mark_snapshot_stale(db, table_map_ids):
+    global _checked_at
+    if not settings.LINEAGE_READ_FROM_SNAPSHOT:
+        return
+    directory = settings.LINEAGE_EXPORT_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, STALE_FILE), "w") as f:
+        f.write(datetime.now(timezone.utc).isoformat())
+    # This worker stops serving the snapshot right away; the others within a check interval
+    _checked_at = None
+
+
+def read_snapshot():
+    """The snapshot to serve reads from when LINEAGE_READ_FROM_SNAPSHOT is on, else None."""
+    if not settings.LINEAGE_READ_FROM_SNAPSHOT or not pyarrow_available():
+        return None
+    try:
+        return get_lineage_snapshot()
+    except (OSError, ValueError) as ex:
+        # Fall back to SQL Server rather than failing reads
+        logging.error(f"Could not open the latest lineage snapshot: {ex}")
+        return None
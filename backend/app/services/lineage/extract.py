@@ -1,12 +1,13 @@
 from sqlalchemy import text
 import os
 from dotenv import load_dotenv
-from sqlglot import exp
-from sqlglot.lineage import lineage
 from app.services.lineage.source_sqlserver import fetch_procedures
 from app.services.lineage.models import ProcMetadata, TableMap, TableSource, ColumnMapping
 from app.services.lineage.persist import insert_proc_metadata
 from app.core.config import settings
+from app.services.lineage.catalog import get_catalog
+from app.services.lineage.matching import load_layer_tables, match_stage_to_bronze
+from app.services.lineage.metadata import LAYER_DBS
 
 load_dotenv()
 
@@ -17,39 +18,48 @@ GOLD_DB = settings.GOLD_DB
 
 def extract_stage_to_bronze_mappings(db):
     """
-    Identify tables that exist in both stage and bronze layers based on table name matching.
-    This mapping assumes consistent naming conventions across both layers.
+    Pair each bronze table with the stage table that feeds it. Names are compared after
+    the MATCH_* normalization rules (prefixes, suffixes, casing), near-misses are scored
+    on name and column overlap, and the best match per bronze table is kept (every
+    identically named one, as before). Bronze tables without a match get stage None.
     """
     if not STAGE_DB or not BRONZE_DB:
         raise ValueError("STAGE_DB or BRONZE_DB is not set in environment variables.")
 
-    query = text(f"""
-        SELECT 
-            s.table_schema AS stage_schema,
-            s.table_name AS stage_table_name,
-            b.table_schema AS bronze_schema,
-            b.table_name AS bronze_table_name
-        FROM [{BRONZE_DB}].information_schema.tables b
-        LEFT JOIN [{STAGE_DB}].information_schema.tables s
-            ON s.table_name = b.table_name
-    """)
-
-    result = db.execute(query).fetchall()
-
-    return [
-        {
-            "stage_schema": row.stage_schema,
-            "stage_table_name": row.stage_table_name,
-            "bronze_schema": row.bronze_schema,
-            "bronze_table_name": row.bronze_table_name,
-        }
-        for row in result
-    ]
+    best = {}
+    for match in match_stage_to_bronze(db):
+        if match["rank"] == 1 or match["match"] == "exact":
+            best.setdefault((match["bronze_schema"], match["bronze_table_name"]), []).append(match)
+
+    mappings = []
+    for bronze_schema, bronze_table, _ in load_layer_tables(db, "bronze"):
+        for match in best.get((bronze_schema, bronze_table)) or [None]:
+            mappings.append({
+                "stage_schema": match["stage_schema"] if match else None,
+                "stage_table_name": match["stage_table_name"] if match else None,
+                "bronze_schema": bronze_schema,
+                "bronze_table_name": bronze_table,
+                "match": match["match"] if match else None,
+                "confidence": match["confidence"] if match else None,
+            })
+    return mappings
 
 def extract_table_sources_from_db(db, database_name):
     """
     Extract table sources from the given database's information_schema.tables.
     """
+    layer = {db_name: layer for layer, db_name in LAYER_DBS.items()}.get(database_name)
+    if layer and settings.CATALOG_SNAPSHOT_ENABLED:
+        return [
+            {
+                "src_db": database_name,
+                "src_schema": table_schema,
+                "src_table": table_name,
+                "role": "destination"
+            }
+            for _, table_schema, table_name, _, _ in get_catalog(db).tables(layer, "BASE TABLE")
+        ]
+
     query = text(f"""
         SELECT
             table_schema,
@@ -118,6 +128,9 @@ def extract_silver_gold_mappings(db):
     ]
 
 if __name__ == "__main__":
+    from sqlglot import exp
+    from sqlglot.lineage import lineage
+
     procedures = fetch_procedures(limit=10)
 
     for proc_name, proc_text in procedures:
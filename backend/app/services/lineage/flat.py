@@ -0,0 +1,129 @@
+# backend/app/services/lineage/flat.py
+#
+# Keyset pagination and streaming over aud.vw_flat_table_lineage or its materialized
+# copy (see materialize.py). Pages are addressed by an opaque cursor holding the last
+# row's sort key, so a page never re-reads the rows before it the way OFFSET does, and
+# streaming reads rows in fixed-size partitions. Nothing indexes the full sort key (12
+# NVARCHAR(100) columns would pass SQL Server's 1700-byte index key limit), so each
+# page still sorts the rows that pass the layer/schema filter and the cursor predicate.
+import base64
+import csv
+import io
+import json
+
+from sqlalchemy import text
+
+from app.services.lineage.materialize import FLAT_TABLE_VIEW, flat_table_relation
+
+LAYERS = ("stage", "bronze", "silver", "gold")
+
+# Every column is ISNULL(..., '') in the view, so plain comparisons are safe.
+# lineage_id breaks ties between otherwise identical table paths.
+SORT_COLUMNS = [f"{layer}_{part}" for layer in LAYERS for part in ("db", "schema", "table")] + ["lineage_id"]
+FLAT_COLUMNS = ["lineage_id"] + SORT_COLUMNS[:-1]
+
+STREAM_PARTITION_SIZE = 1000
+
+
+def encode_cursor(row) -> str:
+    key = [row[c] for c in SORT_COLUMNS]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor from encode_cursor; raises ValueError if it is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != len(SORT_COLUMNS):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def _after_cursor_predicate() -> str:
+    # SQL Server has no row-value comparison, so (c1, c2, ...) > (k1, k2, ...) is
+    # expanded to c1 > k1 OR (c1 = k1 AND c2 > k2) OR ...
+    terms = []
+    for i, column in enumerate(SORT_COLUMNS):
+        equal = [f"{c} = :k{j}" for j, c in enumerate(SORT_COLUMNS[:i])]
+        terms.append("(" + " AND ".join(equal + [f"{column} > :k{i}"]) + ")")
+    return "(" + "\n            OR ".join(terms) + ")"
+
+
+AFTER_CURSOR = _after_cursor_predicate()
+
+
+def build_flat_query(layer: str = None, schema: str = None, cursor: str = None, limit: int = None, relation: str = FLAT_TABLE_VIEW):
+    """
+    Build the flat lineage query and its parameters against relation (the view or its
+    materialized table).
+    layer keeps rows that reach that layer; schema matches that layer's schema, or any
+    layer's schema when no layer is given.
+    """
+    if layer and layer not in LAYERS:
+        raise ValueError(f"layer must be one of {', '.join(LAYERS)}")
+
+    where, params = [], {}
+    if layer:
+        where.append(f"{layer}_table <> ''")
+    if schema:
+        layers = [layer] if layer else LAYERS
+        where.append("(" + " OR ".join(f"{l}_schema = :schema" for l in layers) + ")")
+        params["schema"] = schema
+    if cursor:
+        where.append(AFTER_CURSOR)
+        params.update({f"k{i}": value for i, value in enumerate(decode_cursor(cursor))})
+
+    top = ""
+    if limit:
+        top = "TOP (:limit) "
+        params["limit"] = limit
+
+    query = text(f"""
+        SELECT {top}
+            {", ".join(FLAT_COLUMNS)}
+        FROM {relation}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {", ".join(SORT_COLUMNS)}
+    """)
+    return query, params
+
+
+def fetch_flat_page(db, limit: int, layer: str = None, schema: str = None, cursor: str = None) -> dict:
+    """One page of flat lineage: {"items": [...], "next_cursor": str | None}."""
+    # Ask for one extra row to know whether there is another page
+    query, params = build_flat_query(layer, schema, cursor, limit + 1, flat_table_relation(db))
+    rows = db.execute(query, params).mappings().all()
+    items = [dict(r) for r in rows[:limit]]
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1]) if len(rows) > limit else None,
+    }
+
+
+def iter_flat_rows(db, layer: str = None, schema: str = None, cursor: str = None):
+    """Yield flat lineage rows as dicts, reading STREAM_PARTITION_SIZE rows at a time."""
+    query, params = build_flat_query(layer, schema, cursor, relation=flat_table_relation(db))
+    result = db.execute(query, params, execution_options={"stream_results": True, "yield_per": STREAM_PARTITION_SIZE})
+    for partition in result.mappings().partitions():
+        for row in partition:
+            yield dict(row)
+
+
+def rows_to_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+def rows_to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FLAT_COLUMNS)
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % STREAM_PARTITION_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
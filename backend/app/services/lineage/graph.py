@@ -0,0 +1,291 @@
+# backend/app/services/lineage/graph.py
+#
+# In-process lineage graph built from aud.table_map, aud.table_source and aud.column_map.
+# Tables and columns are interned to compact integer node ids with forward/reverse
+# adjacency arrays, so upstream/downstream closure, shortest path and impact radius are
+# answered from memory instead of LIKE scans over the flat lineage views. Impact queries
+# read the precomputed transitive closure (closure.py), kept up to date as edges arrive.
+from array import array
+from collections import deque
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+from app.core.config import settings
+from app.services.lineage.closure import TransitiveClosure
+from app.services.lineage.events import on_lineage_change
+
+# Stay well below SQL Server's 2100 parameter limit
+REFRESH_CHUNK_SIZE = 1000
+
+# More new edges than this since the last impact query rebuild the closure instead of
+# applying each edge (an edge costs one pass over its component's bitsets)
+CLOSURE_MAX_PENDING_EDGES = 500
+
+TABLE_EDGES_SQL = """
+    SELECT tm.id AS table_map_id,
+           ts.src_db, ts.src_schema, ts.src_table,
+           tm.dest_db, tm.dest_schema, tm.dest_table
+    FROM aud.table_source ts
+    JOIN aud.table_map tm ON ts.table_map_id = tm.id
+"""
+
+COLUMN_EDGES_SQL = """
+    SELECT tm.id AS table_map_id,
+           ts.src_db, ts.src_schema, ts.src_table, cm.src_column,
+           tm.dest_db, tm.dest_schema, tm.dest_table, cm.dest_column
+    FROM aud.column_map cm
+    JOIN aud.table_source ts ON cm.table_source_id = ts.id
+    JOIN aud.table_map tm ON ts.table_map_id = tm.id
+"""
+
+
+def node_key(*parts) -> tuple:
+    """Normalized node key: (db, schema, table) for tables, plus column for columns."""
+    return tuple((p or "").strip().lower() for p in parts)
+
+
+def parse_node(node: str) -> tuple:
+    """Parse 'db.schema.table' or 'db.schema.table.column' into a node key."""
+    parts = [p.strip("[] ") for p in node.split(".")]
+    if len(parts) not in (3, 4):
+        raise ValueError("Node must be 'db.schema.table' or 'db.schema.table.column'")
+    return node_key(*parts)
+
+
+def format_node(key: tuple) -> str:
+    return ".".join(key)
+
+
+class LineageGraph:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = {}        # node key -> id
+        self._keys = []       # id -> node key
+        self._out = []        # id -> array of downstream ids
+        self._in = []         # id -> array of upstream ids
+        self._edges = set()   # (src_id << 32) | dest_id, for de-duplication
+        self._columns = {}    # table key -> column node ids
+        self._closure = None  # built on the first impact query
+        self._pending = []    # edges added since, applied on the next impact query
+        self.loaded_at = None
+
+    # Building
+
+    def _intern(self, key: tuple) -> int:
+        node_id = self._ids.get(key)
+        if node_id is None:
+            node_id = len(self._keys)
+            self._ids[key] = node_id
+            self._keys.append(key)
+            self._out.append(array("i"))
+            self._in.append(array("i"))
+            if len(key) == 4:
+                self._columns.setdefault(key[:3], []).append(node_id)
+        return node_id
+
+    def add_edge(self, src: tuple, dest: tuple) -> bool:
+        if src == dest:
+            return False  # tables registered as their own source
+        with self._lock:
+            s, d = self._intern(src), self._intern(dest)
+            edge = (s << 32) | d
+            if edge in self._edges:
+                return False
+            self._edges.add(edge)
+            self._out[s].append(d)
+            self._in[d].append(s)
+            if self._closure is not None:
+                self._pending.append((s, d))
+            return True
+
+    def _load_edges(self, db, table_map_ids=None) -> int:
+        added = 0
+        for sql, width in ((TABLE_EDGES_SQL, 3), (COLUMN_EDGES_SQL, 4)):
+            if table_map_ids is None:
+                batches = [db.execute(text(sql)).fetchall()]
+            else:
+                query = text(sql + " WHERE tm.id IN :ids").bindparams(bindparam("ids", expanding=True))
+                batches = (
+                    db.execute(query, {"ids": table_map_ids[i:i + REFRESH_CHUNK_SIZE]}).fetchall()
+                    for i in range(0, len(table_map_ids), REFRESH_CHUNK_SIZE)
+                )
+            for rows in batches:
+                for row in rows:
+                    added += self.add_edge(node_key(*row[1:1 + width]), node_key(*row[1 + width:]))
+        return added
+
+    def load(self, db):
+        """Rebuild the whole graph from the aud tables."""
+        graph = LineageGraph()
+        graph._load_edges(db)
+        with self._lock:
+            self._ids, self._keys = graph._ids, graph._keys
+            self._out, self._in, self._edges = graph._out, graph._in, graph._edges
+            self._columns, self._closure, self._pending = graph._columns, None, []
+            self.loaded_at = time.time()
+        return self
+
+    def refresh(self, db, table_map_ids: list[int]) -> int:
+        """Add edges written for the given table_map ids. Returns the number of new edges."""
+        with self._lock:
+            return self._load_edges(db, list(table_map_ids))
+
+    # Queries
+
+    def node_id(self, key: tuple):
+        return self._ids.get(key)
+
+    def _walk(self, start: int, adjacency, max_depth: int = None):
+        """
+        BFS from start; yields (node_id, depth) for every reachable node except start.
+        Callers hold self._lock while consuming it, so add_edge and load can't change
+        the graph underneath the walk.
+        """
+        seen = bytearray(len(self._keys))
+        seen[start] = 1
+        queue = deque([(start, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for nxt in adjacency[node]:
+                if not seen[nxt]:
+                    seen[nxt] = 1
+                    yield nxt, depth + 1
+                    queue.append((nxt, depth + 1))
+
+    def upstream(self, key: tuple, max_depth: int = None) -> list[dict]:
+        with self._lock:
+            start = self._ids.get(key)
+            if start is None:
+                return []
+            return [{"node": format_node(self._keys[n]), "depth": d} for n, d in self._walk(start, self._in, max_depth)]
+
+    def downstream(self, key: tuple, max_depth: int = None) -> list[dict]:
+        with self._lock:
+            start = self._ids.get(key)
+            if start is None:
+                return []
+            return [{"node": format_node(self._keys[n]), "depth": d} for n, d in self._walk(start, self._out, max_depth)]
+
+    def shortest_path(self, src: tuple, dest: tuple):
+        """
+        Shortest lineage path between two nodes, in data-flow order. Returns
+        (path, "downstream") when dest is fed by src, (path, "upstream") when src is
+        fed by dest, or None if they are not connected.
+        """
+        with self._lock:
+            s, d = self._ids.get(src), self._ids.get(dest)
+            if s is None or d is None:
+                return None
+            for a, b, direction in ((s, d, "downstream"), (d, s, "upstream")):
+                parent = {a: -1}
+                queue = deque([a])
+                while queue:
+                    node = queue.popleft()
+                    if node == b:
+                        path = []
+                        while node != -1:
+                            path.append(format_node(self._keys[node]))
+                            node = parent[node]
+                        path.reverse()
+                        return path, direction
+                    for nxt in self._out[node]:
+                        if nxt not in parent:
+                            parent[nxt] = node
+                            queue.append(nxt)
+            return None
+
+    def impact(self, key: tuple, max_depth: int = None) -> dict:
+        """Summarize the downstream closure: count, radius (max depth) and per-database counts."""
+        with self._lock:
+            start = self._ids.get(key)
+            if start is None:
+                return {"node": format_node(key), "found": False, "dependents": 0, "radius": 0, "by_db": {}, "by_depth": {}}
+            by_db, by_depth = {}, {}
+            count = radius = 0
+            for n, depth in self._walk(start, self._out, max_depth):
+                count += 1
+                radius = max(radius, depth)
+                db_name = self._keys[n][0]
+                by_db[db_name] = by_db.get(db_name, 0) + 1
+                by_depth[depth] = by_depth.get(depth, 0) + 1
+        return {"node": format_node(key), "found": True, "dependents": count, "radius": radius, "by_db": by_db, "by_depth": by_depth}
+
+    def closure(self) -> TransitiveClosure:
+        """The transitive closure, built on first use and brought up to date with new edges."""
+        with self._lock:
+            if self._closure is None or len(self._pending) > CLOSURE_MAX_PENDING_EDGES:
+                self._closure = TransitiveClosure(settings.LINEAGE_CLOSURE_MAX_COMPONENT).build(self._out, self._in)
+            else:
+                for s, d in self._pending:
+                    self._closure.add_edge(s, d, len(self._keys))
+            self._pending = []
+            return self._closure
+
+    def _dependents(self, start: int) -> list[int]:
+        ids = self.closure().descendants(start)
+        if ids is None:
+            ids = [n for n, _ in self._walk(start, self._out)]
+        return ids
+
+    def dependents(self, key: tuple) -> dict:
+        """
+        Every table and column downstream of a table or column, read from the transitive
+        closure. For a table this includes everything downstream of its columns.
+        """
+        with self._lock:
+            starts = [self._ids[key]] if key in self._ids else []
+            if len(key) == 3:
+                starts += self._columns.get(key, [])
+            if not starts:
+                return {"node": format_node(key), "found": False, "tables": [], "columns": [], "tables_by_db": {}}
+            found = set()
+            for start in starts:
+                found.update(self._dependents(start))
+            keys = [self._keys[n] for n in found]
+        tables = {k[:3] for k in keys}
+        columns = sorted(k for k in keys if len(k) == 4)
+        tables_by_db = {}
+        for table in tables:
+            tables_by_db[table[0]] = tables_by_db.get(table[0], 0) + 1
+        return {
+            "node": format_node(key),
+            "found": True,
+            "tables": [format_node(t) for t in sorted(tables)],
+            "columns": [format_node(c) for c in columns],
+            "tables_by_db": tables_by_db,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            columns = sum(1 for k in self._keys if len(k) == 4)
+            return {
+                "nodes": len(self._keys),
+                "table_nodes": len(self._keys) - columns,
+                "column_nodes": columns,
+                "edges": len(self._edges),
+                "loaded_at": self.loaded_at,
+                "closure": self._closure.stats() if self._closure is not None else None,
+            }
+
+
+_graph = LineageGraph()
+
+
+def get_lineage_graph(db) -> LineageGraph:
+    """The process-wide graph, loaded from the database on first use."""
+    if _graph.loaded_at is None:
+        with _graph._lock:
+            if _graph.loaded_at is None:
+                _graph.load(db)
+    return _graph
+
+
+@on_lineage_change
+def _refresh_graph(db, table_map_ids):
+    # Only worth refreshing once something has asked for the graph
+    if _graph.loaded_at is not None:
+        _graph.refresh(db, table_map_ids)
@@ -0,0 +1,351 @@
+# backend/app/services/lineage/jobs.py
+#
+# Background jobs for the long-running lineage operations (populate, analyze-all,
+# discovery, table loads). Jobs and their per-item checkpoints live in aud.job and
+# aud.job_item, so status survives restarts and a job that died mid-way resumes with
+# only its unfinished items. Handlers register with @job_handler and receive a
+# JobContext; the SQL is kept dialect-neutral so a SQLite stand-in works too.
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import bindparam, text
+
+from app.core.config import settings
+
+_handlers = {}
+
+
+def job_handler(job_type: str):
+    """Register handler(ctx) for job_type; its return value is stored as the job result."""
+    def register(handler):
+        _handlers[job_type] = handler
+        return handler
+    return register
+
+
+def job_types() -> list[str]:
+    return sorted(_handlers)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobFailed(Exception):
+    """Raised by a handler that finished but failed; result is still stored with the job."""
+
+    def __init__(self, message: str, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobContext:
+    """What a handler sees of its job: params, a session, and item checkpointing."""
+
+    def __init__(self, db, job_id: str, params: dict):
+        self.db = db
+        self.job_id = job_id
+        self.params = params
+
+    def add_items(self, keys) -> list[str]:
+        """
+        Register the job's work items and return the keys still pending, in the given
+        order. On a resumed job, items finished by the earlier run are left out; items
+        that failed were put back to pending by resume().
+        """
+        keys = list(dict.fromkeys(str(k) for k in keys))
+        known = {
+            row.item_key: row.status
+            for row in self.db.execute(
+                text("SELECT item_key, status FROM aud.job_item WHERE job_id = :job_id"), {"job_id": self.job_id}
+            )
+        }
+        new = [{"job_id": self.job_id, "item_key": k, "now": datetime.now()} for k in keys if k not in known]
+        if new:
+            self.db.execute(text("""
+                INSERT INTO aud.job_item (job_id, item_key, status, updated_datetime)
+                VALUES (:job_id, :item_key, 'pending', :now)
+            """), new)
+        self.db.execute(
+            text("UPDATE aud.job SET total_items = (SELECT COUNT(*) FROM aud.job_item WHERE job_id = :job_id) WHERE job_id = :job_id"),
+            {"job_id": self.job_id},
+        )
+        self.db.commit()
+        return [k for k in keys if known.get(k, "pending") == "pending"]
+
+    def item_keys(self, status: str = None) -> list[str]:
+        where = "AND status = :status" if status else ""
+        return self.db.execute(
+            text(f"SELECT item_key FROM aud.job_item WHERE job_id = :job_id {where} ORDER BY item_key"),
+            {"job_id": self.job_id, "status": status},
+        ).scalars().all()
+
+    def checkpoint(self, results: dict):
+        """
+        Record finished items ({item_key: (status, detail)}, status 'done' or 'error'),
+        refresh the job's counters and heartbeat, and commit. Raises JobCancelled if a
+        cancel was requested.
+        """
+        now = datetime.now()
+        if results:
+            self.db.execute(text("""
+                UPDATE aud.job_item
+                SET status = :status, detail = :detail, updated_datetime = :now
+                WHERE job_id = :job_id AND item_key = :item_key
+            """), [
+                {"job_id": self.job_id, "item_key": str(k), "status": status, "detail": detail, "now": now}
+                for k, (status, detail) in results.items()
+            ])
+        self.db.execute(text("""
+            UPDATE aud.job
+            SET done_items = (SELECT COUNT(*) FROM aud.job_item WHERE job_id = :job_id AND status = 'done'),
+                failed_items = (SELECT COUNT(*) FROM aud.job_item WHERE job_id = :job_id AND status = 'error'),
+                heartbeat_datetime = :now
+            WHERE job_id = :job_id
+        """), {"job_id": self.job_id, "now": now})
+        self.db.commit()
+        self.raise_if_cancelled()
+
+    def raise_if_cancelled(self):
+        cancel = self.db.execute(
+            text("SELECT cancel_requested FROM aud.job WHERE job_id = :job_id"), {"job_id": self.job_id}
+        ).scalar()
+        if cancel:
+            raise JobCancelled()
+
+
+def _job_dict(row) -> dict:
+    job = dict(row)
+    for column in ("params_json", "result_json"):
+        value = job.pop(column)
+        job[column[:-len("_json")]] = json.loads(value) if value else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+JOB_COLUMNS = """
+    job_id, job_type, status, params_json, result_json, error, total_items, done_items,
+    failed_items, cancel_requested, created_datetime, started_datetime, heartbeat_datetime,
+    finished_datetime
+"""
+
+
+class JobRunner:
+    """
+    Runs jobs on a bounded thread pool. Each run gets its own session from
+    session_factory; a heartbeat thread keeps running jobs from looking abandoned.
+    """
+
+    def __init__(self, session_factory, max_workers: int = None):
+        self.session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or settings.JOB_MAX_WORKERS, thread_name_prefix="job")
+        self._active = set()
+        self._lock = threading.Lock()
+        self._heartbeat = None
+
+    def submit(self, db, job_type: str, params: dict = None) -> str:
+        """Queue a job and start it as soon as a worker is free. Returns the job id."""
+        if job_type not in _handlers:
+            raise ValueError(f"Unknown job type '{job_type}'; expected one of {', '.join(job_types())}")
+        job_id = uuid.uuid4().hex
+        db.execute(text("""
+            INSERT INTO aud.job (job_id, job_type, status, params_json, total_items, done_items,
+                                 failed_items, cancel_requested, created_datetime)
+            VALUES (:job_id, :job_type, 'queued', :params_json, 0, 0, 0, 0, :now)
+        """), {"job_id": job_id, "job_type": job_type, "params_json": json.dumps(params or {}), "now": datetime.now()})
+        db.commit()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, db, job_id: str, include_items: bool = False):
+        row = db.execute(text(f"SELECT {JOB_COLUMNS} FROM aud.job WHERE job_id = :job_id"), {"job_id": job_id}).mappings().first()
+        if row is None:
+            return None
+        job = _job_dict(row)
+        if include_items:
+            job["items"] = [
+                dict(r) for r in db.execute(text("""
+                    SELECT item_key, status, detail, updated_datetime
+                    FROM aud.job_item WHERE job_id = :job_id ORDER BY item_key
+                """), {"job_id": job_id}).mappings()
+            ]
+        return job
+
+    def list_jobs(self, db, status: str = None, limit: int = 50) -> list[dict]:
+        where = "WHERE status = :status" if status else ""
+        rows = db.execute(
+            text(f"SELECT {JOB_COLUMNS} FROM aud.job {where} ORDER BY created_datetime DESC"), {"status": status}
+        ).mappings()
+        return [_job_dict(r) for _, r in zip(range(limit), rows)]
+
+    def cancel(self, db, job_id: str) -> bool:
+        """Ask a job to stop at its next checkpoint; a queued job is cancelled right away."""
+        updated = db.execute(text("""
+            UPDATE aud.job SET cancel_requested = 1
+            WHERE job_id = :job_id AND status IN ('queued', 'running')
+        """), {"job_id": job_id}).rowcount
+        db.execute(text("""
+            UPDATE aud.job SET status = 'cancelled', finished_datetime = :now
+            WHERE job_id = :job_id AND status = 'queued'
+        """), {"job_id": job_id, "now": datetime.now()})
+        db.commit()
+        return bool(updated)
+
+    def resume(self, db, job_id: str) -> bool:
+        """
+        Re-queue a failed or cancelled job, or a succeeded one with failed items; it
+        continues with its unfinished items and retries the ones that failed.
+        """
+        updated = db.execute(text("""
+            UPDATE aud.job
+            SET status = 'queued', cancel_requested = 0, error = NULL, finished_datetime = NULL, failed_items = 0
+            WHERE job_id = :job_id
+              AND (status IN ('failed', 'cancelled') OR (status = 'succeeded' AND failed_items > 0))
+        """), {"job_id": job_id}).rowcount
+        if updated:
+            db.execute(text("""
+                UPDATE aud.job_item SET status = 'pending', detail = NULL, updated_datetime = :now
+                WHERE job_id = :job_id AND status = 'error'
+            """), {"job_id": job_id, "now": datetime.now()})
+        db.commit()
+        if updated:
+            self._executor.submit(self._run, job_id)
+        return bool(updated)
+
+    def resume_abandoned(self) -> list[str]:
+        """
+        Pick up queued jobs and running jobs whose heartbeat went stale (their process
+        died). Called at startup. A stale job that was asked to cancel is marked
+        cancelled instead, since no worker will ever claim it.
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.now()
+            db.execute(text("""
+                UPDATE aud.job SET status = 'cancelled', finished_datetime = :now
+                WHERE status = 'running' AND cancel_requested = 1 AND heartbeat_datetime < :stale
+            """), {"now": now, "stale": self._stale_before()})
+            db.commit()
+            job_ids = db.execute(text("""
+                SELECT job_id FROM aud.job
+                WHERE status = 'queued' OR (status = 'running' AND heartbeat_datetime < :stale)
+                ORDER BY created_datetime
+            """), {"stale": self._stale_before()}).scalars().all()
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+        return job_ids
+
+    def _stale_before(self) -> datetime:
+        return datetime.now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+
+    def _claim(self, db, job_id: str) -> bool:
+        # Only one worker (in any process) wins the UPDATE for a given job
+        now = datetime.now()
+        claimed = db.execute(text("""
+            UPDATE aud.job
+            SET status = 'running', started_datetime = COALESCE(started_datetime, :now), heartbeat_datetime = :now
+            WHERE job_id = :job_id
+              AND cancel_requested = 0
+              AND (status = 'queued' OR (status = 'running' AND heartbeat_datetime < :stale))
+        """), {"job_id": job_id, "now": now, "stale": self._stale_before()}).rowcount
+        db.commit()
+        return claimed == 1
+
+    def _finish(self, db, job_id: str, status: str, result=None, error: str = None):
+        db.execute(text("""
+            UPDATE aud.job
+            SET status = :status, result_json = :result_json, error = :error,
+                finished_datetime = :now, heartbeat_datetime = :now
+            WHERE job_id = :job_id
+        """), {
+            "job_id": job_id,
+            "status": status,
+            "result_json": json.dumps(result, default=str) if result is not None else None,
+            "error": error,
+            "now": datetime.now(),
+        })
+        db.commit()
+
+    def _run(self, job_id: str):
+        db = self.session_factory()
+        try:
+            if not self._claim(db, job_id):
+                return
+            with self._lock:
+                self._active.add(job_id)
+            self._start_heartbeat()
+            job = self.get(db, job_id)
+            ctx = JobContext(db, job_id, job["params"] or {})
+            try:
+                result = _handlers[job["job_type"]](ctx)
+            except JobCancelled:
+                db.rollback()
+                self._finish(db, job_id, "cancelled")
+            except JobFailed as ex:
+                db.rollback()
+                self._finish(db, job_id, "failed", ex.result, error=str(ex))
+            except Exception as ex:
+                db.rollback()
+                logging.error(f"Job {job_id} ({job['job_type']}) failed: {ex}\n{traceback.format_exc()}")
+                self._finish(db, job_id, "failed", error=str(ex))
+            else:
+                self._finish(db, job_id, "succeeded", result)
+        except Exception as ex:
+            logging.error(f"Job {job_id} could not be run: {ex}\n{traceback.format_exc()}")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+            db.close()
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        # Long handler steps (e.g. a single discovery call) don't checkpoint, so the
+        # runner keeps the heartbeat of its own jobs fresh
+        while True:
+            time.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                active = sorted(self._active)
+            if not active:
+                continue
+            db = self.session_factory()
+            try:
+                db.execute(
+                    text("UPDATE aud.job SET heartbeat_datetime = :now WHERE job_id IN :job_ids").bindparams(
+                        bindparam("job_ids", expanding=True)
+                    ),
+                    {"now": datetime.now(), "job_ids": active},
+                )
+                db.commit()
+            except Exception as ex:
+                logging.error(f"Job heartbeat failed: {ex}")
+            finally:
+                db.close()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Process-wide runner on the app's SessionLocal."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                from app.core.database import SessionLocal
+                _runner = JobRunner(SessionLocal)
+    return _runner
@@ -0,0 +1,288 @@
+# backend/app/services/lineage/matching.py
+#
+# Stage -> bronze table matching. Both layers' tables are loaded into columnar arrays,
+# names are normalized with configurable prefix/suffix rules, and candidate pairs come
+# from two blocking passes: identical normalized names, and LSH buckets over MinHash
+# signatures of name trigrams (catches near-misses like cust_addr / customer_address).
+# Candidates are then scored in one vectorized batch: MinHash estimates of name-trigram
+# and column-set Jaccard similarity, blended into a confidence score.
+#
+# numpy is optional. Without it only identical normalized names are matched, with
+# exact column-set Jaccard computed in Python.
+import re
+from functools import lru_cache
+from itertools import chain
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services.lineage.catalog import get_catalog
+from app.services.lineage.metadata import LAYER_DBS
+
+np = None  # numpy, once numpy_available() has loaded it
+
+
+@lru_cache()
+def numpy_available() -> bool:
+    # Imported on first match rather than at app startup
+    global np
+    try:
+        import numpy as np
+        return True
+    except ImportError:
+        return False
+
+
+_EMPTY = 1 << 32
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+
+class NameRules:
+    """Lower-cases a name, strips known layer prefixes/suffixes (repeatedly) and punctuation."""
+
+    def __init__(self, prefixes=None, suffixes=None):
+        prefixes = settings.MATCH_STRIP_PREFIXES if prefixes is None else prefixes
+        suffixes = settings.MATCH_STRIP_SUFFIXES if suffixes is None else suffixes
+        # Longest first, so stage_ wins over st_ style overlaps; never strip the whole name
+        alternatives = []
+        if prefixes:
+            alternatives.append("^(?:%s)+(?=.)" % "|".join(re.escape(p.lower()) for p in sorted(prefixes, key=len, reverse=True)))
+        if suffixes:
+            alternatives.append("(?<=.)(?:%s)+$" % "|".join(re.escape(x.lower()) for x in sorted(suffixes, key=len, reverse=True)))
+        self._affixes = re.compile("|".join(alternatives)) if alternatives else None
+
+    def normalize(self, name: str) -> str:
+        name = (name or "").lower()
+        if self._affixes:
+            name = self._affixes.sub("", name)
+        return _NON_ALNUM.sub("", name) or name
+
+
+@lru_cache(maxsize=100000)
+def normalize_column(name: str) -> str:
+    """CustomerID, customer_id and CUSTOMER_ID all compare equal."""
+    return _NON_ALNUM.sub("", (name or "").lower())
+
+
+def _trigrams(name: str) -> list[str]:
+    padded = f"^{name}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)] or [padded]
+
+
+class TableSet:
+    """One layer's tables as parallel arrays: schema, name, normalized name, column set."""
+
+    def __init__(self, tables, rules: NameRules):
+        self.schemas = [t[0] for t in tables]
+        self.names = [t[1] for t in tables]
+        self.normalized = [rules.normalize(t[1]) for t in tables]
+        self.columns = [list(set(map(normalize_column, filter(None, t[2])))) for t in tables]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def load_layer_tables(db, layer: str) -> list[tuple]:
+    """(schema, table, [column names]) for every table in a layer."""
+    if settings.CATALOG_SNAPSHOT_ENABLED:
+        return [(t[1], t[2], [c[0] for c in t[4]]) for t in get_catalog(db).tables(layer)]
+    rows = db.execute(text(f"""
+        SELECT t.TABLE_SCHEMA AS table_schema, t.TABLE_NAME AS table_name, c.COLUMN_NAME AS column_name
+        FROM [{LAYER_DBS[layer]}].INFORMATION_SCHEMA.TABLES t
+        LEFT JOIN [{LAYER_DBS[layer]}].INFORMATION_SCHEMA.COLUMNS c
+            ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+    """)).fetchall()
+    tables = {}
+    for row in rows:
+        entry = tables.setdefault((row.table_schema, row.table_name), [])
+        if row.column_name:
+            entry.append(row.column_name)
+    return [(schema, table, columns) for (schema, table), columns in tables.items()]
+
+
+def _permutations(count: int):
+    # Multiply-shift hashing: odd 64-bit multipliers, top 32 bits of the wrapped product
+    rng = np.random.default_rng(20240601)
+    a = rng.integers(0, 1 << 63, size=count, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=count, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(token_lists: list, permutations: int) -> "np.ndarray":
+    """
+    (len(token_lists), permutations) MinHash signatures. Rows for empty token lists are
+    all _EMPTY, which never equals a real (32-bit) hash value.
+    """
+    lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(token_lists))
+    signatures = np.full((len(token_lists), permutations), _EMPTY, dtype=np.uint64)
+    total = int(lengths.sum())
+    if not total:
+        return signatures
+    # Python's str hash is stable within the process, which is all a single match needs
+    hashes = (
+        np.fromiter(map(hash, chain.from_iterable(token_lists)), dtype=np.int64, count=total) & 0xFFFFFFFF
+    ).astype(np.uint64)
+    nonempty = lengths > 0
+    offsets = (np.cumsum(lengths) - lengths)[nonempty]
+    a, b = _permutations(permutations)
+    for k in range(permutations):
+        permuted = (a[k] * hashes + b[k]) >> np.uint64(32)
+        signatures[nonempty, k] = np.minimum.reduceat(permuted, offsets)
+    return signatures
+
+
+def _lsh_pairs(left_sig, right_sig, bands: int, max_bucket: int):
+    """(left, right) index pairs sharing at least one LSH band bucket."""
+    rows = left_sig.shape[1] // bands
+    multipliers = np.random.default_rng(7).integers(1, 1 << 61, size=rows, dtype=np.uint64)
+    pairs = []
+    for band in range(bands):
+        cols = slice(band * rows, (band + 1) * rows)
+        # uint64 arithmetic wraps, which is fine for a bucket key
+        left_keys = (left_sig[:, cols] * multipliers).sum(axis=1)
+        right_keys = (right_sig[:, cols] * multipliers).sum(axis=1)
+        order = np.argsort(right_keys, kind="stable")
+        sorted_keys = right_keys[order]
+        lo = np.searchsorted(sorted_keys, left_keys, side="left")
+        counts = np.searchsorted(sorted_keys, left_keys, side="right") - lo
+        # Huge buckets are generic names (or empty signatures) and would explode the pair count
+        counts[counts > max_bucket] = 0
+        total = int(counts.sum())
+        if not total:
+            continue
+        left_idx = np.repeat(np.arange(len(left_keys)), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        pairs.append(np.stack([left_idx, order[np.repeat(lo, counts) + within]], axis=1))
+    return pairs
+
+
+def _normalized_pairs(left: TableSet, right: TableSet) -> list[tuple]:
+    by_name = {}
+    for j, name in enumerate(right.normalized):
+        by_name.setdefault(name, []).append(j)
+    return [(i, j) for i, name in enumerate(left.normalized) for j in by_name.get(name, ())]
+
+
+def _score_numpy(left: TableSet, right: TableSet, permutations: int, bands: int, max_bucket: int):
+    normalized = np.array(_normalized_pairs(left, right), dtype=np.int64).reshape(-1, 2)
+    pairs = [normalized]
+
+    # Near-miss search only for tables the normalization rules could not pair up
+    open_left = np.setdiff1d(np.arange(len(left)), normalized[:, 0])
+    open_right = np.setdiff1d(np.arange(len(right)), normalized[:, 1])
+    name_sig = np.empty((0, permutations), dtype=np.uint64)
+    name_rows = np.full(len(left) + len(right), -1, dtype=np.int64)
+    if len(open_left) and len(open_right):
+        name_sig = minhash_signatures(
+            [_trigrams(left.normalized[i]) for i in open_left.tolist()]
+            + [_trigrams(right.normalized[j]) for j in open_right.tolist()],
+            permutations,
+        )
+        name_rows[open_left] = np.arange(len(open_left))
+        name_rows[len(left) + open_right] = len(open_left) + np.arange(len(open_right))
+        for found in _lsh_pairs(name_sig[:len(open_left)], name_sig[len(open_left):], bands, max_bucket):
+            pairs.append(np.stack([open_left[found[:, 0]], open_right[found[:, 1]]], axis=1))
+
+    pairs = np.concatenate(pairs)
+    keys = np.unique(pairs[:, 0] * len(right) + pairs[:, 1])
+    if not len(keys):
+        return []
+    li, ri = keys // len(right), keys % len(right)
+
+    # Name similarity: 1.0 for identical normalized names, MinHash trigram estimate otherwise
+    same_normalized = np.array(left.normalized, dtype=object)[li] == np.array(right.normalized, dtype=object)[ri]
+    name_sim = np.ones(len(li))
+    fuzzy = np.flatnonzero(~same_normalized)
+    if len(fuzzy):
+        name_sim[fuzzy] = (
+            name_sig[name_rows[li[fuzzy]]] == name_sig[name_rows[len(left) + ri[fuzzy]]]
+        ).mean(axis=1)
+
+    # Column-set similarity, NaN where either side has no columns
+    column_sig = minhash_signatures(left.columns + right.columns, permutations)
+    column_sim = (column_sig[li] == column_sig[len(left) + ri]).mean(axis=1)
+    has_columns = np.fromiter(map(bool, left.columns + right.columns), dtype=bool, count=len(left) + len(right))
+    column_sim = np.where(has_columns[li] & has_columns[len(left) + ri], column_sim, np.nan)
+    return li.tolist(), ri.tolist(), name_sim.tolist(), column_sim.tolist(), same_normalized.tolist()
+
+
+def _score_python(left: TableSet, right: TableSet):
+    li, ri, name_sim, column_sim = [], [], [], []
+    for i, j in _normalized_pairs(left, right):
+        a, b = set(left.columns[i]), set(right.columns[j])
+        li.append(i)
+        ri.append(j)
+        name_sim.append(1.0)
+        column_sim.append(len(a & b) / len(a | b) if a and b else float("nan"))
+    return li, ri, name_sim, column_sim, [True] * len(li)
+
+
+def match_tables(left_tables, right_tables, rules: NameRules = None, top_k: int = None, min_confidence: float = None) -> list[dict]:
+    """
+    Rank right-side matches for every left-side table. Tables are (schema, table,
+    [column names]). Returns one dict per kept pair with left/right indexes, match
+    kind (exact / normalized / fuzzy), name and column similarity, confidence and rank
+    (1 = best for that left table). Identically named tables are always kept.
+    """
+    rules = rules or NameRules()
+    top_k = top_k or settings.MATCH_TOP_K
+    min_confidence = settings.MATCH_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    left, right = TableSet(left_tables, rules), TableSet(right_tables, rules)
+    if not len(left) or not len(right):
+        return []
+
+    if numpy_available():
+        scored = _score_numpy(
+            left, right, settings.MATCH_MINHASH_PERMUTATIONS, settings.MATCH_LSH_BANDS, settings.MATCH_MAX_BUCKET
+        )
+    else:
+        scored = _score_python(left, right)
+    if not scored:
+        return []
+
+    name_weight = settings.MATCH_NAME_WEIGHT
+    ranked = {}
+    for i, j, name_sim, column_sim, same_normalized in zip(*scored):
+        exact = left.names[i].lower() == right.names[j].lower()
+        kind = "exact" if exact else "normalized" if same_normalized else "fuzzy"
+        # Without columns on both sides there is only the name to go on
+        has_columns = column_sim == column_sim
+        confidence = name_weight * name_sim + (1 - name_weight) * column_sim if has_columns else name_sim
+        if kind == "normalized":
+            confidence *= 0.95
+        if confidence < min_confidence and not exact:
+            continue
+        ranked.setdefault(i, []).append((confidence, kind, j, name_sim, column_sim if has_columns else None))
+
+    matches = []
+    for i in sorted(ranked):
+        candidates = sorted(ranked[i], key=lambda c: (-c[0], c[1] != "exact", c[2]))
+        for rank, (confidence, kind, j, name_sim, column_sim) in enumerate(candidates, start=1):
+            if rank > top_k and kind != "exact":
+                continue
+            matches.append({
+                "left": i,
+                "right": j,
+                "match": kind,
+                "name_similarity": round(name_sim, 3),
+                "column_similarity": round(column_sim, 3) if column_sim is not None else None,
+                "confidence": round(confidence, 3),
+                "rank": rank,
+            })
+    return matches
+
+
+def match_stage_to_bronze(db, top_k: int = None, min_confidence: float = None) -> list[dict]:
+    """Ranked stage candidates for every bronze table, best first."""
+    bronze = load_layer_tables(db, "bronze")
+    stage = load_layer_tables(db, "stage")
+    return [
+        {
+            "bronze_schema": bronze[m["left"]][0],
+            "bronze_table_name": bronze[m["left"]][1],
+            "stage_schema": stage[m["right"]][0],
+            "stage_table_name": stage[m["right"]][1],
+            **{k: v for k, v in m.items() if k not in ("left", "right")},
+        }
+        for m in match_tables(bronze, stage, top_k=top_k, min_confidence=min_confidence)
+    ]
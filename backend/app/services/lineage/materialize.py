@@ -0,0 +1,215 @@
+# backend/app/services/lineage/materialize.py
+#
+# Materialized copies of aud.vw_flat_table_lineage and aud.vw_flat_column_lineage.
+# The views stay the single definition of a flattened path; this module copies their
+# rows into indexed tables and, after each lineage write, re-copies only the paths that
+# run through the touched table_map ids. Table paths are keyed by lineage_id (the bronze
+# table_map id), column paths by their bronze table.
+import logging
+import time
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+from app.services.lineage.bulk import drop_stage, stage_rows
+from app.services.lineage.events import on_lineage_change
+
+FLAT_TABLE_VIEW = "aud.vw_flat_table_lineage"
+FLAT_TABLE = "aud.flat_table_lineage"
+FLAT_COLUMN_VIEW = "aud.vw_flat_column_lineage"
+FLAT_COLUMN = "aud.flat_column_lineage"
+
+FLAT_TABLE_COLUMNS = (
+    "lineage_id",
+    "stage_db", "stage_schema", "stage_table",
+    "bronze_db", "bronze_schema", "bronze_table",
+    "silver_db", "silver_schema", "silver_table",
+    "gold_db", "gold_schema", "gold_table",
+)
+FLAT_COLUMN_COLUMNS = (
+    "stage_db", "stage_schema", "stage_table", "stage_column",
+    "bronze_db", "bronze_schema", "bronze_table", "bronze_column",
+    "silver_db", "silver_schema", "silver_table", "silver_column", "silver_transform_expr",
+    "gold_db", "gold_schema", "gold_table", "gold_column", "gold_transform_expr",
+)
+
+# Stay well below SQL Server's 2100 parameter limit
+ID_CHUNK_SIZE = 1000
+
+# Until the tables are built (or while 006 is not applied) readers use the views, and
+# re-check at most this often
+READY_CHECK_SECONDS = 60.0
+
+_ready = False
+_checked_at = None
+
+
+def _same_table(alias: str, layer: str, dest: str = "d") -> str:
+    return (
+        f"({alias}.{layer}_db = {dest}.dest_db AND {alias}.{layer}_schema = {dest}.dest_schema"
+        f" AND {alias}.{layer}_table = {dest}.dest_table)"
+    )
+
+
+def _touches(alias: str, layers) -> str:
+    """Join condition: the path row runs through the changed destination table."""
+    return " OR ".join(_same_table(alias, layer) for layer in layers)
+
+
+def _write_state(db, name: str, rebuild: bool):
+    stamp = "last_rebuild_datetime = CURRENT_TIMESTAMP, " if rebuild else ""
+    updated = db.execute(text(f"""
+        UPDATE aud.flat_lineage_refresh
+        SET {stamp}last_refresh_datetime = CURRENT_TIMESTAMP
+        WHERE name = :name
+    """), {"name": name}).rowcount
+    if not updated:
+        db.execute(text("""
+            INSERT INTO aud.flat_lineage_refresh (name, last_rebuild_datetime, last_refresh_datetime)
+            VALUES (:name, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        """), {"name": name})
+
+
+def rebuild_flat_lineage(db) -> dict:
+    """Replace both materialized tables with the full contents of the views."""
+    global _ready
+    result = {}
+    for name, table, view, columns in (
+        ("table", FLAT_TABLE, FLAT_TABLE_VIEW, FLAT_TABLE_COLUMNS),
+        ("column", FLAT_COLUMN, FLAT_COLUMN_VIEW, FLAT_COLUMN_COLUMNS),
+    ):
+        column_list = ", ".join(columns)
+        db.execute(text(f"DELETE FROM {table}"))
+        result[name] = db.execute(text(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {view}")).rowcount
+        _write_state(db, name, rebuild=True)
+    db.commit()
+    _ready = True
+    return result
+
+
+def refresh_flat_lineage(db, table_map_ids) -> dict:
+    """
+    Re-copy the flattened paths that run through the given table_map ids: as the bronze
+    anchor, or as the silver or gold destination. Commits.
+    """
+    table_map_ids = sorted(set(table_map_ids))
+    if not table_map_ids:
+        return {"table": 0, "column": 0}
+
+    dests = []
+    query = text("SELECT id AS table_map_id, dest_db, dest_schema, dest_table FROM aud.table_map WHERE id IN :ids").bindparams(
+        bindparam("ids", expanding=True)
+    )
+    for start in range(0, len(table_map_ids), ID_CHUNK_SIZE):
+        dests.extend(dict(r) for r in db.execute(query, {"ids": table_map_ids[start:start + ID_CHUNK_SIZE]}).mappings())
+    changed = stage_rows(db, "flat_changed", ("table_map_id", "dest_db", "dest_schema", "dest_table"), dests)
+
+    # Table paths: the bronze anchor itself, or any path whose silver/gold hop changed.
+    # Old rows are included so paths that no longer reach the table are cleared too.
+    table_match = f"v.lineage_id = d.table_map_id OR {_touches('v', ('silver', 'gold'))}"
+    lineage_ids = db.execute(text(f"""
+        SELECT v.lineage_id FROM {FLAT_TABLE_VIEW} v JOIN {changed} d ON {table_match}
+        UNION
+        SELECT v.lineage_id FROM {FLAT_TABLE} v JOIN {changed} d ON {table_match}
+    """)).scalars().all()
+    scope = stage_rows(db, "flat_lineage_scope", ("table_map_id",), [{"table_map_id": i} for i in lineage_ids])
+    column_list = ", ".join(FLAT_TABLE_COLUMNS)
+    db.execute(text(f"DELETE FROM {FLAT_TABLE} WHERE lineage_id IN (SELECT table_map_id FROM {scope})"))
+    tables = db.execute(text(f"""
+        INSERT INTO {FLAT_TABLE} ({column_list})
+        SELECT {column_list} FROM {FLAT_TABLE_VIEW} WHERE lineage_id IN (SELECT table_map_id FROM {scope})
+    """)).rowcount
+    drop_stage(db, scope)
+
+    # Column paths are keyed by their bronze table
+    column_match = _touches("v", ("bronze", "silver", "gold"))
+    bronze_tables = db.execute(text(f"""
+        SELECT v.bronze_db AS src_db, v.bronze_schema AS src_schema, v.bronze_table AS src_table
+        FROM {FLAT_COLUMN_VIEW} v JOIN {changed} d ON {column_match}
+        UNION
+        SELECT v.bronze_db, v.bronze_schema, v.bronze_table
+        FROM {FLAT_COLUMN} v JOIN {changed} d ON {column_match}
+    """)).mappings().all()
+    scope = stage_rows(db, "flat_lineage_scope", ("src_db", "src_schema", "src_table"), [dict(r) for r in bronze_tables])
+    in_scope = f"""EXISTS (
+            SELECT 1 FROM {scope} k
+            WHERE k.src_db = {{alias}}.bronze_db AND k.src_schema = {{alias}}.bronze_schema AND k.src_table = {{alias}}.bronze_table
+        )"""
+    column_list = ", ".join(FLAT_COLUMN_COLUMNS)
+    db.execute(text(f"DELETE FROM {FLAT_COLUMN} WHERE {in_scope.format(alias=FLAT_COLUMN)}"))
+    columns = db.execute(text(f"""
+        INSERT INTO {FLAT_COLUMN} ({column_list})
+        SELECT {column_list} FROM {FLAT_COLUMN_VIEW} v WHERE {in_scope.format(alias='v')}
+    """)).rowcount
+    drop_stage(db, scope)
+    drop_stage(db, changed)
+
+    _write_state(db, "table", rebuild=False)
+    _write_state(db, "column", rebuild=False)
+    db.commit()
+    return {"table": tables, "column": columns}
+
+
+def flat_lineage_status(db) -> dict:
+    """Refresh times and row counts, and whether lineage was written after the last refresh."""
+    latest_write = db.execute(text("""
+        SELECT MAX(latest) FROM (
+            SELECT MAX(record_insert_datetime) AS latest FROM aud.table_map
+            UNION ALL
+            SELECT MAX(record_insert_datetime) FROM aud.table_source
+            UNION ALL
+            SELECT MAX(record_insert_datetime) FROM aud.column_map
+        ) w
+    """)).scalar()
+    state = {
+        row["name"]: dict(row)
+        for row in db.execute(text("""
+            SELECT name, last_rebuild_datetime, last_refresh_datetime
+            FROM aud.flat_lineage_refresh
+        """)).mappings()
+    }
+    status = {"latest_lineage_write": latest_write, "materialized": settings.FLAT_LINEAGE_MATERIALIZED}
+    for name, table in (("table", FLAT_TABLE), ("column", FLAT_COLUMN)):
+        entry = state.get(name)
+        if entry is None:
+            status[name] = {"built": False, "stale": True}
+            continue
+        refreshed = entry["last_refresh_datetime"]
+        entry["built"] = True
+        entry["stale"] = bool(latest_write and refreshed and latest_write > refreshed)
+        entry["row_count"] = db.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        status[name] = entry
+    return status
+
+
+def _is_built(db) -> bool:
+    global _ready, _checked_at
+    if _ready or (_checked_at is not None and time.monotonic() - _checked_at < READY_CHECK_SECONDS):
+        return _ready
+    _checked_at = time.monotonic()
+    try:
+        _ready = db.execute(text("SELECT COUNT(*) FROM aud.flat_lineage_refresh")).scalar() >= 2
+    except DBAPIError as ex:
+        # db/schema/006 not applied: keep reading the views
+        logging.warning(f"Materialized flat lineage unavailable, reading the views: {ex}")
+    return _ready
+
+
+def flat_table_relation(db) -> str:
+    """Where to read flat table lineage from: the materialized table once built, else the view."""
+    if settings.FLAT_LINEAGE_MATERIALIZED and _is_built(db):
+        return FLAT_TABLE
+    return FLAT_TABLE_VIEW
+
+
+def flat_column_relation(db) -> str:
+    if settings.FLAT_LINEAGE_MATERIALIZED and _is_built(db):
+        return FLAT_COLUMN
+    return FLAT_COLUMN_VIEW
+
+
+@on_lineage_change
+def _refresh_materialized(db, table_map_ids):
+    if settings.FLAT_LINEAGE_MATERIALIZED and _is_built(db):
+        refresh_flat_lineage(db, table_map_ids)
@@ -0,0 +1,109 @@
+# backend/app/services/lineage/metadata.py
+#
+# Batched INFORMATION_SCHEMA lookups across the warehouse layers. A list of
+# (schema, table) pairs is resolved against TABLES and COLUMNS of every layer in a
+# single UNION ALL query, instead of one query per layer per table.
+from sqlalchemy import text
+
+from app.core.config import STAGE_DB, BRONZE_DB, SILVER_DB, GOLD_DB
+
+LAYER_DBS = {
+    "stage": STAGE_DB,
+    "bronze": BRONZE_DB,
+    "silver": SILVER_DB,
+    "gold": GOLD_DB,
+}
+
+# Two parameters per pair; keeps each query well below SQL Server's 2100 limit
+PAIRS_PER_QUERY = 500
+
+TABLE_FIELDS = ("table_catalog", "table_schema", "table_name", "table_type")
+COLUMN_FIELDS = (
+    "column_name", "ordinal_position", "data_type", "is_nullable",
+    "character_maximum_length", "numeric_precision", "numeric_scale", "column_default",
+)
+
+
+def _layer_branch(layer: str, db_name: str, include_columns: bool) -> str:
+    if include_columns:
+        columns = """
+            c.COLUMN_NAME AS column_name, c.ORDINAL_POSITION AS ordinal_position,
+            c.DATA_TYPE AS data_type, c.IS_NULLABLE AS is_nullable,
+            c.CHARACTER_MAXIMUM_LENGTH AS character_maximum_length,
+            c.NUMERIC_PRECISION AS numeric_precision, c.NUMERIC_SCALE AS numeric_scale,
+            c.COLUMN_DEFAULT AS column_default"""
+        join = f"""
+        LEFT JOIN {db_name}.INFORMATION_SCHEMA.COLUMNS c
+            ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME"""
+    else:
+        columns = ", ".join(f"NULL AS {f}" for f in COLUMN_FIELDS)
+        join = ""
+    return f"""
+        SELECT '{layer}' AS layer,
+            t.TABLE_CATALOG AS table_catalog, t.TABLE_SCHEMA AS table_schema,
+            t.TABLE_NAME AS table_name, t.TABLE_TYPE AS table_type,
+            {columns}
+        FROM {db_name}.INFORMATION_SCHEMA.TABLES t
+        JOIN wanted w
+            ON LOWER(t.TABLE_SCHEMA) = w.schema_name AND LOWER(t.TABLE_NAME) = w.table_name{join}"""
+
+
+def fetch_table_metadata(db, pairs, layers=None, include_columns: bool = True) -> dict:
+    """
+    Fetch TABLES (and COLUMNS) metadata for (schema, table) pairs across layers.
+    Returns {layer: [{table fields..., "columns": [{column fields...}]}]} with an entry
+    for every requested layer, matched case-insensitively.
+    """
+    layers = list(layers or LAYER_DBS)
+    result = {layer: [] for layer in layers}
+    pairs = sorted({((schema or "dbo").strip().lower(), table.strip().lower()) for schema, table in pairs if table})
+    if not pairs:
+        return result
+
+    union = "\n        UNION ALL".join(_layer_branch(layer, LAYER_DBS[layer], include_columns) for layer in layers)
+    tables = {}
+    for start in range(0, len(pairs), PAIRS_PER_QUERY):
+        chunk = pairs[start:start + PAIRS_PER_QUERY]
+        values = ", ".join(f"(:s{i}, :t{i})" for i in range(len(chunk)))
+        params = {}
+        for i, (schema, table) in enumerate(chunk):
+            params[f"s{i}"], params[f"t{i}"] = schema, table
+        rows = db.execute(text(f"""
+            WITH wanted (schema_name, table_name) AS (
+                SELECT * FROM (VALUES {values}) AS v (schema_name, table_name)
+            )
+            {union}
+            ORDER BY layer, table_schema, table_name, ordinal_position
+        """), params).mappings()
+
+        for row in rows:
+            key = (row["layer"], row["table_schema"], row["table_name"])
+            table = tables.get(key)
+            if table is None:
+                table = tables[key] = {f: row[f] for f in TABLE_FIELDS}
+                table["columns"] = []
+                result[row["layer"]].append(table)
+            if row["column_name"] is not None:
+                table["columns"].append({f: row[f] for f in COLUMN_FIELDS})
+    return result
+
+
+def format_table_info(metadata: dict) -> str:
+    """One line per table, tagged with its layer."""
+    lines = [
+        str({"layer": layer, **{f: table[f] for f in TABLE_FIELDS}})
+        for layer, tables in metadata.items()
+        for table in tables
+    ]
+    return "\n".join(lines) if lines else "No results found."
+
+
+def format_column_info(metadata: dict) -> str:
+    """One line per column, tagged with its layer and table."""
+    lines = [
+        str({"layer": layer, "table_schema": table["table_schema"], "table_name": table["table_name"], **column})
+        for layer, tables in metadata.items()
+        for table in tables
+        for column in table["columns"]
+    ]
+    return "\n".join(lines) if lines else "No results found."
@@ -0,0 +1,421 @@
+# backend/app/services/lineage/parse.py
+#
+# Deterministic column lineage for T-SQL stored procedures using sqlglot. Procedure
+# bodies are split into DML statements (INSERT ... SELECT, SELECT ... INTO, MERGE,
+# UPDATE ... FROM), aliases / CTEs / derived tables / temp tables are resolved, and the
+# result is emitted in the same mapping dict shape extract_column_mappings_from_llm returns.
+# Anything that can't be resolved without a catalog is reported so the caller can fall
+# back to the LLM.
+import re
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.dialects.tsql import TSQL
+
+DEFAULT_SCHEMA = "dbo"
+
+# Tokens that end the current statement (T-SQL lets statements run together without ';')
+_CONTROL_KEYWORDS = {
+    "BEGIN", "END", "IF", "ELSE", "WHILE", "DECLARE", "EXEC", "EXECUTE", "RETURN",
+    "TRUNCATE", "PRINT", "THROW", "RAISERROR", "GO", "COMMIT", "ROLLBACK", "SET",
+    "CREATE", "ALTER", "DROP", "OPEN", "CLOSE", "FETCH", "DEALLOCATE", "BREAK",
+    "CONTINUE", "GOTO", "WAITFOR", "USE",
+}
+_DML_KEYWORDS = {"INSERT", "MERGE", "SELECT", "UPDATE", "DELETE"}
+_SET_OPERATORS = {"UNION", "ALL", "EXCEPT", "INTERSECT", "DISTINCT"}
+_LITERAL_TOKENS = {
+    "IDENTIFIER", "STRING", "NATIONAL_STRING", "RAW_STRING", "BYTE_STRING",
+    "HEX_STRING", "BIT_STRING", "UNICODE_STRING", "NUMBER",
+}
+_DYNAMIC_SQL = re.compile(r"\bEXEC(?:UTE)?\s*\(|\bsp_executesql\b", re.IGNORECASE)
+
+
+class _Tokenizer(TSQL.Tokenizer):
+    # TSQL treats END/FETCH/etc. as commands and swallows the rest of the batch as one
+    # string token; we need every keyword to find statement boundaries.
+    COMMANDS = set()
+
+
+def split_statements(proc_definition: str) -> list[str]:
+    """
+    Split a procedure definition into its top-level DML statements. Control flow
+    (BEGIN/END, IF, TRY/CATCH, DECLARE, SET, EXEC, ...) is dropped.
+    """
+    tokens = _Tokenizer().tokenize(proc_definition)
+    statements = []
+    current = None  # dict(kind, start, end, body_seen, set_seen)
+    depth = 0
+    case_depth = 0
+    prev_word = None
+
+    def close():
+        nonlocal current
+        if current and current["kind"] in _DML_KEYWORDS:
+            statements.append(proc_definition[current["start"]:current["end"] + 1])
+        current = None
+
+    for i, token in enumerate(tokens):
+        word = None if token.token_type.name in _LITERAL_TOKENS else token.text.upper()
+
+        if token.token_type.name == "L_PAREN":
+            depth += 1
+        elif token.token_type.name == "R_PAREN":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and word == ";":
+            close()
+            prev_word = word
+            continue
+        elif depth == 0 and word:
+            next_token = tokens[i + 1] if i + 1 < len(tokens) else None
+            starts_cte = word == "WITH" and next_token is not None and next_token.token_type.name != "L_PAREN"
+
+            if word == "CASE":
+                case_depth += 1
+            elif word == "END" and case_depth:
+                case_depth -= 1
+                word = "CASE_END"
+            elif word == "ELSE" and case_depth:
+                word = "CASE_ELSE"
+
+            if current is None:
+                if starts_cte:
+                    current = {"kind": "WITH", "start": token.start, "body_seen": False, "set_seen": False}
+                elif word in _DML_KEYWORDS:
+                    current = {"kind": word, "start": token.start, "body_seen": False, "set_seen": False}
+            else:
+                kind = current["kind"]
+                if kind == "WITH" and word in _DML_KEYWORDS:
+                    # First DML keyword after the CTE list is the statement body
+                    current["kind"] = word
+                elif kind == "MERGE":
+                    if word in ("GO", "BEGIN", "END"):
+                        close()
+                elif word == "SELECT" and (
+                    prev_word in _SET_OPERATORS or (kind == "INSERT" and not current["body_seen"])
+                ):
+                    current["body_seen"] = True
+                elif word == "EXEC" and kind == "INSERT" and not current["body_seen"]:
+                    current["body_seen"] = True
+                elif word == "SET" and kind == "UPDATE" and not current["set_seen"]:
+                    current["set_seen"] = True
+                elif starts_cte or word in _DML_KEYWORDS:
+                    close()
+                    current = {
+                        "kind": "WITH" if starts_cte else word,
+                        "start": token.start,
+                        "body_seen": False,
+                        "set_seen": False,
+                    }
+                elif word in _CONTROL_KEYWORDS:
+                    close()
+                    case_depth = 0
+
+        if current is not None:
+            current["end"] = token.end
+        prev_word = word
+
+    close()
+    return statements
+
+
+def _temp_key(table: exp.Table):
+    if isinstance(table.this, exp.Parameter):
+        return "@" + table.this.name.lower()
+    if isinstance(table.this, exp.Identifier) and table.this.args.get("temporary"):
+        return "#" + table.name.lower()
+    return None
+
+
+def _table_key(table: exp.Table, default_db: str) -> tuple:
+    return (
+        table.catalog or default_db,
+        table.db or DEFAULT_SCHEMA,
+        table.name,
+    )
+
+
+class _Resolver:
+    def __init__(self, default_db: str):
+        self.default_db = default_db
+        self.temps = {}  # temp table / table variable -> relation
+        self.unresolved = []
+
+    # A relation is an ordered {column_lower: {"name", "refs", "transform"}} dict;
+    # refs are (db, schema, table, column) tuples of physical source columns.
+
+    def fail(self, reason: str):
+        self.unresolved.append(reason)
+
+    def scope(self, select: exp.Expression, ctes: dict) -> dict:
+        """Map each alias in the FROM/JOIN clause to a physical table key or a relation."""
+        sources = {}
+        from_ = select.args.get("from_")
+        joins = list(select.args.get("joins") or [])
+        if from_ is not None:
+            # UPDATE ... FROM hangs its joins off the FROM table rather than the statement
+            joins += from_.this.args.get("joins") or []
+        nodes = ([from_.this] if from_ else []) + [j.this for j in joins]
+        for node in nodes:
+            alias = node.alias_or_name.lower()
+            if isinstance(node, exp.Table):
+                temp = _temp_key(node)
+                if temp:
+                    if temp not in self.temps:
+                        self.fail(f"temp table {temp} is not populated in this procedure")
+                        continue
+                    sources[alias] = ("relation", self.temps[temp])
+                elif not node.catalog and not node.db and node.name.lower() in ctes:
+                    sources[alias] = ("relation", ctes[node.name.lower()])
+                else:
+                    sources[alias] = ("table", _table_key(node, self.default_db))
+            elif isinstance(node, exp.Subquery):
+                sources[alias] = ("relation", self.query(node.this, ctes))
+            else:
+                self.fail(f"unsupported source: {node.sql(dialect='tsql')[:80]}")
+        return sources
+
+    def column(self, col: exp.Column, sources: dict):
+        """Resolve one column reference. Returns (refs, inner_transform)."""
+        qualifier = col.table.lower()
+        name = col.name
+        if qualifier:
+            source = sources.get(qualifier)
+        elif len(sources) == 1:
+            source = next(iter(sources.values()))
+        else:
+            owners = [s for s in sources.values() if s[0] == "relation" and name.lower() in s[1]]
+            physical = [s for s in sources.values() if s[0] == "table"]
+            source = owners[0] if len(owners) == 1 and not physical else None
+        if source is None:
+            self.fail(f"cannot resolve column {col.sql(dialect='tsql')}")
+            return [], ""
+        kind, value = source
+        if kind == "table":
+            return [value + (name,)], ""
+        entry = value.get(name.lower())
+        if entry is None:
+            self.fail(f"column {name} not found in derived source")
+            return [], ""
+        return entry["refs"], entry["transform"]
+
+    def expression(self, node: exp.Expression, sources: dict) -> dict:
+        """Lineage of a single scalar expression."""
+        if node.find(exp.Select):
+            self.fail(f"scalar subquery in {node.sql(dialect='tsql')[:80]}")
+            return {"refs": [], "transform": ""}
+        refs = []
+        transform = ""
+        for col in node.find_all(exp.Column):
+            if isinstance(col.this, exp.Star):
+                continue
+            col_refs, inner = self.column(col, sources)
+            refs.extend(col_refs)
+            transform = inner
+        if not isinstance(node, exp.Column):
+            transform = node.sql(dialect="tsql")
+        return {"refs": list(dict.fromkeys(refs)), "transform": transform}
+
+    def select(self, select: exp.Select, ctes: dict) -> dict:
+        ctes = self.ctes(select, ctes)
+        sources = self.scope(select, ctes)
+        relation = {}
+        for position, projection in enumerate(select.expressions):
+            inner = projection.this if isinstance(projection, exp.Alias) else projection
+            if isinstance(inner, exp.Star) or (isinstance(inner, exp.Column) and isinstance(inner.this, exp.Star)):
+                qualifier = inner.table.lower() if isinstance(inner, exp.Column) else ""
+                expanded = [s for a, s in sources.items() if not qualifier or a == qualifier]
+                if not expanded or any(kind == "table" for kind, _ in expanded):
+                    self.fail("SELECT * over a physical table needs the catalog")
+                    continue
+                for _, rel in expanded:
+                    relation.update(rel)
+                continue
+            # Unaliased expressions have no name; key them by position so they stay distinct
+            name = projection.alias_or_name or f"_col{position}"
+            entry = self.expression(inner, sources)
+            entry["name"] = name
+            relation[name.lower()] = entry
+        return relation
+
+    def ctes(self, node: exp.Expression, ctes: dict) -> dict:
+        with_ = node.args.get("with_")
+        if not with_:
+            return ctes
+        ctes = dict(ctes)
+        for cte in with_.expressions:
+            relation = self.query(cte.this, ctes)
+            columns = cte.args["alias"].columns if cte.args.get("alias") else []
+            if columns:
+                relation = self.rename(relation, [c.name for c in columns])
+            ctes[cte.alias.lower()] = relation
+        return ctes
+
+    def query(self, node: exp.Expression, ctes: dict) -> dict:
+        if isinstance(node, exp.Subquery):
+            return self.query(node.this, ctes)
+        if isinstance(node, exp.Select):
+            return self.select(node, ctes)
+        if isinstance(node, exp.SetOperation):
+            ctes = self.ctes(node, ctes)
+            left = list(self.query(node.left, ctes).values())
+            right = list(self.query(node.right, ctes).values())
+            if len(left) != len(right):
+                self.fail("set operation branches have different column counts")
+            relation = {}
+            for l, r in zip(left, right):
+                relation[l["name"].lower()] = {
+                    "name": l["name"],
+                    "refs": list(dict.fromkeys(l["refs"] + r["refs"])),
+                    "transform": l["transform"] if l["transform"] == r["transform"] else "",
+                }
+            return relation
+        self.fail(f"unsupported query: {node.sql(dialect='tsql')[:80]}")
+        return {}
+
+    def rename(self, relation: dict, names: list) -> dict:
+        entries = list(relation.values())
+        if len(entries) != len(names):
+            self.fail("column list does not match the select list")
+        return {
+            n.lower(): {"name": n, "refs": e["refs"], "transform": e["transform"]}
+            for n, e in zip(names, entries)
+        }
+
+    # Statement handlers return (target_table, relation) or None
+
+    def write(self, target: exp.Table, relation: dict, mappings: list, merge_temp: bool = False):
+        temp = _temp_key(target)
+        if temp:
+            if merge_temp and temp in self.temps:
+                for key, entry in relation.items():
+                    existing = self.temps[temp].setdefault(key, {"name": entry["name"], "refs": [], "transform": ""})
+                    existing["refs"] = list(dict.fromkeys(existing["refs"] + entry["refs"]))
+            else:
+                self.temps[temp] = relation
+            return
+        target_db, target_schema, target_table = _table_key(target, self.default_db)
+        for entry in relation.values():
+            for src_db, src_schema, src_table, src_column in entry["refs"]:
+                if (src_db, src_schema, src_table) == (target_db, target_schema, target_table):
+                    continue  # self-reference, e.g. SET t.total = t.total + s.amount
+                mappings.append({
+                    "source_db": src_db,
+                    "source_schema": src_schema,
+                    "source_table": src_table,
+                    "source_column": src_column,
+                    "target_db": target_db,
+                    "target_schema": target_schema,
+                    "target_table": target_table,
+                    "target_column": entry["name"],
+                    "transform_expr": entry["transform"],
+                })
+
+    def insert(self, node: exp.Insert, mappings: list):
+        target = node.this
+        columns = None
+        if isinstance(target, exp.Schema):
+            columns = [c.name for c in target.expressions]
+            target = target.this
+        source = node.expression
+        if isinstance(source, exp.Values):
+            return
+        if source is None:
+            self.fail("INSERT without a SELECT (e.g. INSERT ... EXEC)")
+            return
+        relation = self.query(source, self.ctes(node, {}))
+        if columns is None:
+            if _temp_key(target) is None:
+                self.fail("INSERT without a column list needs the catalog")
+                return
+        else:
+            relation = self.rename(relation, columns)
+        self.write(target, relation, mappings, merge_temp=True)
+
+    def select_into(self, node: exp.Select, mappings: list):
+        into = node.args.get("into")
+        select = node.copy()
+        select.set("into", None)
+        relation = self.select(select, {})
+        self.write(into.this, relation, mappings)
+
+    def merge(self, node: exp.Merge, mappings: list):
+        target = node.this
+        using = node.args.get("using")
+        ctes = self.ctes(node, {})
+        if isinstance(using, exp.Table):
+            sources = self.scope(exp.select("*").from_(using), ctes)
+        else:
+            sources = {using.alias.lower(): ("relation", self.query(using, ctes))}
+        sources[target.alias_or_name.lower()] = ("table", _table_key(target, self.default_db))
+        relation = {}
+        whens = node.args.get("whens")
+        for when in whens.expressions if whens else []:
+            then = when.args.get("then")
+            if isinstance(then, exp.Insert):
+                if not isinstance(then.this, exp.Tuple) or not isinstance(then.expression, exp.Tuple):
+                    self.fail("MERGE INSERT without an explicit column list")
+                    continue
+                pairs = zip(then.this.expressions, then.expression.expressions)
+            elif isinstance(then, exp.Update):
+                pairs = ((eq.this, eq.expression) for eq in then.expressions)
+            else:
+                continue
+            for column, value in pairs:
+                entry = self.expression(value, sources)
+                existing = relation.setdefault(column.name.lower(), {"name": column.name, "refs": [], "transform": entry["transform"]})
+                existing["refs"] = list(dict.fromkeys(existing["refs"] + entry["refs"]))
+        self.write(target, relation, mappings, merge_temp=True)
+
+    def update(self, node: exp.Update, mappings: list):
+        ctes = self.ctes(node, {})
+        target = node.this
+        sources = self.scope(node, ctes) if node.args.get("from_") else {}
+        alias = target.alias_or_name.lower()
+        if alias in sources and sources[alias][0] == "table" and not target.db:
+            # UPDATE t SET ... FROM dbo.tgt t: the target is an alias from the FROM clause
+            db, schema, table = sources[alias][1]
+            target = exp.table_(table, db=schema, catalog=db)
+        elif _temp_key(target) is None:
+            sources.setdefault(alias, ("table", _table_key(target, self.default_db)))
+        relation = {}
+        for eq in node.expressions:
+            entry = self.expression(eq.expression, sources)
+            entry["name"] = eq.this.name
+            relation[eq.this.name.lower()] = entry
+        self.write(target, relation, mappings, merge_temp=True)
+
+
+def extract_column_mappings_from_sql(proc_definition: str, default_db: str = ""):
+    """
+    Parse a stored procedure and return (mappings, unresolved). mappings has the same
+    shape as extract_column_mappings_from_llm; unresolved lists the reasons the parser
+    could not fully account for the procedure (empty when the result is complete).
+    """
+    resolver = _Resolver(default_db)
+    mappings = []
+    if _DYNAMIC_SQL.search(proc_definition or ""):
+        resolver.fail("dynamic SQL")
+
+    try:
+        statements = split_statements(proc_definition or "")
+    except Exception as ex:
+        return [], [f"tokenize failed: {ex}"]
+
+    for statement in statements:
+        try:
+            node = sqlglot.parse_one(statement, read="tsql")
+        except Exception as ex:
+            resolver.fail(f"parse failed: {str(ex).splitlines()[0]}")
+            continue
+        if isinstance(node, exp.Insert):
+            resolver.insert(node, mappings)
+        elif isinstance(node, exp.Select) and node.args.get("into"):
+            resolver.select_into(node, mappings)
+        elif isinstance(node, exp.Merge):
+            resolver.merge(node, mappings)
+        elif isinstance(node, exp.Update):
+            resolver.update(node, mappings)
+        # Plain SELECTs return result sets and DELETEs carry no column lineage
+
+    unique = {tuple(sorted(m.items())): m for m in mappings}
+    return list(unique.values()), resolver.unresolved
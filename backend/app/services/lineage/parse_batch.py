@@ -0,0 +1,104 @@
+# backend/app/services/lineage/parse_batch.py
+#
+# Multi-core batch mode for the sqlglot extractor. Parsing is CPU-bound and holds the
+# GIL, so large proc corpora are parsed on a process pool in chunks. Each proc gets its
+# own timeout so one pathological definition cannot stall the batch.
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from app.core.config import settings
+from app.services.lineage.parse import extract_column_mappings_from_sql
+
+# Below this many procs the pool start-up costs more than it saves
+MIN_PARALLEL_BATCH = 8
+
+
+class ParseTimeout(BaseException):
+    # BaseException so the per-statement `except Exception` handlers in parse.py
+    # don't swallow it and carry on parsing
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise ParseTimeout()
+
+
+def _can_alarm() -> bool:
+    # SIGALRM is Unix-only, only usable from the main thread of a process, and must
+    # not clobber a timer someone else armed
+    return (
+        hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+        and signal.getitimer(signal.ITIMER_REAL)[0] == 0
+    )
+
+
+def parse_one(row: dict, timeout: float = None) -> dict:
+    """
+    Parse a single proc row (proc_hash, proc_definition, source_db). Returns
+    {"proc_hash", "mappings", "unresolved", "elapsed_ms"}; a timeout or crash is
+    reported as an unresolved reason so the proc falls back to the LLM.
+    """
+    started = time.perf_counter()
+    use_alarm = bool(timeout) and _can_alarm()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        mappings, unresolved = extract_column_mappings_from_sql(row["proc_definition"], row.get("source_db") or "")
+    except ParseTimeout:
+        mappings, unresolved = [], [f"parse timed out after {timeout}s"]
+    except Exception as ex:
+        mappings, unresolved = [], [f"parse failed: {ex}"]
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return {
+        "proc_hash": row["proc_hash"],
+        "mappings": mappings,
+        "unresolved": unresolved,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _parse_task(args):
+    row, timeout = args
+    return parse_one(row, timeout)
+
+
+def _worker_init():
+    # Let the parent handle Ctrl+C; workers just exit with the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def parse_procedures_parallel(
+    rows: list[dict],
+    max_workers: int = None,
+    chunk_size: int = None,
+    timeout: float = None,
+) -> list[dict]:
+    """
+    Parse proc rows on a process pool and return parse_one results in input order.
+    Defaults come from PARSE_MAX_WORKERS (0 = one per CPU), PARSE_CHUNK_SIZE and
+    PARSE_TIMEOUT_SECONDS. Small batches are parsed in-process when the per-proc
+    timeout can be enforced there (on the main thread), and on the pool otherwise.
+    """
+    max_workers = max_workers or settings.PARSE_MAX_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or settings.PARSE_CHUNK_SIZE
+    timeout = settings.PARSE_TIMEOUT_SECONDS if timeout is None else timeout
+    tasks = [({k: row.get(k) for k in ("proc_hash", "proc_definition", "source_db")}, timeout) for row in rows]
+
+    if not tasks:
+        return []
+    if (max_workers <= 1 or len(tasks) < MIN_PARALLEL_BATCH) and (not timeout or _can_alarm()):
+        return [parse_one(row, timeout) for row, _ in tasks]
+
+    # spawn rather than fork: the API process is multi-threaded
+    context = multiprocessing.get_context("spawn")
+    workers = min(max_workers, len(tasks))
+    with context.Pool(processes=workers, initializer=_worker_init) as pool:
+        return pool.map(_parse_task, tasks, chunksize=chunk_size)
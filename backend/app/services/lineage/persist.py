@@ -1,25 +1,21 @@
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session
 from app.services.lineage.models_sql import ProcMetadata as SQLProcMetadata, TableMap as SQLTableMap, TableSource as SQLTableSource, ColumnMap as SQLColumnMap
 from app.services.lineage.models import ProcMetadata
 from datetime import datetime
-import os
-
-from sqlalchemy.engine import URL
 
 from sqlalchemy import text
 
-from app.core.config import STAGE_DB, BRONZE_DB, SILVER_DB, GOLD_DB
-
-# Configure the engine for SQL Server
-url = URL.create(
-    "mssql+pyodbc",
-    username=os.getenv("SQL_USER"),
-    password=os.getenv("SQL_PASSWORD"),
-    host=os.getenv("SQL_SERVER"),
-    database=os.getenv("SQL_DB"),
-    query={"driver": "ODBC Driver 18 for SQL Server"},
+from app.core.config import settings, STAGE_DB, BRONZE_DB, SILVER_DB, GOLD_DB
+from app.core.database import engine
+from app.services.lineage.bulk import (
+    bulk_upsert_column_map,
+    bulk_upsert_table_map,
+    bulk_upsert_table_source,
+    counts,
 )
-engine = create_engine(url)
+from app.services.lineage.catalog import get_catalog
+from app.services.lineage.events import publish_lineage_change
+from app.services.lineage.metadata import LAYER_DBS
 
 
 def insert_proc_metadata(proc_data: ProcMetadata):
@@ -71,222 +67,212 @@ def insert_proc_metadata(proc_data: ProcMetadata):
 
 # New function to persist stage to bronze mappings (refactored)
 def persist_stage_to_bronze_mappings(db, mappings: list[dict]):
-    for mapping in mappings:
-        # Always insert bronze as the destination (anchor)
-        result = db.execute(text("""
-            SELECT id FROM aud.table_map
-            WHERE dest_db = :dest_db AND dest_schema = :dest_schema AND dest_table = :dest_table
-        """), {
+    # Always insert bronze as the destination (anchor)
+    table_maps = bulk_upsert_table_map(db, [
+        {
             "dest_db": BRONZE_DB,
             "dest_schema": mapping["bronze_schema"],
             "dest_table": mapping["bronze_table_name"],
-        })
-        row = result.fetchone()
+        }
+        for mapping in mappings
+    ])
+    table_map_ids = table_maps["ids"]
 
-        if row:
-            table_map_id = row.id
-        else:
-            # Insert new record into table_map and capture the inserted ID
-            result = db.execute(text("""
-                INSERT INTO aud.table_map (dest_db, dest_schema, dest_table)
-                OUTPUT INSERTED.id
-                VALUES (:dest_db, :dest_schema, :dest_table)
-            """), {
-                "dest_db": BRONZE_DB,
-                "dest_schema": mapping["bronze_schema"],
-                "dest_table": mapping["bronze_table_name"],
-            })
-            table_map_id = result.scalar()
-
-        # Insert bronze as destination if not already linked
-        exists_bronze = db.execute(text("""
-            SELECT 1 FROM aud.table_source
-            WHERE table_map_id = :table_map_id
-            AND src_db = :src_db
-            AND src_schema = :src_schema
-            AND src_table = :src_table
-            AND role = 'destination'
-        """), {
+    sources = []
+    for mapping in mappings:
+        table_map_id = table_map_ids[(BRONZE_DB, mapping["bronze_schema"], mapping["bronze_table_name"])]
+        # Bronze is linked to itself as destination
+        sources.append({
             "table_map_id": table_map_id,
             "src_db": BRONZE_DB,
             "src_schema": mapping["bronze_schema"],
             "src_table": mapping["bronze_table_name"],
-        }).fetchone()
-        if not exists_bronze:
-            db.execute(text("""
-                INSERT INTO aud.table_source (table_map_id, src_db, src_schema, src_table, role)
-                VALUES (:table_map_id, :src_db, :src_schema, :src_table, 'destination')
-            """), {
-                "table_map_id": table_map_id,
-                "src_db": BRONZE_DB,
-                "src_schema": mapping["bronze_schema"],
-                "src_table": mapping["bronze_table_name"],
-            })
-
-        # Insert stage as source if present and not already linked
+            "role": "destination",
+        })
+        # Stage as source if present
         if mapping["stage_table_name"]:
-            exists_stage = db.execute(text("""
-                SELECT 1 FROM aud.table_source
-                WHERE table_map_id = :table_map_id
-                AND src_db = :src_db
-                AND src_schema = :src_schema
-                AND src_table = :src_table
-                AND role = 'source'
-            """), {
+            sources.append({
                 "table_map_id": table_map_id,
                 "src_db": STAGE_DB,
                 "src_schema": mapping["stage_schema"],
                 "src_table": mapping["stage_table_name"],
-            }).fetchone()
-            if not exists_stage:
-                db.execute(text("""
-                    INSERT INTO aud.table_source (table_map_id, src_db, src_schema, src_table, role)
-                    VALUES (:table_map_id, :src_db, :src_schema, :src_table, 'source')
-                """), {
-                    "table_map_id": table_map_id,
-                    "src_db": STAGE_DB,
-                    "src_schema": mapping["stage_schema"],
-                    "src_table": mapping["stage_table_name"],
-                })
+                "role": "source",
+            })
+    table_sources = bulk_upsert_table_source(db, sources)
 
     db.commit()
+    publish_lineage_change(db, table_map_ids.values())
+    return {"table_map": counts(table_maps), "table_source": counts(table_sources)}
 
 
 
 # New function to persist silver and gold mappings
 def persist_silver_gold_mappings(db, mappings: list[dict]):
-    inserted_count = 0
-
-    for mapping in mappings:
-        # Check if destination table already exists in table_map for the given proc_id
-        result = db.execute(text("""
-            SELECT 1 FROM aud.table_map
-            WHERE proc_id = :proc_id AND dest_db = :dest_db AND dest_schema = :dest_schema AND dest_table = :dest_table
-        """), {
+    result = bulk_upsert_table_map(db, [
+        {
             "proc_id": mapping["proc_id"],
             "dest_db": mapping["dest_db"],
             "dest_schema": mapping["dest_schema"],
             "dest_table": mapping["dest_table"],
-        }).fetchone()
-
-        if not result:
-            db.execute(text("""
-                INSERT INTO aud.table_map (proc_id, dest_db, dest_schema, dest_table)
-                VALUES (:proc_id, :dest_db, :dest_schema, :dest_table)
-            """), {
-                "proc_id": mapping["proc_id"],
-                "dest_db": mapping["dest_db"],
-                "dest_schema": mapping["dest_schema"],
-                "dest_table": mapping["dest_table"],
-            })
-            inserted_count += 1
+        }
+        for mapping in mappings
+    ], with_proc_id=True)
 
     db.commit()
-    return inserted_count
+    publish_lineage_change(db, result["ids"].values())
+    return result["inserted"]
+
+
+def persist_proc_mappings(db, mappings_by_hash: dict, changed: set = None) -> dict:
+    """
+    Write extracted column mappings for one or more procs ({proc_hash: mappings}) into
+    table_map/table_source/column_map without committing: one upsert per table, with
+    ids resolved once per target table and source table. Re-saving the same mappings
+    adds no rows. Touched table_map ids are added to `changed` if given.
+    Raises ValueError if a proc_hash is not in aud.proc_metadata.
+    """
+    procs = {}
+    for proc_hash in mappings_by_hash:
+        proc = db.execute(
+            text("SELECT id, source_db FROM aud.proc_metadata WHERE proc_hash = :hash"), {"hash": proc_hash}
+        ).fetchone()
+        if not proc:
+            raise ValueError(f"{proc_hash}: Procedure not found")
+        procs[proc_hash] = proc
+
+    rows = []
+    for proc_hash, mappings in mappings_by_hash.items():
+        proc = procs[proc_hash]
+        for m in mappings:
+            # Always force target_db to match the proc's database context
+            m["target_db"] = proc.source_db or ""
+            rows.append((proc.id, m))
+
+    table_maps = bulk_upsert_table_map(db, [
+        {"proc_id": proc_id, "dest_db": m["target_db"], "dest_schema": m["target_schema"], "dest_table": m["target_table"]}
+        for proc_id, m in rows
+    ], with_proc_id=True)
+    table_map_ids = [
+        table_maps["ids"][(proc_id, m["target_db"], m["target_schema"], m["target_table"])]
+        for proc_id, m in rows
+    ]
+
+    table_sources = bulk_upsert_table_source(db, [
+        {
+            "table_map_id": table_map_id,
+            "src_db": m["source_db"],
+            "src_schema": m["source_schema"],
+            "src_table": m["source_table"],
+            "role": "source",
+        }
+        for table_map_id, (_, m) in zip(table_map_ids, rows)
+    ], return_ids=True)
+
+    column_maps = bulk_upsert_column_map(db, [
+        {
+            "table_source_id": table_sources["ids"][(table_map_id, m["source_db"], m["source_schema"], m["source_table"], "source")],
+            "dest_column": m["target_column"],
+            "src_column": m["source_column"],
+            "transform_expr": m.get("transform_expr", ""),
+        }
+        for table_map_id, (_, m) in zip(table_map_ids, rows)
+    ])
+
+    # Record each proc's first source table, as the per-row save did
+    for proc_hash, mappings in mappings_by_hash.items():
+        if mappings:
+            db.execute(
+                text("UPDATE aud.proc_metadata SET source_table = :source_table WHERE proc_hash = :proc_hash"),
+                {"source_table": mappings[0].get("source_table", ""), "proc_hash": proc_hash},
+            )
+
+    if changed is not None:
+        changed.update(table_map_ids)
+    return {
+        "table_map": counts(table_maps),
+        "table_source": counts(table_sources),
+        "column_map": counts(column_maps),
+    }
+
+
+def persist_column_matches(db, matches: list[dict]) -> dict:
+    """
+    Write column matches from column_matching.match_layer_columns as lineage: the dest
+    table's table_map, the src table as its 'source' table_source, and one column_map
+    row per matched column. Idempotent; commits and publishes the change.
+    """
+    dest_keys = [(LAYER_DBS[m["dest_layer"]], m["dest_schema"], m["dest_table"]) for m in matches]
+    table_maps = bulk_upsert_table_map(db, [
+        dict(zip(("dest_db", "dest_schema", "dest_table"), key)) for key in dest_keys
+    ])
+    table_map_ids = [table_maps["ids"][key] for key in dest_keys]
+    source_keys = [
+        (table_map_id, LAYER_DBS[m["src_layer"]], m["src_schema"], m["src_table"], "source")
+        for table_map_id, m in zip(table_map_ids, matches)
+    ]
+    table_sources = bulk_upsert_table_source(db, [
+        dict(zip(("table_map_id", "src_db", "src_schema", "src_table", "role"), key)) for key in source_keys
+    ], return_ids=True)
+    column_maps = bulk_upsert_column_map(db, [
+        {
+            "table_source_id": table_sources["ids"][key],
+            "dest_column": m["dest_column"],
+            "src_column": m["src_column"],
+            # Straight copies between layers; renames carry no expression either
+            "transform_expr": "",
+        }
+        for key, m in zip(source_keys, matches)
+    ])
+
+    db.commit()
+    publish_lineage_change(db, table_map_ids)
+    return {
+        "table_map": counts(table_maps),
+        "table_source": counts(table_sources),
+        "column_map": counts(column_maps),
+    }
 
 
 # Function to persist all extracted table sources (stage, bronze, silver, and gold) into aud.table_source
 def persist_all_table_sources(db, table_sources: list[dict]):
-    inserted_count = 0
-
-    for src in table_sources:
-        # Check if this table source already exists for the given role
-        exists = db.execute(text("""
-            SELECT 1 FROM aud.table_source
-            WHERE table_map_id = :table_map_id
-            AND src_db = :src_db
-            AND src_schema = :src_schema
-            AND src_table = :src_table
-            AND role = :role
-        """), {
-            "table_map_id": src["table_map_id"],
-            "src_db": src["src_db"],
-            "src_schema": src["src_schema"],
-            "src_table": src["src_table"],
-            "role": src["role"]
-        }).fetchone()
-
-        if not exists:
-            db.execute(text("""
-                INSERT INTO aud.table_source (table_map_id, src_db, src_schema, src_table, role, join_predicate)
-                VALUES (:table_map_id, :src_db, :src_schema, :src_table, :role, :join_predicate)
-            """), {
-                "table_map_id": src["table_map_id"],
-                "src_db": src["src_db"],
-                "src_schema": src["src_schema"],
-                "src_table": src["src_table"],
-                "role": src["role"],
-                "join_predicate": src.get("join_predicate"),
-            })
-            inserted_count += 1
+    result = bulk_upsert_table_source(db, table_sources)
 
     db.commit()
-    return inserted_count
+    publish_lineage_change(db, [source.get("table_map_id") for source in table_sources])
+    return result["inserted"]
+
+
 def persist_silver_gold_tables(db):
-    inserted_count = 0
-
-    for db_name in [SILVER_DB, GOLD_DB]:
-        tables = db.execute(text(f"""
-            SELECT TABLE_SCHEMA, TABLE_NAME
-            FROM {db_name}.INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_TYPE = 'BASE TABLE'
-        """)).fetchall()
-
-        for table in tables:
-            dest_schema = table.TABLE_SCHEMA
-            dest_table = table.TABLE_NAME
-
-            # Check if already exists in table_map
-            result = db.execute(text("""
-                SELECT id FROM aud.table_map
-                WHERE dest_db = :dest_db AND dest_schema = :dest_schema AND dest_table = :dest_table
-            """), {
-                "dest_db": db_name,
-                "dest_schema": dest_schema,
-                "dest_table": dest_table,
-            }).fetchone()
-
-            if result:
-                table_map_id = result.id
-            else:
-                # Insert into table_map
-                result = db.execute(text("""
-                    INSERT INTO aud.table_map (dest_db, dest_schema, dest_table)
-                    OUTPUT INSERTED.id
-                    VALUES (:dest_db, :dest_schema, :dest_table)
-                """), {
-                    "dest_db": db_name,
-                    "dest_schema": dest_schema,
-                    "dest_table": dest_table,
-                })
-                table_map_id = result.scalar()
-                inserted_count += 1
-
-            # Check if already exists in table_source
-            exists = db.execute(text("""
-                SELECT 1 FROM aud.table_source
-                WHERE table_map_id = :table_map_id
-                AND src_db = :src_db
-                AND src_schema = :src_schema
-                AND src_table = :src_table
-                AND role = 'PRIMARY'
-            """), {
-                "table_map_id": table_map_id,
-                "src_db": db_name,
-                "src_schema": dest_schema,
-                "src_table": dest_table,
-            }).fetchone()
-
-            if not exists:
-                db.execute(text("""
-                    INSERT INTO aud.table_source (table_map_id, src_db, src_schema, src_table, role)
-                    VALUES (:table_map_id, :src_db, :src_schema, :src_table, 'PRIMARY')
-                """), {
-                    "table_map_id": table_map_id,
-                    "src_db": db_name,
-                    "src_schema": dest_schema,
-                    "src_table": dest_table,
-                })
+    tables = []
+    for layer, db_name in [("silver", SILVER_DB), ("gold", GOLD_DB)]:
+        if settings.CATALOG_SNAPSHOT_ENABLED:
+            rows = [(schema, table) for _, schema, table, _, _ in get_catalog(db).tables(layer, "BASE TABLE")]
+        else:
+            rows = db.execute(text(f"""
+                SELECT TABLE_SCHEMA, TABLE_NAME
+                FROM {db_name}.INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_TYPE = 'BASE TABLE'
+            """)).fetchall()
+        tables.extend(
+            {"dest_db": db_name, "dest_schema": schema, "dest_table": table}
+            for schema, table in rows
+        )
+
+    table_maps = bulk_upsert_table_map(db, tables)
+    table_map_ids = table_maps["ids"]
+
+    # Each table is registered as its own PRIMARY source
+    bulk_upsert_table_source(db, [
+        {
+            "table_map_id": table_map_ids[(t["dest_db"], t["dest_schema"], t["dest_table"])],
+            "src_db": t["dest_db"],
+            "src_schema": t["dest_schema"],
+            "src_table": t["dest_table"],
+            "role": "PRIMARY",
+        }
+        for t in tables
+    ])
 
     db.commit()
-    return inserted_count
\ No newline at end of file
+    publish_lineage_change(db, table_map_ids.values())
+    return table_maps["inserted"]
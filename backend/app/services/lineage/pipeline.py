@@ -0,0 +1,99 @@
+# backend/app/services/lineage/pipeline.py
+#
+# A small DAG runner for multi-step refreshes. Each stage names the stages it needs;
+# stages whose dependencies are done run concurrently on a thread pool, each with its
+# own session. Stages that write the same tables share a lock name so they never
+# overlap (concurrent MERGEs into aud.table_map would only deadlock each other).
+import logging
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app.core.config import settings
+
+
+class Stage:
+    """
+    func(db, inputs) runs the stage and returns (output, rows): output is handed to
+    dependent stages through inputs[stage_name], rows is the count reported for it.
+    """
+
+    def __init__(self, name: str, func, after=(), locks=()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.locks = tuple(locks)
+
+
+def _run_stage(stage: Stage, session_factory, inputs: dict) -> dict:
+    started = time.perf_counter()
+    db = session_factory()
+    try:
+        output, rows = stage.func(db, inputs)
+        db.commit()
+        return {"status": "success", "output": output, "rows": rows, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as ex:
+        db.rollback()
+        logging.error(f"Pipeline stage {stage.name} failed: {ex}\n{traceback.format_exc()}")
+        return {"status": "error", "error": str(ex), "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    finally:
+        db.close()
+
+
+def run_stages(stages: list[Stage], session_factory, max_workers: int = None) -> dict:
+    """
+    Run stages in dependency order, as many at once as dependencies, locks and
+    max_workers allow. A failed stage skips everything downstream of it; independent
+    branches still run. Returns {"status", "elapsed_ms", "stages": [...]} with each
+    stage's status, start offset, elapsed time and row count, in declaration order.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [name for name in stage.after if name not in by_name]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stage(s) {', '.join(missing)}")
+
+    started = time.perf_counter()
+    reports = {}
+    outputs = {}
+    running = {}   # future -> stage
+    held = set()   # lock names held by running stages
+    pool = ThreadPoolExecutor(max_workers=max_workers or settings.PIPELINE_MAX_WORKERS, thread_name_prefix="pipeline")
+    try:
+        while len(reports) < len(stages) or running:
+            progressed = False
+            for stage in stages:
+                if stage.name in reports:
+                    continue
+                if any(reports.get(name, {}).get("status") in ("error", "skipped") for name in stage.after):
+                    reports[stage.name] = {"status": "skipped", "rows": None, "elapsed_ms": 0.0}
+                    progressed = True
+                    continue
+                ready = all(reports.get(name, {}).get("status") == "success" for name in stage.after)
+                if ready and not held.intersection(stage.locks):
+                    held.update(stage.locks)
+                    inputs = {name: outputs[name] for name in stage.after}
+                    running[pool.submit(_run_stage, stage, session_factory, inputs)] = stage
+                    reports[stage.name] = {"started_ms": round((time.perf_counter() - started) * 1000, 1)}
+                    progressed = True
+            if not running:
+                if not progressed:
+                    raise ValueError("Pipeline stages have a dependency cycle")
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                held.difference_update(stage.locks)
+                result = future.result()
+                outputs[stage.name] = result.pop("output", None)
+                reports[stage.name].update(result)
+    finally:
+        pool.shutdown(wait=True)
+
+    stage_reports = [{"stage": stage.name, **reports[stage.name]} for stage in stages]
+    failed = any(r["status"] != "success" for r in stage_reports)
+    return {
+        "status": "error" if failed else "success",
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "stages": stage_reports,
+    }
@@ -1,18 +1,153 @@
 from fastapi import APIRouter
 from sqlmodel import Session, select
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import sessionmaker
 from app.services.lineage.models_sql import ProcMetadata
+from app.core.config import settings, SILVER_DB, GOLD_DB
 from app.core.database import engine
+from app.services.lineage.analyze import analyze_procedures
+from app.services.lineage.cache import get_cached_mappings
+from app.services.lineage.catalog import load_catalog
+from app.services.lineage.column_matching import match_layer_columns
+from app.services.lineage.discovery import discover_procs_incremental, unanalyzed_proc_hashes
+from app.services.lineage.export import export_lineage_snapshot
+from app.services.lineage.extract import extract_stage_to_bronze_mappings
+from app.services.lineage.materialize import rebuild_flat_lineage
+from app.services.lineage.persist import persist_column_matches, persist_silver_gold_tables, persist_stage_to_bronze_mappings
+from app.services.lineage.pipeline import Stage, run_stages
 
 router = APIRouter()
 
-def run_full_lineage_population(db):
-    # Placeholder logic for populating lineage-related tables
-    # You will replace these with actual function calls later
-    results = {
-        "stage_to_bronze": "TODO: stage to bronze mapping logic",
-        "bronze_to_silver": "TODO: bronze to silver stored procedure parsing",
-        "silver_to_gold": "TODO: silver to gold stored procedure parsing"
-    }
+# Stages that MERGE into aud.table_map / table_source take this lock so they run one at a time
+LINEAGE_WRITE_LOCK = "lineage_write"
+
+
+def _catalog_stage(db, inputs):
+    catalog = load_catalog(db)
+    return None, sum(len(catalog.tables(layer)) for layer in ("stage", "bronze", "silver", "gold"))
+
+
+def _stage_to_bronze_stage(db, inputs):
+    mappings = extract_stage_to_bronze_mappings(db)
+    persist_stage_to_bronze_mappings(db, mappings)
+    return mappings, len(mappings)
+
+
+def _silver_gold_tables_stage(db, inputs):
+    return None, persist_silver_gold_tables(db)
+
+
+def _column_matches_stage(db, inputs):
+    # Reuse the table pairs stage_to_bronze just wrote instead of matching again
+    matches = match_layer_columns(db, stage_to_bronze=inputs["stage_to_bronze"])
+    persist_column_matches(db, matches)
+    return None, len(matches)
+
+
+def _discover_stage(db_name: str):
+    def discover(db, inputs):
+        report = discover_procs_incremental(db, [db_name])
+        return [p["proc_hash"] for p in report["added"] + report["changed"]], len(report["added"]) + len(report["changed"])
+    return discover
+
+
+def _extract_stage(reanalyze_all: bool, workers: int = None):
+    def extract(db, inputs):
+        if reanalyze_all:
+            found = db.execute(text("SELECT proc_hash, proc_definition, source_db FROM aud.proc_metadata")).mappings().all()
+        else:
+            # Discovery has already moved the watermark, so also retry procs whose
+            # extraction or save failed on an earlier run
+            proc_hashes = list(dict.fromkeys(
+                inputs["discover_silver"] + inputs["discover_gold"] + unanalyzed_proc_hashes(db)
+            ))
+            query = text("""
+                SELECT proc_hash, proc_definition, source_db
+                FROM aud.proc_metadata
+                WHERE proc_hash IN :proc_hashes
+            """).bindparams(bindparam("proc_hashes", expanding=True))
+            found = []
+            for start in range(0, len(proc_hashes), 1000):
+                found.extend(db.execute(query, {"proc_hashes": proc_hashes[start:start + 1000]}).mappings())
+        rows = list({r["proc_hash"]: dict(r) for r in found}.values())
+        cached = get_cached_mappings(db, [r["proc_hash"] for r in rows])
+        db.commit()
+        results = list(analyze_procedures(rows, max_workers=workers, cached=cached))
+        return results, sum(1 for r in results if r["status"] == "success")
+    return extract
+
+
+def _persist_stage(db, inputs):
+    from app.services.lineage.routes import save_analysis_batch
+    results = [r for r in inputs["extract"] if r["status"] == "success"]
+    batch_size = settings.ANALYZE_SAVE_BATCH_SIZE
+    errors = []
+    for start in range(0, len(results), batch_size):
+        error = save_analysis_batch(db, results[start:start + batch_size])
+        if error:
+            errors.append(error)
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {-(-len(results) // batch_size)} batches failed; first error: {errors[0]}")
+    return None, sum(len(r["mappings"]) for r in results)
+
+
+def _materialize_stage(db, inputs):
+    # The in-memory graph already follows each write through on_lineage_change
+    if not settings.FLAT_LINEAGE_MATERIALIZED:
+        return None, 0
+    rebuilt = rebuild_flat_lineage(db)
+    return None, rebuilt["table"] + rebuilt["column"]
+
+
+def _export_stage(db, inputs):
+    manifest = export_lineage_snapshot(db)
+    return None, sum(t["rows"] for t in manifest["tables"].values())
+
+
+def lineage_population_stages(analyze: bool = True, reanalyze_all: bool = False, workers: int = None) -> list[Stage]:
+    """
+    The full refresh as a DAG:
+
+        catalog ──> stage_to_bronze ──┬─> column_matches ─┐
+                └─> silver_gold_tables ┘                   │
+        discover_silver ─┐                                 ├─> materialize
+        discover_gold ───┴─> extract ─> persist ───────────┘
+
+    With LINEAGE_READ_FROM_SNAPSHOT, an export stage after materialize writes the
+    snapshot that reads are served from.
+    """
+    stages = [
+        Stage("catalog", _catalog_stage),
+        Stage("discover_silver", _discover_stage(SILVER_DB)),
+        Stage("discover_gold", _discover_stage(GOLD_DB)),
+        Stage("stage_to_bronze", _stage_to_bronze_stage, after=["catalog"], locks=[LINEAGE_WRITE_LOCK]),
+        Stage("silver_gold_tables", _silver_gold_tables_stage, after=["catalog"], locks=[LINEAGE_WRITE_LOCK]),
+        Stage(
+            "column_matches", _column_matches_stage,
+            after=["stage_to_bronze", "silver_gold_tables"], locks=[LINEAGE_WRITE_LOCK],
+        ),
+    ]
+    writes = ["column_matches"]
+    if analyze:
+        stages += [
+            Stage("extract", _extract_stage(reanalyze_all, workers), after=["discover_silver", "discover_gold"]),
+            Stage("persist", _persist_stage, after=["extract"], locks=[LINEAGE_WRITE_LOCK]),
+        ]
+        writes.append("persist")
+    stages.append(Stage("materialize", _materialize_stage, after=writes, locks=[LINEAGE_WRITE_LOCK]))
+    if settings.LINEAGE_READ_FROM_SNAPSHOT:
+        stages.append(Stage("export", _export_stage, after=["materialize"], locks=[LINEAGE_WRITE_LOCK]))
+    return stages
+
+
+def run_full_lineage_population(db, analyze: bool = True, reanalyze_all: bool = False, workers: int = None) -> dict:
+    """
+    Refresh all lineage: catalog, stage->bronze matching, silver/gold table registration,
+    proc discovery, proc extraction, persist and materialization. Independent stages run
+    concurrently, each on its own session. Returns per-stage timings and row counts.
+    """
+    session_factory = sessionmaker(bind=db.get_bind(), autoflush=False)
+    return run_stages(lineage_population_stages(analyze, reanalyze_all, workers), session_factory)
 
 @router.get("/api/lineage/procs")
 def get_procedures():
@@ -1,138 +1,155 @@
 from fastapi import APIRouter, Depends, Query, Body, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-import hashlib
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import bindparam, text
+import asyncio
+import json
 import logging
 import traceback
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db, get_pool_status, SessionLocal
 from app.core.config import BRONZE_DB, SILVER_DB, GOLD_DB
 from app.services.lineage.extract import extract_stage_to_bronze_mappings
 from app.services.lineage.extract import extract_silver_gold_mappings
-from app.services.lineage.persist import persist_silver_gold_mappings  # ensure it's only imported once
-from app.services.lineage.agent import run_agent_query
-
-# Helper function to extract column mappings from LLM given a procedure definition
-def extract_column_mappings_from_llm(proc_definition: str):
-    """
-    Given a stored procedure definition, use LLM to extract column-level lineage mappings.
-    Returns a tuple (mappings, error): mappings is a list of dicts, error is None if success, else error message.
-    """
-    try:
-        from langchain_openai import AzureChatOpenAI
-        from langchain.prompts import PromptTemplate
-        import os
-        import json
-        import re
-
-        llm = AzureChatOpenAI(
-            azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
-            temperature=0,
-            max_tokens=2048,
-        )
-
-        prompt = PromptTemplate(
-            input_variables=["proc_code"],
-            template="""
-You are an expert at SQL Server ETL lineage extraction.
-Given this stored procedure, extract a JSON array of all column-level mappings in the format:
-
-[
-  {{
-    "source_db": "...",
-    "source_schema": "...",
-    "source_table": "...",
-    "source_column": "...",
-    "target_db": "...",
-    "target_schema": "...",
-    "target_table": "...",
-    "target_column": "...",
-    "transform_expr": ""
-  }}
-]
-
-If a mapping does not use a transform, leave transform_expr blank.
-
-- `source_db` is the database the source table is read from (e.g. "wh_bronze").
-- `source_schema` is the schema of the source table.
-- `source_table` is the table name in the FROM clause.
-- `source_column` is the original column.
-- `target_db` is the database the procedure writes into (use the database context or variable if present; otherwise, infer based on naming).
-- `target_schema` and `target_table` are the schema and table being inserted into.
-- `target_column` is the destination column.
-- `transform_expr` is any transformation expression applied to the column (otherwise blank).
-
-Return ONLY the JSON array. Do not explain.
-
-Procedure:
----
-{proc_code}
----
-"""
-        )
-
-        full_prompt = prompt.format(proc_code=proc_definition)
-        result = llm.invoke(full_prompt)
-        ai_text = getattr(result, "content", None) or str(result)
-
-        # Remove triple backticks, language identifiers, and whitespace
-        ai_text_clean = re.sub(r"^```(?:json)?|```$", "", ai_text.strip(), flags=re.MULTILINE).strip()
-        # Try to find the JSON array
-        match = re.search(r'\[[\s\S]*\]', ai_text_clean)
-        if not match:
-            logging.error(f"LLM lineage extraction failed. Raw response:\n{ai_text}")
-            return None, "Could not find a JSON array in LLM output"
-        json_str = match.group(0)
-        try:
-            mappings = json.loads(json_str)
-        except Exception as ex:
-            logging.error(f"Failed to parse LLM JSON: {ex}\nRaw string: {json_str}")
-            return None, f"Failed to parse mappings JSON: {str(ex)}"
-        return mappings, None
-    except Exception as ex:
-        logging.error(f"Exception in extract_column_mappings_from_llm: {ex}\n{traceback.format_exc()}")
-        return None, f"Failed to analyze procedure: {str(ex)}"
+from app.services.lineage.persist import persist_proc_mappings, persist_silver_gold_mappings  # ensure it's only imported once
+from app.services.lineage.agent import run_agent_query_async
+from app.services.lineage.agent_cache import agent_cache_stats, clear_agent_cache
+from app.services.lineage.analyze import extract_column_mappings, run_analysis_pipeline
+from app.services.lineage.discovery import discover_procs_incremental, hash_definition, save_proc_metadata
+from app.services.lineage.cache import (
+    cache_stats,
+    evict_cache,
+    get_cached_mappings,
+    invalidate_cache,
+    put_cached_mappings,
+)
+from app.services.lineage.catalog import get_catalog, load_catalog
+from app.services.lineage.events import publish_lineage_change
+from app.services.lineage.export import export_lineage_snapshot, list_versions, read_latest_version, read_snapshot
+from app.services.lineage.flat import build_flat_query, fetch_flat_page, iter_flat_rows, rows_to_csv, rows_to_ndjson
+from app.services.lineage.materialize import flat_lineage_status, flat_table_relation, rebuild_flat_lineage
+from app.services.lineage.graph import format_node, get_lineage_graph, node_key, parse_node
+from app.services.lineage.jobs import JobFailed, get_job_runner, job_handler, job_types
+from app.services.lineage.search_index import get_search_index
 
 router = APIRouter()
 extract_router = router  # alias to expose extract_router
 
 @router.get("/flat")
-def get_flat_table_lineage(db: Session = Depends(get_db)):
-    query = text("""
-        SELECT
-            lineage_id,
-            stage_db, stage_schema, stage_table,
-            bronze_db, bronze_schema, bronze_table,
-            silver_db, silver_schema, silver_table,
-            gold_db, gold_schema, gold_table
-        FROM aud.vw_flat_table_lineage
-        ORDER BY stage_db, stage_schema, stage_table,
-            bronze_db, bronze_schema, bronze_table,
-            silver_db, silver_schema, silver_table,
-            gold_db, gold_schema, gold_table
-    """)
-    results = db.execute(query).mappings().all()
+async def get_flat_table_lineage(
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(default=None, ge=1, le=10000, description="Page size; returns {items, next_cursor} instead of a list"),
+    cursor: str = Query(default=None, description="next_cursor from the previous page"),
+    layer: str = Query(default=None, description="Only rows that reach this layer (stage, bronze, silver, gold)"),
+    schema: str = Query(default=None, description="Schema name, matched on `layer` or on any layer"),
+    format: str = Query(default="json", pattern="^(json|ndjson|csv)$", description="ndjson/csv stream every matching row"),
+):
+    from fastapi import HTTPException
+    try:
+        # Validate filters and cursor before any response starts streaming
+        build_flat_query(layer, schema, cursor)
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+
+    # Opening and scanning a snapshot is blocking file I/O: keep it off the event loop
+    snapshot = await run_in_threadpool(read_snapshot)
+    if format != "json":
+        def row_stream():
+            if snapshot is not None:
+                rows = snapshot.iter_flat_rows(layer, schema, cursor)
+                yield from (rows_to_csv(rows) if format == "csv" else rows_to_ndjson(rows))
+                return
+            # The request-scoped session may be closed before streaming finishes, so use our own
+            stream_db = SessionLocal()
+            try:
+                rows = iter_flat_rows(stream_db, layer, schema, cursor)
+                yield from (rows_to_csv(rows) if format == "csv" else rows_to_ndjson(rows))
+            finally:
+                stream_db.close()
+
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        headers = {"Content-Disposition": "attachment; filename=flat_table_lineage.csv"} if format == "csv" else None
+        return StreamingResponse(row_stream(), media_type=media_type, headers=headers)
+
+    if snapshot is not None:
+        if limit:
+            return await run_in_threadpool(snapshot.fetch_flat_page, limit, layer, schema, cursor)
+        return await run_in_threadpool(lambda: list(snapshot.iter_flat_rows(layer, schema, cursor)))
+
+    if limit:
+        return await db.run_sync(fetch_flat_page, limit, layer, schema, cursor)
+
+    query, params = build_flat_query(layer, schema, cursor, relation=await db.run_sync(flat_table_relation))
+    results = (await db.execute(query, params)).mappings().all()
     return results
 
+
+@router.post("/flat/rebuild")
+def rebuild_flat_lineage_tables(db: Session = Depends(get_db)):
+    rows = rebuild_flat_lineage(db)
+    return {"detail": f"{rows['table']} table paths and {rows['column']} column paths materialized."}
+
+
+@router.get("/flat/status")
+def get_flat_lineage_status(db: Session = Depends(get_db)):
+    return flat_lineage_status(db)
+
+
+@router.post("/export")
+def export_lineage(
+    db: Session = Depends(get_db),
+    parquet: bool = Query(default=None, description="Also write Parquet copies (default LINEAGE_EXPORT_PARQUET)"),
+    background: bool = Query(default=False, description="If true, runs as a background job and returns its job_id"),
+):
+    """Write a new versioned Arrow/Parquet snapshot of the lineage tables and flat paths."""
+    if background:
+        return _submit_job(db, "export", {"parquet": parquet})
+    try:
+        return export_lineage_snapshot(db, parquet=parquet)
+    except RuntimeError as ex:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=503, detail=str(ex))
+
+
+@router.get("/export")
+def get_export_status():
+    """Exported versions, the one LATEST points at, and the snapshot this worker serves reads from."""
+    snapshot = read_snapshot()
+    return {
+        "versions": list_versions(),
+        "latest": read_latest_version(),
+        "serving": snapshot.stats() if snapshot is not None else None,
+    }
+
 @router.post("/populate")
-def populate_lineage_data(db: Session = Depends(get_db)):
+def populate_lineage_data(
+    db: Session = Depends(get_db),
+    analyze: bool = Query(default=True, description="Also extract and save mappings for new or changed procs"),
+    reanalyze_all: bool = Query(default=False, description="Extract every proc, not just new or changed ones"),
+    background: bool = Query(default=False, description="If true, runs as a background job and returns its job_id"),
+):
+    """Full lineage refresh as a staged pipeline; returns per-stage timings and row counts."""
+    if background:
+        return _submit_job(db, "populate", {"analyze": analyze, "reanalyze_all": reanalyze_all})
     from .procs import run_full_lineage_population
-    return run_full_lineage_population(db)
+    return run_full_lineage_population(db, analyze, reanalyze_all)
 
 @router.get("/extract/bronze-to-silver")
-def extract_bronze_to_silver(
-    db: Session = Depends(get_db)
+async def extract_bronze_to_silver(
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = text("""
+    snapshot = await run_in_threadpool(read_snapshot)
+    if snapshot is not None:
+        return await run_in_threadpool(snapshot.table_hops, "bronze", "silver")
+    query = text(f"""
         SELECT
             bronze_db, bronze_schema, bronze_table,
             silver_db, silver_schema, silver_table
-        FROM aud.vw_flat_table_lineage
+        FROM {await db.run_sync(flat_table_relation)}
         WHERE bronze_db <> '' AND silver_db <> ''
     """)
-    results = db.execute(query).mappings().all()
+    results = (await db.execute(query)).mappings().all()
     return results
 
 # New endpoint for extracting stage-to-bronze mappings
@@ -148,6 +165,37 @@ def extract_stage_bronze_endpoint(
     return mappings
 
 
+@router.get("/match/stage-to-bronze")
+def match_stage_bronze_endpoint(
+    db: Session = Depends(get_db),
+    top_k: int = Query(default=None, ge=1, description="Candidates per bronze table (default MATCH_TOP_K)"),
+    min_confidence: float = Query(default=None, ge=0, le=1, description="Default MATCH_MIN_CONFIDENCE"),
+):
+    """Ranked stage candidates for every bronze table, with name/column similarity and confidence."""
+    from app.services.lineage.matching import match_stage_to_bronze
+    return match_stage_to_bronze(db, top_k=top_k, min_confidence=min_confidence)
+
+
+@router.get("/match/columns")
+def match_columns_endpoint(
+    db: Session = Depends(get_db),
+    layers: list[str] = Query(default=["stage-bronze", "bronze-silver"], description="stage-bronze and/or bronze-silver"),
+    min_score: float = Query(default=None, ge=0, le=1, description="Default MATCH_COLUMN_MIN_SCORE"),
+    persist: bool = Query(default=False, description="If true, writes the matches to aud.column_map"),
+):
+    """Column-level matches between copy-loaded layers, from INFORMATION_SCHEMA column fingerprints."""
+    from fastapi import HTTPException
+    from app.services.lineage.column_matching import LAYER_PAIRS, match_layer_columns
+    unknown = [pair for pair in layers if pair not in LAYER_PAIRS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown layer pair(s): {', '.join(unknown)}")
+    matches = match_layer_columns(db, layers, min_score)
+    if persist:
+        from app.services.lineage.persist import persist_column_matches
+        return {"matches": len(matches), **persist_column_matches(db, matches)}
+    return matches
+
+
 # New endpoint for extracting silver-to-gold mappings
 @router.get("/extract/silver-to-gold")
 def extract_silver_gold_endpoint(
@@ -162,7 +210,7 @@ def extract_silver_gold_endpoint(
 
 # POST endpoint for persisting silver-to-gold mappings
 @router.post("/extract/silver-to-gold")
-async def persist_silver_gold_endpoint(
+def persist_silver_gold_endpoint(
     db: Session = Depends(get_db),
     mappings: list[dict] = Body(default=[])
 ):
@@ -174,7 +222,7 @@ async def persist_silver_gold_endpoint(
 
 # GET endpoint to preview silver-to-gold stored procedures
 @router.get("/extract/silver-to-gold/preview")
-def preview_silver_gold_procs(db: Session = Depends(get_db)):
+async def preview_silver_gold_procs(db: AsyncSession = Depends(get_async_db)):
     query = text(f"""
         SELECT
             id AS proc_id,
@@ -185,13 +233,24 @@ def preview_silver_gold_procs(db: Session = Depends(get_db)):
         FROM aud.proc_metadata
         WHERE source_db IN ('{BRONZE_DB}', '{SILVER_DB}')
     """)
-    results = db.execute(query).mappings().all()
+    results = (await db.execute(query)).mappings().all()
     return results
 
 
 # POST endpoint to load all silver and gold tables into aud.table_source
 @router.post("/load/silver-gold-tables")
-def load_silver_gold_tables(db: Session = Depends(get_db)):
+def load_silver_gold_tables(
+    db: Session = Depends(get_db),
+    background: bool = Query(default=False, description="If true, runs as a background job and returns its job_id"),
+):
+    if background:
+        return _submit_job(db, "load_silver_gold_tables")
+    load_silver_gold_table_sources(db)
+    return {"detail": "Silver and gold tables loaded into aud.table_source."}
+
+
+def load_silver_gold_table_sources(db):
+    """MERGE every silver and gold table into aud.table_source as a destination. Commits."""
     query = text(f"""
         MERGE aud.table_source AS target
         USING (
@@ -218,11 +277,10 @@ def load_silver_gold_tables(db: Session = Depends(get_db)):
     """)
     db.execute(query)
     db.commit()
-    return {"detail": "Silver and gold tables loaded into aud.table_source."}
 
 # GET endpoint to inspect what silver and gold tables were loaded
 @router.get("/view/silver-gold-tables")
-def view_silver_gold_tables(db: Session = Depends(get_db)):
+async def view_silver_gold_tables(db: AsyncSession = Depends(get_async_db)):
     query = text(f"""
         SELECT
             src_db,
@@ -234,13 +292,40 @@ def view_silver_gold_tables(db: Session = Depends(get_db)):
         WHERE src_db IN ('{SILVER_DB}', '{GOLD_DB}')
         ORDER BY src_db, src_schema, src_table
     """)
-    results = db.execute(query).mappings().all()
+    results = (await db.execute(query)).mappings().all()
     return results
 
 
 # GET endpoint to extract all stored procedures from silver and gold databases
 @router.get("/discover/silver-gold-procs")
-def discover_silver_gold_procs(db: Session = Depends(get_db)):
+def discover_silver_gold_procs(
+    db: Session = Depends(get_db),
+    incremental: bool = Query(default=False, description="If true, only fetches procs added or modified since the last incremental run"),
+    analyze: bool = Query(default=False, description="With incremental, also analyze and save the added/changed procs"),
+    background: bool = Query(default=False, description="If true, runs as a background job and returns its job_id"),
+):
+    if background:
+        return _submit_job(db, "discover", {"incremental": incremental, "analyze": analyze})
+    if incremental:
+        report = discover_procs_incremental(db)
+        if analyze:
+            proc_hashes = [p["proc_hash"] for p in report["added"] + report["changed"]]
+            rows = []
+            if proc_hashes:
+                rows = db.execute(text("""
+                    SELECT proc_hash, proc_definition, source_db
+                    FROM aud.proc_metadata
+                    WHERE proc_hash IN :proc_hashes
+                """).bindparams(bindparam("proc_hashes", expanding=True)), {"proc_hashes": proc_hashes}).mappings().all()
+            unique_rows = {r["proc_hash"]: dict(r) for r in rows}
+            report["analysis"] = analyze_and_save(db, list(unique_rows.values()))
+        return report
+
+    return discover_all_procs(db)
+
+
+def discover_all_procs(db) -> list[dict]:
+    """Hash every silver and gold proc and save new definitions to aud.proc_metadata. Commits."""
     query = text(f"""
         SELECT
             1 as sort,
@@ -265,41 +350,15 @@ def discover_silver_gold_procs(db: Session = Depends(get_db)):
     """)
     results = db.execute(query).mappings().all()
 
-    import hashlib
     hashed_results = []
     for r in results:
-        text_def = r["proc_definition"] or ""
-        proc_hash = hashlib.sha256(text_def.encode("utf-8")).hexdigest()
         hashed_results.append({
             **r,
-            "proc_hash": proc_hash
+            "proc_hash": hash_definition(r["proc_definition"])
         })
 
     # Persist hashed_results into aud.proc_metadata, avoiding duplicates
-    for row in hashed_results:
-        db.execute(text(f"""
-            MERGE aud.proc_metadata AS target
-            USING (SELECT
-                       :source_db AS source_db,
-                       :schema_name AS source_schema,
-                       :proc_name AS proc_name,
-                       :proc_definition AS proc_definition,
-                       :proc_hash AS proc_hash
-                  ) AS src
-            ON (target.source_db = src.source_db
-                AND target.source_schema = src.source_schema
-                AND target.proc_name = src.proc_name
-                AND target.proc_hash = src.proc_hash)
-            WHEN NOT MATCHED THEN
-                INSERT (source_db, source_schema, proc_name, proc_definition, proc_hash, record_insert_datetime)
-                VALUES (src.source_db, src.source_schema, src.proc_name, src.proc_definition, src.proc_hash, GETDATE());
-        """), {
-            "source_db": row["source_db"],
-            "schema_name": row["schema_name"],
-            "proc_name": row["proc_name"],
-            "proc_definition": row["proc_definition"],
-            "proc_hash": row["proc_hash"]
-        })
+    save_proc_metadata(db, hashed_results)
     db.commit()
 
     return hashed_results
@@ -307,7 +366,7 @@ def discover_silver_gold_procs(db: Session = Depends(get_db)):
 
 # GET endpoint to return stored procedure details by proc_hash
 @router.get("/procedures/{proc_hash}")
-def get_procedure_by_hash(proc_hash: str, db: Session = Depends(get_db)):
+async def get_procedure_by_hash(proc_hash: str, db: AsyncSession = Depends(get_async_db)):
     query = text("""
         SELECT 
             proc_name,
@@ -319,7 +378,7 @@ def get_procedure_by_hash(proc_hash: str, db: Session = Depends(get_db)):
         FROM aud.proc_metadata
         WHERE proc_hash = :proc_hash
     """)
-    result = db.execute(query, {"proc_hash": proc_hash}).mappings().first()
+    result = (await db.execute(query, {"proc_hash": proc_hash})).mappings().first()
     if not result:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Procedure not found")
@@ -330,166 +389,428 @@ def get_procedure_by_hash(proc_hash: str, db: Session = Depends(get_db)):
 def analyze_procedure(proc_hash: str, db: Session = Depends(get_db)):
     # 1. Get the stored proc by hash
     proc = db.execute(
-        text("SELECT proc_name, proc_definition FROM aud.proc_metadata WHERE proc_hash = :proc_hash"),
+        text("SELECT proc_name, proc_definition, source_db FROM aud.proc_metadata WHERE proc_hash = :proc_hash"),
         {"proc_hash": proc_hash}
     ).fetchone()
     if not proc:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Procedure not found")
+    proc_db = proc.source_db or ""
 
-    # 2. Use helper to extract mappings from LLM
-    mappings, error = extract_column_mappings_from_llm(proc.proc_definition)
-    if error:
-        return {"error": error}
+    # 2. Use cached mappings for an unchanged definition, otherwise parse it (LLM as fallback)
+    cached = get_cached_mappings(db, [proc_hash])
+    if proc_hash in cached:
+        mappings, method = cached[proc_hash], "cache"
+    else:
+        mappings, error, method = extract_column_mappings(proc.proc_definition, proc_db)
+        if error:
+            return {"error": error}
+        if method == "llm":
+            put_cached_mappings(db, {proc_hash: mappings})
+    db.commit()
 
     # Post-process: inject target_db using the procedure's database context if blank
-    proc_db = db.execute(
-        text("SELECT source_db FROM aud.proc_metadata WHERE proc_hash = :proc_hash"),
-        {"proc_hash": proc_hash}
-    ).scalar() or ""
     for m in mappings:
         m["target_db"] = proc_db
 
-    return {"mappings": mappings}
+    return {"mappings": mappings, "method": method}
 
-@router.post("/procedures/{proc_hash}/mappings")
-def save_proc_mappings(proc_hash: str, mappings: list[dict] = Body(...), db: Session = Depends(get_db)):
-    # 1. Lookup proc_metadata
-    proc = db.execute(text("SELECT id, source_db FROM aud.proc_metadata WHERE proc_hash = :hash"), {"hash": proc_hash}).fetchone()
-    if not proc:
-        return {"error": "Procedure not found"}, 404
+def write_proc_mappings(db, proc_hash: str, mappings: list[dict], changed: set = None):
+    """
+    Write LLM mappings for one proc into table_map/table_source/column_map without committing.
+    Touched table_map ids are added to `changed` if given. Returns an error message, or None on success.
+    """
+    try:
+        persist_proc_mappings(db, {proc_hash: mappings}, changed)
+    except ValueError:
+        return "Procedure not found"
+    return None
 
-    proc_id = proc.id
-    proc_db = proc.source_db or ""
-    # Always force target_db to match proc context for all mappings
-    for m in mappings:
-        m["target_db"] = proc_db
-        # TableMap for target
-        result = db.execute(text("""
-            SELECT id FROM aud.table_map
-            WHERE proc_id = :proc_id
-              AND dest_db = :dest_db
-              AND dest_schema = :dest_schema
-              AND dest_table = :dest_table
-        """), {
-            "proc_id": proc_id,
-            "dest_db": m["target_db"],
-            "dest_schema": m["target_schema"],
-            "dest_table": m["target_table"]
-        }).fetchone()
-        if result:
-            table_map_id = result.id
-        else:
-            ins = db.execute(text("""
-                INSERT INTO aud.table_map (proc_id, dest_db, dest_schema, dest_table)
-                OUTPUT INSERTED.id
-                VALUES (:proc_id, :dest_db, :dest_schema, :dest_table)
-            """), {
-                "proc_id": proc_id,
-                "dest_db": m["target_db"],
-                "dest_schema": m["target_schema"],
-                "dest_table": m["target_table"]
-            })
-            table_map_id = ins.scalar()
-        # Insert into table_source (source table, role='source')
-        db.execute(text("""
-            IF NOT EXISTS (
-                SELECT 1 FROM aud.table_source
-                WHERE table_map_id = :table_map_id
-                  AND src_db = :src_db
-                  AND src_schema = :src_schema
-                  AND src_table = :src_table
-                  AND role = 'source'
-            )
-            INSERT INTO aud.table_source (table_map_id, src_db, src_schema, src_table, role)
-            VALUES (:table_map_id, :src_db, :src_schema, :src_table, 'source')
-        """), {
-            "table_map_id": table_map_id,
-            "src_db": m["source_db"],
-            "src_schema": m["source_schema"],
-            "src_table": m["source_table"]
-        })
-        # Insert into column_map
-        db.execute(text("""
-            INSERT INTO aud.column_map (table_source_id, dest_column, src_column, transform_expr)
-            SELECT ts.id, :dest_column, :src_column, :transform_expr
-            FROM aud.table_source ts
-            WHERE ts.table_map_id = :table_map_id
-              AND ts.src_db = :src_db
-              AND ts.src_schema = :src_schema
-              AND ts.src_table = :src_table
-              AND ts.role = 'source'
-        """), {
-            "table_map_id": table_map_id,
-            "src_db": m["source_db"],
-            "src_schema": m["source_schema"],
-            "src_table": m["source_table"],
-            "dest_column": m["target_column"],
-            "src_column": m["source_column"],
-            "transform_expr": m.get("transform_expr", ""),
-        })
 
-    # After processing all mappings, update proc_metadata with first source_table (if any)
-    if mappings:
-        first_mapping = mappings[0]
-        db.execute(
-            text("""
-                UPDATE aud.proc_metadata
-                SET source_table = :source_table
-                WHERE proc_hash = :proc_hash
-            """),
-            {
-                "source_table": first_mapping.get("source_table", ""),
-                "proc_hash": proc_hash,
-            }
-        )
+@router.post("/procedures/{proc_hash}/mappings")
+def save_proc_mappings(proc_hash: str, mappings: list[dict] = Body(...), db: Session = Depends(get_db)):
+    changed = set()
+    error = write_proc_mappings(db, proc_hash, mappings, changed)
+    if error:
+        return {"error": error}, 404
 
     db.commit()
+    publish_lineage_change(db, changed)
     return {"detail": "Mappings saved"}
 
 
+def save_analysis_batch(db, batch: list[dict]):
+    """
+    Persist a batch of analysis results from run_analysis_pipeline in one transaction.
+    Returns an error message, or None on success.
+    """
+    changed = set()
+    try:
+        # The whole batch goes out as one upsert per table rather than per proc
+        persist_proc_mappings(db, {r["proc_hash"]: r["mappings"] for r in batch}, changed)
+        # Parser results are cheap to recompute; only LLM output is worth caching
+        put_cached_mappings(db, {r["proc_hash"]: r["mappings"] for r in batch if r["method"] == "llm"})
+        db.commit()
+        publish_lineage_change(db, changed)
+        return None
+    except Exception as ex:
+        db.rollback()
+        logging.error(f"Failed to save analysis batch: {ex}\n{traceback.format_exc()}")
+        return str(ex)
+
+
 # -------------------------------------------------------------
 # Convenience endpoint: analyze all procs with the LLM and save mappings
 # -------------------------------------------------------------
 @router.post("/procedures/analyze-save-all")
-def analyze_and_save_all_procedures(db: Session = Depends(get_db)):
+def analyze_and_save_all_procedures(
+    db: Session = Depends(get_db),
+    stream: bool = Query(default=False, description="If true, streams per-proc progress as NDJSON"),
+    workers: int = Query(default=None, ge=1, le=64, description="Concurrent LLM calls (defaults to LLM_MAX_WORKERS)"),
+    background: bool = Query(default=False, description="If true, runs as a resumable background job and returns its job_id"),
+):
     """
     Analyze and save lineage for all stored procedures in aud.proc_metadata.
+    LLM calls run concurrently; DB writes are batched on the request thread.
     """
+    if background:
+        return _submit_job(db, "analyze_all", {"workers": workers})
+    if stream:
+        def event_stream():
+            # The request-scoped session may be closed before streaming finishes, so use our own
+            stream_db = SessionLocal()
+            try:
+                rows = stream_db.execute(
+                    text("SELECT proc_hash, proc_definition, source_db FROM aud.proc_metadata")
+                ).mappings().all()
+                cached = get_cached_mappings(stream_db, [r["proc_hash"] for r in rows])
+                stream_db.commit()
+                events = run_analysis_pipeline(
+                    [dict(r) for r in rows],
+                    lambda batch: save_analysis_batch(stream_db, batch),
+                    max_workers=workers,
+                    cached=cached,
+                )
+                for event in events:
+                    yield json.dumps(event, default=str) + "\n"
+                evict_cache(stream_db)
+            finally:
+                stream_db.close()
+
+        return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
     # Fetch all stored procedure hashes and definitions
     proc_hashes = db.execute(
         text("SELECT proc_hash, proc_definition, source_db FROM aud.proc_metadata")
     ).mappings().all()
 
-    results = []
+    return analyze_and_save(db, [dict(r) for r in proc_hashes], workers)
 
-    for row in proc_hashes:
-        proc_hash = row["proc_hash"]
-        proc_definition = row["proc_definition"]
-        proc_db = row["source_db"] or ""
-        try:
-            mappings, error = extract_column_mappings_from_llm(proc_definition)
-            if error:
-                results.append({"proc_hash": proc_hash, "status": "error", "detail": error})
-                continue
-            for m in mappings:
-                m["target_db"] = proc_db
-            save_result = save_proc_mappings(proc_hash, mappings, db)
-            if isinstance(save_result, tuple) and save_result[1] != 200:
-                results.append({"proc_hash": proc_hash, "status": "error", "detail": save_result[0].get("error", "Save error")})
-            else:
-                results.append({"proc_hash": proc_hash, "status": "success", "detail": f"{len(mappings)} mappings saved."})
-        except Exception as ex:
-            results.append({"proc_hash": proc_hash, "status": "error", "detail": str(ex)})
 
+def analyze_and_save(db, rows: list[dict], workers: int = None) -> list[dict]:
+    """
+    Run the analysis pipeline over proc rows (proc_hash, proc_definition, source_db)
+    and return one {"proc_hash", "status", "detail"} result per proc.
+    """
+    # Unchanged procs are served from the extraction cache without an LLM call
+    cached = get_cached_mappings(db, [r["proc_hash"] for r in rows])
     db.commit()
-    return results
+
+    results = {}
+    mapping_counts = {}
+    events = run_analysis_pipeline(
+        rows,
+        lambda batch: save_analysis_batch(db, batch),
+        max_workers=workers,
+        cached=cached,
+    )
+    for event in events:
+        if event["event"] == "analyzed":
+            results[event["proc_hash"]] = {"proc_hash": event["proc_hash"], "status": event["status"], "detail": event["detail"]}
+            mapping_counts[event["proc_hash"]] = event["mapping_count"]
+            continue
+        for proc_hash in event["proc_hashes"]:
+            if event["status"] == "error":
+                results[proc_hash] = {"proc_hash": proc_hash, "status": "error", "detail": event["detail"]}
+            else:
+                results[proc_hash]["detail"] = f"{mapping_counts[proc_hash]} mappings saved."
+
+    evict_cache(db)
+    return list(results.values())
+
+
+# -------------------------------------------------------------
+# Background jobs: the long-running endpoints above accept background=true
+# -------------------------------------------------------------
+def _submit_job(db, job_type: str, params: dict = None) -> dict:
+    job_id = get_job_runner().submit(db, job_type, params)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@job_handler("populate")
+def _populate_job(ctx):
+    from .procs import run_full_lineage_population
+    report = run_full_lineage_population(ctx.db, ctx.params.get("analyze", True), ctx.params.get("reanalyze_all", False))
+    if report["status"] == "error":
+        # Stage failures come back in the report rather than raised
+        failed = [s for s in report["stages"] if s["status"] == "error"]
+        raise JobFailed(f"{len(failed)} stages failed; first error in {failed[0]['stage']}: {failed[0]['error']}", report)
+    return report
+
+
+@job_handler("export")
+def _export_job(ctx):
+    return export_lineage_snapshot(ctx.db, parquet=ctx.params.get("parquet"))
+
+
+@job_handler("load_silver_gold_tables")
+def _load_silver_gold_tables_job(ctx):
+    load_silver_gold_table_sources(ctx.db)
+    return {"detail": "Silver and gold tables loaded into aud.table_source."}
+
+
+@job_handler("discover")
+def _discover_job(ctx):
+    if not ctx.params.get("incremental"):
+        return {"discovered": len(discover_all_procs(ctx.db))}
+    if not ctx.params.get("analyze"):
+        return discover_procs_incremental(ctx.db)
+
+    # Discovery moves the watermark, so the procs it finds are registered as job items
+    # before the step is checkpointed; a resumed job goes straight to the analysis
+    report = {}
+    if ctx.add_items(["discover"]):
+        report = discover_procs_incremental(ctx.db)
+        ctx.add_items(p["proc_hash"] for p in report["added"] + report["changed"])
+        ctx.checkpoint({"discover": ("done", None)})
+    report["analysis"] = _analyze_job_items(ctx, ctx.item_keys("pending"))
+    return report
+
+
+@job_handler("analyze_all")
+def _analyze_all_job(ctx):
+    proc_hashes = ctx.db.execute(text("SELECT DISTINCT proc_hash FROM aud.proc_metadata")).scalars().all()
+    return _analyze_job_items(ctx, proc_hashes)
+
+
+def _analyze_job_items(ctx, proc_hashes: list[str]) -> dict:
+    """
+    analyze_and_save with one checkpointed job item per proc_hash: a proc is marked done
+    once its batch is committed, so a resumed job only analyzes what is left.
+    """
+    pending = ctx.add_items(proc_hashes)
+    rows = []
+    for start in range(0, len(pending), 1000):
+        rows.extend(dict(r) for r in ctx.db.execute(text("""
+            SELECT proc_hash, proc_definition, source_db
+            FROM aud.proc_metadata
+            WHERE proc_hash IN :proc_hashes
+        """).bindparams(bindparam("proc_hashes", expanding=True)), {"proc_hashes": pending[start:start + 1000]}).mappings())
+    rows = list({r["proc_hash"]: r for r in rows}.values())
+    cached = get_cached_mappings(ctx.db, [r["proc_hash"] for r in rows])
+    ctx.db.commit()
+
+    events = run_analysis_pipeline(
+        rows,
+        lambda batch: save_analysis_batch(ctx.db, batch),
+        max_workers=ctx.params.get("workers"),
+        cached=cached,
+    )
+    try:
+        for event in events:
+            if event["event"] == "analyzed":
+                # Successful procs are checkpointed when their batch is saved
+                if event["status"] == "error":
+                    ctx.checkpoint({event["proc_hash"]: ("error", event["detail"])})
+                continue
+            status = "error" if event["status"] == "error" else "done"
+            ctx.checkpoint({proc_hash: (status, event["detail"]) for proc_hash in event["proc_hashes"]})
+    finally:
+        # Stops outstanding LLM calls when the job is cancelled
+        events.close()
+    evict_cache(ctx.db)
+    return {"analyzed": len(rows), "skipped": len(proc_hashes) - len(pending)}
+
+
+@router.get("/jobs")
+def list_jobs(
+    db: Session = Depends(get_db),
+    status: str = Query(default=None, description="queued, running, succeeded, failed or cancelled"),
+    limit: int = Query(default=50, ge=1, le=500),
+):
+    return get_job_runner().list_jobs(db, status, limit)
+
+
+@router.post("/jobs/{job_type}")
+def submit_job(job_type: str, params: dict = Body(default={}), db: Session = Depends(get_db)):
+    if job_type not in job_types():
+        from fastapi import HTTPException
+        raise HTTPException(status_code=400, detail=f"Unknown job type; expected one of {', '.join(job_types())}")
+    return _submit_job(db, job_type, params)
+
+
+@router.get("/jobs/{job_id}")
+def get_job_status(
+    job_id: str,
+    items: bool = Query(default=False, description="Include per-item checkpoints"),
+    db: Session = Depends(get_db),
+):
+    job = get_job_runner().get(db, job_id, include_items=items)
+    if job is None:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, db: Session = Depends(get_db)):
+    if not get_job_runner().cancel(db, job_id):
+        from fastapi import HTTPException
+        raise HTTPException(status_code=409, detail="Job is not queued or running")
+    return {"job_id": job_id, "detail": "Cancel requested."}
+
+
+@router.post("/jobs/{job_id}/resume")
+def resume_job(job_id: str, db: Session = Depends(get_db)):
+    if not get_job_runner().resume(db, job_id):
+        from fastapi import HTTPException
+        raise HTTPException(status_code=409, detail="Only failed or cancelled jobs, or jobs with failed items, can be resumed")
+    return {"job_id": job_id, "status": "queued"}
+
+
+# -------------------------------------------------------------
+# In-memory lineage graph: nodes are 'db.schema.table' or 'db.schema.table.column'
+# -------------------------------------------------------------
+def _graph_node(node: str):
+    from fastapi import HTTPException
+    try:
+        return parse_node(node)
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+
+
+@router.get("/graph/upstream")
+def get_graph_upstream(
+    node: str = Query(..., description="db.schema.table or db.schema.table.column"),
+    max_depth: int = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+):
+    key = _graph_node(node)
+    return {"node": format_node(key), "upstream": get_lineage_graph(db).upstream(key, max_depth)}
+
+
+@router.get("/graph/downstream")
+def get_graph_downstream(
+    node: str = Query(..., description="db.schema.table or db.schema.table.column"),
+    max_depth: int = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+):
+    key = _graph_node(node)
+    return {"node": format_node(key), "downstream": get_lineage_graph(db).downstream(key, max_depth)}
+
+
+@router.get("/graph/path")
+def get_graph_path(
+    source: str = Query(..., description="db.schema.table or db.schema.table.column"),
+    target: str = Query(..., description="db.schema.table or db.schema.table.column"),
+    db: Session = Depends(get_db),
+):
+    found = get_lineage_graph(db).shortest_path(_graph_node(source), _graph_node(target))
+    if not found:
+        return {"path": [], "direction": None, "hops": None}
+    path, direction = found
+    return {"path": path, "direction": direction, "hops": len(path) - 1}
+
+
+@router.get("/graph/impact")
+def get_graph_impact(
+    node: str = Query(..., description="db.schema.table or db.schema.table.column"),
+    max_depth: int = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+):
+    return get_lineage_graph(db).impact(_graph_node(node), max_depth)
+
+
+# Precomputed downstream closure: what breaks when this table or column changes
+@router.get("/impact/{db_name}/{schema}/{table}")
+def get_table_impact(db_name: str, schema: str, table: str, db: Session = Depends(get_db)):
+    return get_lineage_graph(db).dependents(node_key(db_name, schema, table))
+
+
+@router.get("/impact/{db_name}/{schema}/{table}/{column}")
+def get_column_impact(db_name: str, schema: str, table: str, column: str, db: Session = Depends(get_db)):
+    return get_lineage_graph(db).dependents(node_key(db_name, schema, table, column))
+
+
+@router.get("/graph/stats")
+def get_graph_stats(db: Session = Depends(get_db)):
+    return get_lineage_graph(db).stats()
+
+
+@router.post("/graph/reload")
+def reload_graph(db: Session = Depends(get_db)):
+    return get_lineage_graph(db).load(db).stats()
+
+
+# -------------------------------------------------------------
+# INFORMATION_SCHEMA catalog snapshot
+# -------------------------------------------------------------
+@router.get("/catalog")
+def get_catalog_stats(db: Session = Depends(get_db)):
+    return get_catalog(db).stats()
+
+
+@router.post("/catalog/refresh")
+def refresh_catalog(db: Session = Depends(get_db)):
+    return load_catalog(db).stats()
+
+
+@router.get("/search")
+def search_names(
+    q: str = Query(..., min_length=1, description="Table or column name; layer prefixes like dat_/dim_ are ignored"),
+    kind: str = Query(default=None, pattern="^(table|column)$"),
+    layer: str = Query(default=None, description="stage, bronze, silver or gold"),
+    limit: int = Query(default=20, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    kinds = (kind,) if kind else ("table", "column")
+    return get_search_index(db).search(q, kinds=kinds, layers=[layer] if layer else None, limit=limit)
+
+
+@router.get("/pool")
+def get_connection_pool_status():
+    return get_pool_status()
+
+
+# -------------------------------------------------------------
+# Extraction cache maintenance
+# -------------------------------------------------------------
+@router.get("/cache/extraction")
+def get_extraction_cache_stats(db: Session = Depends(get_db)):
+    return cache_stats(db)
+
+
+@router.delete("/cache/extraction")
+def invalidate_extraction_cache(
+    db: Session = Depends(get_db),
+    proc_hash: str = Query(default=None, description="Only invalidate this procedure; omit to clear the whole cache"),
+):
+    removed = invalidate_cache(db, proc_hash)
+    return {"detail": f"{removed} cache entries removed."}
+
+
+@router.post("/cache/extraction/evict")
+def evict_extraction_cache(
+    db: Session = Depends(get_db),
+    max_entries: int = Query(default=None, ge=0, description="Defaults to EXTRACTION_CACHE_MAX_ENTRIES"),
+):
+    removed = evict_cache(db, max_entries)
+    return {"detail": f"{removed} cache entries evicted."}
 
 
 # -------------------------------------------------------------
 # New endpoint: Accepts a natural language question and returns a SQL query with reasoning and lineage highlights
 # -------------------------------------------------------------
-from app.services.lineage.agent import run_agent_query
 
 @router.post("/query/ai-sql")
 async def ai_sql_agent(
@@ -498,6 +819,43 @@ async def ai_sql_agent(
 ):
     """
     Accepts a natural language question and returns a SQL query with reasoning and lineage highlights.
+    The agent runs on its own bounded pool, so other requests keep being served meanwhile.
+    """
+    try:
+        response = await run_agent_query_async(question)
+    except asyncio.TimeoutError:
+        from fastapi import HTTPException
+        raise HTTPException(status_code=504, detail="Agent query timed out")
+    return response
+
+
+@router.post("/query/ai-sql/stream")
+async def ai_sql_agent_stream(
+    question: str = Body(..., embed=True),
+    format: str = Query(default="ndjson", pattern="^(ndjson|sse)$", description="ndjson lines or text/event-stream"),
+):
+    """
+    Same agent as /query/ai-sql, streamed: a start event right away, then tool_start,
+    tool_end and answer token events as they happen, and a final event with the answer.
     """
-    response = run_agent_query(question)
-    return response
\ No newline at end of file
+    from app.services.lineage.agent.streaming import stream_agent_events, to_ndjson, to_sse
+    encode = to_sse if format == "sse" else to_ndjson
+
+    async def body():
+        async for event in stream_agent_events(question):
+            yield encode(event)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    # Keep proxies from buffering the stream
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/query/ai-sql/cache")
+def get_agent_cache_stats():
+    return agent_cache_stats()
+
+
+@router.delete("/query/ai-sql/cache")
+def clear_agent_answer_cache():
+    clear_agent_cache()
+    return {"detail": "Agent answer and tool caches cleared."}
\ No newline at end of file
@@ -0,0 +1,168 @@
+# backend/app/services/lineage/search_index.py
+#
+# In-process fuzzy search over every table and column name in the catalog snapshot.
+# Names are normalized (layer prefixes like stage_/dat_/dim_/fact_ stripped, separators
+# removed) and indexed by trigram, so Customer, dat_customer and dim_customer resolve
+# to each other without LIKE scans over the lineage views.
+from array import array
+from collections import Counter
+from itertools import chain
+import re
+import threading
+
+from app.core.config import settings
+from app.services.lineage.catalog import get_catalog, read_catalog, read_catalog_version
+
+# Stripped repeatedly, so e.g. stage_dim_customer normalizes to customer
+NAME_PREFIXES = ("stage_", "stg_", "dat_", "dim_", "fact_", "fct_", "vw_")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case, strip brackets and known layer prefixes, drop separators."""
+    name = (name or "").strip().strip("[]").lower()
+    stripped = True
+    while stripped:
+        stripped = False
+        for prefix in NAME_PREFIXES:
+            if name.startswith(prefix) and len(name) > len(prefix):
+                name = name[len(prefix):]
+                stripped = True
+    return _NON_ALNUM.sub("", name)
+
+
+def trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Entries are (kind, layer, schema, table, column) tuples. Postings are kept per
+    distinct normalized name, so a name shared across layers is scored once.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._entries = []
+        self._names = []          # distinct normalized names
+        self._name_ids = {}       # normalized name -> name id
+        self._name_entries = []   # name id -> entry ids
+        self._postings = {}       # trigram -> array of name ids
+
+        for layer in ("stage", "bronze", "silver", "gold"):
+            for _, schema, table, _, columns in catalog.tables(layer):
+                self._add(("table", layer, schema, table, None), table)
+                for column in columns:
+                    self._add(("column", layer, schema, table, column[0]), column[0])
+
+    def _add(self, entry: tuple, name: str):
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        name_id = self._name_ids.get(normalized)
+        if name_id is None:
+            name_id = len(self._names)
+            self._name_ids[normalized] = name_id
+            self._names.append(normalized)
+            self._name_entries.append(array("i"))
+            for gram in trigrams(normalized):
+                self._postings.setdefault(gram, array("i")).append(name_id)
+        self._name_entries[name_id].append(len(self._entries))
+        self._entries.append(entry)
+
+    def _score_names(self, normalized: str, min_score: float) -> list[tuple]:
+        """(score, name id) for names similar to the query, using the Dice coefficient over trigrams."""
+        query_grams = trigrams(normalized)
+        common = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in query_grams))
+        # A substring match shares every inner trigram of the query, and a Dice score of
+        # min_score needs at least min_score * |query| / 2 shared trigrams; skip anything below both
+        floor = min(len(normalized) - 2, min_score * len(query_grams) / 2)
+        scored = []
+        for name_id, shared in common.items():
+            if shared < floor:
+                continue
+            name = self._names[name_id]
+            score = 2.0 * shared / (len(query_grams) + len(name) + 1)
+            if name == normalized:
+                score = 1.0
+            elif normalized in name:
+                # Substring matches are what the old LIKE '%kw%' lookups returned
+                score = max(score, 0.75)
+            if score >= min_score:
+                scored.append((score, name_id))
+        scored.sort(key=lambda item: (-item[0], self._names[item[1]]))
+        return scored
+
+    def search(self, query: str, kinds=("table", "column"), layers=None, limit: int = 20, min_score: float = 0.4) -> list[dict]:
+        """Ranked matches for query across tables and/or columns, best first."""
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        results = []
+        for score, name_id in self._score_names(normalized, min_score):
+            for entry_id in self._name_entries[name_id]:
+                kind, layer, schema, table, column = self._entries[entry_id]
+                if kind not in kinds or (layers and layer not in layers):
+                    continue
+                results.append({
+                    "kind": kind, "layer": layer, "schema": schema, "table": table,
+                    "column": column, "score": round(score, 3),
+                })
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def matching_names(self, query: str, kinds=("table", "column"), limit: int = 200, min_score: float = 0.4) -> dict:
+        """
+        Distinct table and column names matching query, as {"table": [...], "column": [...]}.
+        limit counts names rather than entries, so a column present in many tables
+        doesn't crowd out the other matches.
+        """
+        found = {"table": {}, "column": {}}
+        normalized = normalize_name(query)
+        scored = self._score_names(normalized, min_score) if normalized else []
+        count = 0
+        for _, name_id in scored:
+            for entry_id in self._name_entries[name_id]:
+                kind, _, _, table, column = self._entries[entry_id]
+                name = column if kind == "column" else table
+                if kind in kinds and name not in found[kind] and count < limit:
+                    found[kind][name] = None
+                    count += 1
+            if count >= limit:
+                break
+        return {kind: sorted(names) for kind, names in found.items()}
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "names": len(self._names), "trigrams": len(self._postings)}
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_search_index(db) -> NameIndex:
+    """
+    Index over the current catalog snapshot, rebuilt whenever the snapshot is reloaded.
+    With CATALOG_SNAPSHOT_ENABLED off there is no shared snapshot to follow, so the
+    index keeps its own catalog and re-reads it whenever the sys.objects version moves.
+    """
+    global _index
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        version = read_catalog_version(db)
+        index = _index
+        if index is None or index.catalog.version != version:
+            with _lock:
+                if _index is None or _index.catalog.version != version:
+                    _index = NameIndex(read_catalog(db, version))
+                index = _index
+        return index
+    catalog = get_catalog(db)
+    index = _index
+    if index is None or index.catalog is not catalog:
+        with _lock:
+            if _index is None or _index.catalog is not catalog:
+                _index = NameIndex(catalog)
+            index = _index
+    return index
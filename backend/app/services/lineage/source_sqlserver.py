@@ -1,27 +1,16 @@
-import os
-import pyodbc
 from typing import List, Tuple
-from dotenv import load_dotenv
 
-load_dotenv()
+from sqlalchemy import text
+
+from app.core.database import engine
 
-def get_sqlserver_connection():
-    conn_str = (
-        f"DRIVER={{ODBC Driver 18 for SQL Server}};"
-        f"SERVER={os.getenv('SQL_SERVER')};"
-        f"DATABASE={os.getenv('SQL_DB')};"
-        f"UID={os.getenv('SQL_USER')};"
-        f"PWD={os.getenv('SQL_PASSWORD')};"
-        f"TrustServerCertificate=yes;"
-    )
-    return pyodbc.connect(conn_str)
 
 def fetch_procedures(limit: int = 1) -> List[Tuple[str, str]]:
-    conn = get_sqlserver_connection()
-    cursor = conn.cursor()
-    cursor.execute(f"""
-        SELECT TOP ({limit}) OBJECT_NAME(object_id) as proc_name, definition
-        FROM sys.sql_modules
-        WHERE definition LIKE '%INTO%'
-    """)
-    return cursor.fetchall()
\ No newline at end of file
+    # Borrow a pooled connection instead of opening (and leaking) a raw ODBC one per call
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT TOP (:limit) OBJECT_NAME(object_id) as proc_name, definition
+            FROM sys.sql_modules
+            WHERE definition LIKE '%INTO%'
+        """), {"limit": limit}).fetchall()
+    return [tuple(row) for row in rows]
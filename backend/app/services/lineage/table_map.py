@@ -1,7 +1,7 @@
 # backend/app/services/lineage/table_map.py
 from fastapi import APIRouter
 from sqlalchemy import text
-from backend.app.core.database import engine
+from app.core.database import engine
 
 router = APIRouter()
 
@@ -9,5 +9,5 @@ router = APIRouter()
 def get_lineage_tables():
     with engine.connect() as conn:
         result = conn.execute(text("SELECT * FROM aud.vw_recursive_table_lineage"))
-        rows = [dict(row) for row in result]
+        rows = [dict(row._mapping) for row in result]
         return rows
\ No newline at end of file
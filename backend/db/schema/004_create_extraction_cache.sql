@@ -0,0 +1,36 @@
+DROP TABLE IF EXISTS [aud].[extraction_cache];
+GO
+
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+CREATE TABLE [aud].[extraction_cache](
+	[id] [int] IDENTITY(1,1) NOT NULL,
+	[proc_hash] [nvarchar](100) NOT NULL,
+	[prompt_version] [nvarchar](50) NOT NULL,
+	[model_deployment] [nvarchar](100) NOT NULL,
+	[mappings_json] [nvarchar](max) NOT NULL,
+	[hit_count] [int] NOT NULL,
+	[last_used_datetime] [datetime] NULL,
+	[record_insert_datetime] [datetime] NULL
+) ON [PRIMARY] TEXTIMAGE_ON [PRIMARY]
+GO
+ALTER TABLE [aud].[extraction_cache] ADD PRIMARY KEY CLUSTERED
+(
+	[id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[extraction_cache] ADD  DEFAULT ((0)) FOR [hit_count]
+GO
+ALTER TABLE [aud].[extraction_cache] ADD  DEFAULT (getdate()) FOR [last_used_datetime]
+GO
+ALTER TABLE [aud].[extraction_cache] ADD  DEFAULT (getdate()) FOR [record_insert_datetime]
+GO
+CREATE UNIQUE NONCLUSTERED INDEX [ux_extraction_cache_key] ON [aud].[extraction_cache]
+(
+	[proc_hash] ASC,
+	[prompt_version] ASC,
+	[model_deployment] ASC
+)
+GO
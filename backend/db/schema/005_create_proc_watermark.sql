@@ -0,0 +1,25 @@
+DROP TABLE IF EXISTS [aud].[proc_watermark];
+GO
+
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+CREATE TABLE [aud].[proc_watermark](
+	[source_db] [nvarchar](100) NOT NULL,
+	[object_id] [int] NOT NULL,
+	[source_schema] [nvarchar](100) NULL,
+	[proc_name] [nvarchar](300) NULL,
+	[modify_date] [datetime] NULL,
+	[proc_hash] [nvarchar](100) NULL,
+	[record_insert_datetime] [datetime] NULL
+) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[proc_watermark] ADD PRIMARY KEY CLUSTERED
+(
+	[source_db] ASC,
+	[object_id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[proc_watermark] ADD  DEFAULT (getdate()) FOR [record_insert_datetime]
+GO
@@ -0,0 +1,161 @@
+DROP TABLE IF EXISTS [aud].[flat_column_lineage];
+DROP TABLE IF EXISTS [aud].[flat_table_lineage];
+DROP TABLE IF EXISTS [aud].[flat_lineage_refresh];
+GO
+
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- Materialized copy of aud.vw_flat_table_lineage, refreshed per lineage_id by the backend
+CREATE TABLE [aud].[flat_table_lineage](
+	[id] [int] IDENTITY(1,1) NOT NULL,
+	[lineage_id] [int] NOT NULL,
+	[stage_db] [nvarchar](100) NOT NULL,
+	[stage_schema] [nvarchar](100) NOT NULL,
+	[stage_table] [nvarchar](100) NOT NULL,
+	[bronze_db] [nvarchar](100) NOT NULL,
+	[bronze_schema] [nvarchar](100) NOT NULL,
+	[bronze_table] [nvarchar](100) NOT NULL,
+	[silver_db] [nvarchar](100) NOT NULL,
+	[silver_schema] [nvarchar](100) NOT NULL,
+	[silver_table] [nvarchar](100) NOT NULL,
+	[gold_db] [nvarchar](100) NOT NULL,
+	[gold_schema] [nvarchar](100) NOT NULL,
+	[gold_table] [nvarchar](100) NOT NULL,
+	[record_insert_datetime] [datetime] NULL
+) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[flat_table_lineage] ADD PRIMARY KEY CLUSTERED
+(
+	[id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[flat_table_lineage] ADD  DEFAULT (getdate()) FOR [record_insert_datetime]
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_table_lineage_lineage_id] ON [aud].[flat_table_lineage]
+(
+	[lineage_id] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_table_lineage_stage] ON [aud].[flat_table_lineage]
+(
+	[stage_table] ASC,
+	[stage_schema] ASC,
+	[stage_db] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_table_lineage_bronze] ON [aud].[flat_table_lineage]
+(
+	[bronze_table] ASC,
+	[bronze_schema] ASC,
+	[bronze_db] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_table_lineage_silver] ON [aud].[flat_table_lineage]
+(
+	[silver_table] ASC,
+	[silver_schema] ASC,
+	[silver_db] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_table_lineage_gold] ON [aud].[flat_table_lineage]
+(
+	[gold_table] ASC,
+	[gold_schema] ASC,
+	[gold_db] ASC
+)
+GO
+
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- Materialized copy of aud.vw_flat_column_lineage, refreshed per bronze table by the backend
+CREATE TABLE [aud].[flat_column_lineage](
+	[id] [int] IDENTITY(1,1) NOT NULL,
+	[stage_db] [nvarchar](100) NOT NULL,
+	[stage_schema] [nvarchar](100) NOT NULL,
+	[stage_table] [nvarchar](100) NOT NULL,
+	[stage_column] [nvarchar](200) NOT NULL,
+	[bronze_db] [nvarchar](100) NOT NULL,
+	[bronze_schema] [nvarchar](100) NOT NULL,
+	[bronze_table] [nvarchar](100) NOT NULL,
+	[bronze_column] [nvarchar](200) NOT NULL,
+	[silver_db] [nvarchar](100) NOT NULL,
+	[silver_schema] [nvarchar](100) NOT NULL,
+	[silver_table] [nvarchar](100) NOT NULL,
+	[silver_column] [nvarchar](200) NOT NULL,
+	[silver_transform_expr] [nvarchar](max) NOT NULL,
+	[gold_db] [nvarchar](100) NOT NULL,
+	[gold_schema] [nvarchar](100) NOT NULL,
+	[gold_table] [nvarchar](100) NOT NULL,
+	[gold_column] [nvarchar](200) NOT NULL,
+	[gold_transform_expr] [nvarchar](max) NOT NULL,
+	[record_insert_datetime] [datetime] NULL
+) ON [PRIMARY] TEXTIMAGE_ON [PRIMARY]
+GO
+ALTER TABLE [aud].[flat_column_lineage] ADD PRIMARY KEY CLUSTERED
+(
+	[id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[flat_column_lineage] ADD  DEFAULT (getdate()) FOR [record_insert_datetime]
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_column_lineage_bronze_table] ON [aud].[flat_column_lineage]
+(
+	[bronze_db] ASC,
+	[bronze_schema] ASC,
+	[bronze_table] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_column_lineage_stage_column] ON [aud].[flat_column_lineage]
+(
+	[stage_column] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_column_lineage_bronze_column] ON [aud].[flat_column_lineage]
+(
+	[bronze_column] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_column_lineage_silver_column] ON [aud].[flat_column_lineage]
+(
+	[silver_column] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_column_lineage_gold_column] ON [aud].[flat_column_lineage]
+(
+	[gold_column] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_column_lineage_silver_table] ON [aud].[flat_column_lineage]
+(
+	[silver_db] ASC,
+	[silver_schema] ASC,
+	[silver_table] ASC
+)
+GO
+CREATE NONCLUSTERED INDEX [ix_flat_column_lineage_gold_table] ON [aud].[flat_column_lineage]
+(
+	[gold_db] ASC,
+	[gold_schema] ASC,
+	[gold_table] ASC
+)
+GO
+
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+CREATE TABLE [aud].[flat_lineage_refresh](
+	[name] [varchar](20) NOT NULL,
+	[last_rebuild_datetime] [datetime] NULL,
+	[last_refresh_datetime] [datetime] NULL
+) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[flat_lineage_refresh] ADD PRIMARY KEY CLUSTERED
+(
+	[name] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
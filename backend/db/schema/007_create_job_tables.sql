@@ -0,0 +1,65 @@
+DROP TABLE IF EXISTS [aud].[job_item];
+DROP TABLE IF EXISTS [aud].[job];
+GO
+
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- Background jobs run by app/services/lineage/jobs.py
+CREATE TABLE [aud].[job](
+	[job_id] [varchar](32) NOT NULL,
+	[job_type] [varchar](50) NOT NULL,
+	[status] [varchar](20) NOT NULL,
+	[params_json] [nvarchar](max) NULL,
+	[result_json] [nvarchar](max) NULL,
+	[error] [nvarchar](max) NULL,
+	[total_items] [int] NOT NULL,
+	[done_items] [int] NOT NULL,
+	[failed_items] [int] NOT NULL,
+	[cancel_requested] [bit] NOT NULL,
+	[created_datetime] [datetime] NULL,
+	[started_datetime] [datetime] NULL,
+	[heartbeat_datetime] [datetime] NULL,
+	[finished_datetime] [datetime] NULL
+) ON [PRIMARY] TEXTIMAGE_ON [PRIMARY]
+GO
+ALTER TABLE [aud].[job] ADD PRIMARY KEY CLUSTERED
+(
+	[job_id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
+ALTER TABLE [aud].[job] ADD  DEFAULT (0) FOR [total_items]
+GO
+ALTER TABLE [aud].[job] ADD  DEFAULT (0) FOR [done_items]
+GO
+ALTER TABLE [aud].[job] ADD  DEFAULT (0) FOR [failed_items]
+GO
+ALTER TABLE [aud].[job] ADD  DEFAULT (0) FOR [cancel_requested]
+GO
+CREATE NONCLUSTERED INDEX [ix_job_status] ON [aud].[job]
+(
+	[status] ASC,
+	[heartbeat_datetime] ASC
+)
+GO
+
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- One checkpoint row per unit of work (e.g. a proc_hash); resumed jobs skip finished items
+CREATE TABLE [aud].[job_item](
+	[job_id] [varchar](32) NOT NULL,
+	[item_key] [nvarchar](200) NOT NULL,
+	[status] [varchar](20) NOT NULL,
+	[detail] [nvarchar](max) NULL,
+	[updated_datetime] [datetime] NULL
+) ON [PRIMARY] TEXTIMAGE_ON [PRIMARY]
+GO
+ALTER TABLE [aud].[job_item] ADD PRIMARY KEY CLUSTERED
+(
+	[job_id] ASC,
+	[item_key] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, IGNORE_DUP_KEY = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
@@ -0,0 +1,21 @@
+-- One aud.column_map row per (table_source_id, dest_column, src_column). Earlier
+-- per-row saves inserted the same column mapping again on every re-save; keep the
+-- newest copy (it carries the latest transform_expr), then enforce the key the bulk
+-- MERGE upserts on.
+;WITH ranked AS (
+    SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY table_source_id, dest_column, src_column
+        ORDER BY id DESC
+    ) AS rn
+    FROM [aud].[column_map]
+)
+DELETE FROM ranked WHERE rn > 1;
+GO
+
+CREATE UNIQUE NONCLUSTERED INDEX [ux_column_map_source_columns] ON [aud].[column_map]
+(
+	[table_source_id] ASC,
+	[dest_column] ASC,
+	[src_column] ASC
+)
+GO
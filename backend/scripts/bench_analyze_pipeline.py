@@ -0,0 +1,78 @@
+# backend/scripts/bench_analyze_pipeline.py
+#
+# Runs the analyze-save-all pipeline against a fake LLM with injected latency and
+# rate limiting, so worker-count scaling can be measured without Azure OpenAI.
+#
+#   cd backend && python -m scripts.bench_analyze_pipeline --procs 200 --latency 0.2
+import argparse
+import json
+import random
+import threading
+import time
+
+from app.services.lineage.analyze import run_analysis_pipeline
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FakeLineageLLM:
+    """Stand-in for AzureChatOpenAI: sleeps, occasionally rate-limits, returns one mapping."""
+
+    def __init__(self, latency: float, rate_limit_ratio: float = 0.0):
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt: str):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency * (0.5 + random.random()))
+        if random.random() < self.rate_limit_ratio:
+            raise RateLimitError("429 Too Many Requests")
+        mapping = {
+            "source_db": "silver_db", "source_schema": "dbo", "source_table": "dat_customer",
+            "source_column": "CustomerID", "target_db": "", "target_schema": "dbo",
+            "target_table": "dim_customer", "target_column": "CustomerKey", "transform_expr": "",
+        }
+
+        class Result:
+            content = json.dumps([mapping])
+        return Result()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--procs", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="mean seconds per LLM call")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    settings.LLM_BACKOFF_SECONDS = 0.05
+
+    rows = [
+        {"proc_hash": f"hash{i}", "proc_definition": f"CREATE PROCEDURE p{i} AS SELECT 1", "source_db": "gold_db"}
+        for i in range(args.procs)
+    ]
+    for workers in args.workers:
+        llm = FakeLineageLLM(args.latency, args.rate_limit_ratio)
+        saved_batches = []
+        started = time.perf_counter()
+        errors = 0
+        for event in run_analysis_pipeline(rows, lambda batch: saved_batches.append(len(batch)), llm=llm, max_workers=workers):
+            if event["event"] == "analyzed" and event["status"] == "error":
+                errors += 1
+        elapsed = time.perf_counter() - started
+        print(
+            f"workers={workers:>3}  procs={args.procs}  elapsed={elapsed:6.2f}s  "
+            f"procs/s={args.procs / elapsed:7.1f}  llm_calls={llm.calls}  "
+            f"save_batches={len(saved_batches)}  errors={errors}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# backend/scripts/bench_match.py
+#
+# Speed and accuracy of the stage -> bronze matcher on a synthetic catalog: bronze
+# tables with stage counterparts renamed by prefix, suffix, casing or a dropped
+# character, plus unrelated stage tables as noise.
+#
+#   cd backend && python -m scripts.bench_match --tables 20000
+import argparse
+import random
+import time
+
+from app.services.lineage import matching
+
+WORDS = [
+    "customer", "address", "order", "invoice", "product", "supplier", "payment", "account",
+    "employee", "region", "store", "shipment", "contract", "ledger", "budget", "campaign",
+]
+COLUMNS = ["id", "name", "code", "status", "amount", "created_at", "updated_at", "type", "description", "date"]
+
+
+def generate_catalog(tables: int, noise: int, rng: random.Random):
+    """(bronze, stage, truth) where truth[i] is the stage index matching bronze table i."""
+    bronze, stage, truth = [], [], []
+    for i in range(tables):
+        words = rng.sample(WORDS, 2)
+        name = f"{words[0]}_{words[1]}_{i}"
+        columns = [f"{words[0]}_{c}" for c in rng.sample(COLUMNS, 6)] + [f"{words[1]}_key"]
+        bronze.append(("dbo", name, columns))
+        variant = rng.random()
+        if variant < 0.25:
+            stage_name = name
+        elif variant < 0.5:
+            stage_name = f"stg_{name}"
+        elif variant < 0.7:
+            stage_name = f"{name.upper()}_RAW"
+        elif variant < 0.85:
+            stage_name = name.replace("_", "")
+        else:
+            # Dropped character: only the fuzzy pass can find these
+            cut = rng.randrange(1, len(name) - 1)
+            stage_name = name[:cut] + name[cut + 1:]
+        stage_columns = [c.upper() if rng.random() < 0.3 else c for c in columns if rng.random() < 0.9]
+        truth.append(len(stage))
+        stage.append(("stg", stage_name, stage_columns))
+    for i in range(noise):
+        stage.append(("stg", f"{rng.choice(WORDS)}_extract_{i}", rng.sample(COLUMNS, 5)))
+    return bronze, stage, truth
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=20000, help="bronze tables")
+    parser.add_argument("--noise", type=int, default=5000, help="extra unrelated stage tables")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    bronze, stage, truth = generate_catalog(args.tables, args.noise, random.Random(args.seed))
+    print(f"{len(bronze)} bronze x {len(stage)} stage tables, numpy={'yes' if matching.numpy_available() else 'no'}")
+    started = time.perf_counter()
+    matches = matching.match_tables(bronze, stage)
+    elapsed = time.perf_counter() - started
+
+    best = {m["left"]: m for m in matches if m["rank"] == 1}
+    correct = sum(1 for i, j in enumerate(truth) if i in best and best[i]["right"] == j)
+    by_kind = {}
+    for m in best.values():
+        by_kind[m["match"]] = by_kind.get(m["match"], 0) + 1
+    print(
+        f"elapsed={elapsed * 1000:8.1f}ms  pairs kept={len(matches)}  matched={len(best)}/{len(bronze)}  "
+        f"top-1 correct={correct / len(bronze):.1%}  by kind={by_kind}"
+    )
+
+
+if __name__ == "__main__":
+    main()
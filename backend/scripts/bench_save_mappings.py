@@ -0,0 +1,156 @@
+# backend/scripts/bench_save_mappings.py
+#
+# Saves one synthetic wide proc's mappings with the old per-mapping loop and with the
+# bulk path (persist_proc_mappings), reporting time, SQL statements sent and the
+# column_map row count after repeated saves. Runs on an in-memory SQLite copy of the
+# aud tables by default; --url points it at a real database, where everything runs in
+# one transaction that is rolled back at the end.
+#
+#   cd backend && python -m scripts.bench_save_mappings --columns 300 --sources 4 --saves 3
+#   cd backend && python -m scripts.bench_save_mappings --url "mssql+pyodbc://..." --columns 300
+import argparse
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.services.lineage.persist import persist_proc_mappings
+
+SQLITE_DDL = [
+    "CREATE TABLE aud.proc_metadata (id INTEGER PRIMARY KEY, proc_name TEXT, proc_hash TEXT, proc_definition TEXT, "
+    "source_db TEXT, source_schema TEXT, source_table TEXT)",
+    "CREATE TABLE aud.table_map (id INTEGER PRIMARY KEY, proc_id INT, dest_db TEXT, dest_schema TEXT, dest_table TEXT)",
+    "CREATE TABLE aud.table_source (id INTEGER PRIMARY KEY, table_map_id INT, src_db TEXT, src_schema TEXT, "
+    "src_table TEXT, role TEXT, join_predicate TEXT)",
+    "CREATE TABLE aud.column_map (id INTEGER PRIMARY KEY, table_source_id INT, dest_column TEXT, src_column TEXT, "
+    "transform_expr TEXT)",
+]
+
+
+def make_engine(url: str = None):
+    if url:
+        return create_engine(url)
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def attach_aud(connection, record):
+        connection.execute("ATTACH DATABASE ':memory:' AS aud")
+
+    with engine.begin() as conn:
+        for ddl in SQLITE_DDL:
+            conn.execute(text(ddl))
+    return engine
+
+
+def generate_mappings(columns: int, sources: int) -> list[dict]:
+    """A gold table fed column by column from `sources` silver tables."""
+    return [
+        {
+            "source_db": "wh_silver",
+            "source_schema": "dbo",
+            "source_table": f"dat_source_{c % sources}",
+            "source_column": f"Col{c}",
+            "target_db": "",
+            "target_schema": "dbo",
+            "target_table": "fact_wide",
+            "target_column": f"Col{c}",
+            "transform_expr": f"UPPER(Col{c})" if c % 5 == 0 else "",
+        }
+        for c in range(columns)
+    ]
+
+
+def legacy_write_proc_mappings(db, proc_hash: str, mappings: list[dict]):
+    """The per-mapping loop persist_proc_mappings replaced, in portable SQL (same round trips)."""
+    proc = db.execute(text("SELECT id, source_db FROM aud.proc_metadata WHERE proc_hash = :hash"), {"hash": proc_hash}).fetchone()
+    for m in mappings:
+        m["target_db"] = proc.source_db or ""
+        table_map_params = {"proc_id": proc.id, "dest_db": m["target_db"], "dest_schema": m["target_schema"], "dest_table": m["target_table"]}
+        table_map_sql = text("""
+            SELECT id FROM aud.table_map
+            WHERE proc_id = :proc_id AND dest_db = :dest_db AND dest_schema = :dest_schema AND dest_table = :dest_table
+        """)
+        table_map = db.execute(table_map_sql, table_map_params).fetchone()
+        if not table_map:
+            db.execute(text("""
+                INSERT INTO aud.table_map (proc_id, dest_db, dest_schema, dest_table)
+                VALUES (:proc_id, :dest_db, :dest_schema, :dest_table)
+            """), table_map_params)
+            table_map = db.execute(table_map_sql, table_map_params).fetchone()
+        source_params = {"table_map_id": table_map.id, "src_db": m["source_db"], "src_schema": m["source_schema"], "src_table": m["source_table"]}
+        exists = db.execute(text("""
+            SELECT 1 FROM aud.table_source
+            WHERE table_map_id = :table_map_id AND src_db = :src_db AND src_schema = :src_schema
+              AND src_table = :src_table AND role = 'source'
+        """), source_params).fetchone()
+        if not exists:
+            db.execute(text("""
+                INSERT INTO aud.table_source (table_map_id, src_db, src_schema, src_table, role)
+                VALUES (:table_map_id, :src_db, :src_schema, :src_table, 'source')
+            """), source_params)
+        db.execute(text("""
+            INSERT INTO aud.column_map (table_source_id, dest_column, src_column, transform_expr)
+            SELECT ts.id, :dest_column, :src_column, :transform_expr
+            FROM aud.table_source ts
+            WHERE ts.table_map_id = :table_map_id AND ts.src_db = :src_db AND ts.src_schema = :src_schema
+              AND ts.src_table = :src_table AND ts.role = 'source'
+        """), {**source_params, "dest_column": m["target_column"], "src_column": m["source_column"], "transform_expr": m["transform_expr"]})
+
+
+def run(engine, label: str, write, mappings: list[dict], saves: int):
+    statements = 0
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    db = Session(engine)
+    try:
+        proc_hash = f"bench_{label}"
+        db.execute(text("""
+            INSERT INTO aud.proc_metadata (proc_name, proc_hash, proc_definition, source_db)
+            VALUES (:name, :hash, '', 'wh_gold')
+        """), {"name": f"dbo.usp_bench_{label}", "hash": proc_hash})
+        statements = 0
+        times = []
+        for _ in range(saves):
+            started = time.perf_counter()
+            write(db, proc_hash, [dict(m) for m in mappings])
+            db.flush()
+            times.append(time.perf_counter() - started)
+        save_statements = statements
+        rows = db.execute(text("""
+            SELECT COUNT(*) FROM aud.column_map cm
+            JOIN aud.table_source ts ON ts.id = cm.table_source_id
+            JOIN aud.table_map tm ON tm.id = ts.table_map_id
+            JOIN aud.proc_metadata p ON p.id = tm.proc_id
+            WHERE p.proc_hash = :hash
+        """), {"hash": proc_hash}).scalar()
+        print(
+            f"{label:<7} first save={times[0] * 1000:8.1f}ms  re-save={sum(times[1:]) / max(len(times) - 1, 1) * 1000:8.1f}ms  "
+            f"statements/save={save_statements / saves:7.1f}  column_map rows after {saves} saves={rows}"
+        )
+    finally:
+        db.rollback()
+        db.close()
+        event.remove(engine, "before_cursor_execute", count)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="SQLAlchemy URL; default is in-memory SQLite")
+    parser.add_argument("--columns", type=int, default=300)
+    parser.add_argument("--sources", type=int, default=4, help="source tables feeding the target")
+    parser.add_argument("--saves", type=int, default=3, help="times the same mappings are saved")
+    args = parser.parse_args()
+
+    engine = make_engine(args.url)
+    mappings = generate_mappings(args.columns, args.sources)
+    print(f"{args.columns} mappings from {args.sources} source tables, saved {args.saves} times")
+    run(engine, "legacy", legacy_write_proc_mappings, mappings, args.saves)
+    run(engine, "bulk", lambda db, proc_hash, m: persist_proc_mappings(db, {proc_hash: m}), mappings, args.saves)
+
+
+if __name__ == "__main__":
+    main()
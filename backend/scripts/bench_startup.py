@@ -0,0 +1,74 @@
+# backend/scripts/bench_startup.py
+#
+# Cold-start time of `import app.main`, measured in fresh interpreters, plus which heavy
+# libraries the import drags in. --ref also measures another git revision (checked out
+# into a temporary worktree), for a before/after comparison.
+#
+#   cd backend && python -m scripts.bench_startup --runs 10
+#   cd backend && AZURE_OPENAI_KEY=x AZURE_OPENAI_ENDPOINT=https://x python -m scripts.bench_startup --runs 10 --ref HEAD~1
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ["langchain", "langchain_core", "langchain_openai", "openai", "sqlglot"]
+
+PROBE = f"""
+import sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(elapsed, ",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+"""
+
+
+def time_import(backend_dir: str, runs: int) -> tuple[list[float], str]:
+    """Seconds per cold import over runs fresh interpreters, and the heavy modules loaded."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [backend_dir, os.environ.get("PYTHONPATH")])))
+    times = []
+    loaded = ""
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", PROBE], cwd=backend_dir, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import app.main failed in {backend_dir}:\n{proc.stderr.strip().splitlines()[-1]}")
+        seconds, _, loaded = proc.stdout.strip().splitlines()[-1].partition(" ")
+        times.append(float(seconds))
+    return times, loaded
+
+
+def report(label: str, times: list[float], loaded: str):
+    print(
+        f"{label:<12} runs={len(times):<3} median={statistics.median(times) * 1000:8.1f}ms  "
+        f"min={min(times) * 1000:8.1f}ms  max={max(times) * 1000:8.1f}ms  heavy imports: {loaded or 'none'}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", default=None, help="git revision to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if args.ref:
+        repo_dir = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"], cwd=backend_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        with tempfile.TemporaryDirectory() as tmp:
+            worktree = os.path.join(tmp, "ref")
+            subprocess.run(["git", "worktree", "add", "--detach", worktree, args.ref], cwd=repo_dir, capture_output=True, check=True)
+            try:
+                ref_backend = os.path.join(worktree, os.path.relpath(backend_dir, repo_dir))
+                report(args.ref, *time_import(ref_backend, args.runs))
+            except RuntimeError as ex:
+                # Revisions that build the agent at import time need the Azure settings to start at all
+                print(f"{args.ref:<12} {ex}")
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=repo_dir, capture_output=True)
+    report("current", *time_import(backend_dir, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# backend/scripts/load_test_routes.py
+#
+# Fires concurrent /lineage/query/ai-sql requests and, while they are in flight, keeps
+# probing a cheap route to check it is still answered promptly instead of queueing
+# behind the agent. With --fake-agent-latency the app is started in-process with the
+# agent replaced by a sleep, so neither Azure OpenAI nor SQL Server is needed.
+#
+#   cd backend && python -m scripts.load_test_routes --fake-agent-latency 2 --agent-requests 8
+#   cd backend && python -m scripts.load_test_routes --url http://localhost:8000 --question "Where does CustomerKey come from?"
+import argparse
+import importlib
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def timed_request(url: str, body: dict = None) -> tuple[float, int]:
+    """(seconds, HTTP status) for one request; POSTs JSON when body is given."""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as ex:
+        status = ex.code
+    return time.perf_counter() - started, status
+
+
+def start_fake_server(port: int, latency: float):
+    import uvicorn
+
+    agent_module = importlib.import_module("app.services.lineage.agent.agent")
+
+    class FakeAgentExecutor:
+        def run(self, question: str, callbacks=None):
+            time.sleep(latency)
+            return f"fake answer to {question!r}"
+
+    agent_module.agent_executor = FakeAgentExecutor()
+
+    from app.main import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="running server; default starts one in-process with a fake agent")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fake-agent-latency", type=float, default=2.0, help="seconds per fake agent call")
+    parser.add_argument("--agent-requests", type=int, default=8)
+    parser.add_argument("--question", default="Which silver tables feed gold_db.dbo.dim_customer?")
+    parser.add_argument("--probe", default="/lineage/pool", help="cheap route probed while agent calls run")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    from app.core.config import settings
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = start_fake_server(args.port, args.fake_agent_latency)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    agent_url = f"{base_url}/lineage/query/ai-sql"
+    probe_url = f"{base_url}{args.probe}"
+    probes = []
+    done = threading.Event()
+
+    def probe_loop():
+        while not done.is_set():
+            probes.append(timed_request(probe_url)[0])
+            time.sleep(args.probe_interval)
+
+    prober = threading.Thread(target=probe_loop)
+    started = time.perf_counter()
+    prober.start()
+    with ThreadPoolExecutor(max_workers=args.agent_requests) as pool:
+        agent_results = list(pool.map(
+            # Distinct questions, so the answer cache doesn't short-circuit the agent
+            lambda i: timed_request(agent_url, {"question": f"{args.question} (#{i})"}), range(args.agent_requests)
+        ))
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    agent_times = [seconds for seconds, _ in agent_results]
+    statuses = sorted({status for _, status in agent_results})
+    print(
+        f"agent: requests={args.agent_requests}  workers={settings.AGENT_MAX_WORKERS}  elapsed={elapsed:6.2f}s  "
+        f"mean={statistics.mean(agent_times):6.2f}s  max={max(agent_times):6.2f}s  statuses={statuses}"
+    )
+    if probes:
+        print(
+            f"probe {args.probe}: requests={len(probes)}  p50={percentile(probes, 0.5) * 1000:7.1f}ms  "
+            f"p95={percentile(probes, 0.95) * 1000:7.1f}ms  max={max(probes) * 1000:7.1f}ms"
+        )
+    if server is not None:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# backend/tests/test_analyze.py
+#
+#   cd backend && python -m pytest tests
+from app.core.config import settings
+from app.services.lineage.analyze import analyze_procedures, parse_mappings_response
+
+PROC = """
+CREATE PROCEDURE dbo.usp_load_customer
+AS
+INSERT INTO dbo.dim_customer (CustomerID) SELECT CustomerID FROM wh_silver.dbo.dat_customer;
+"""
+
+
+class FakeLLM:
+    """Stands in for the Azure client: invoke(prompt) returns a canned response."""
+
+    def __init__(self, response: str):
+        self.response = response
+
+    def invoke(self, prompt: str):
+        return self.response
+
+
+def test_parse_mappings_response_rejects_non_objects():
+    mappings, error = parse_mappings_response('["a", 1]')
+    assert mappings is None
+    assert error
+
+
+def test_analyze_procedures_reports_bad_items_as_proc_errors(monkeypatch):
+    monkeypatch.setattr(settings, "PARSER_FAST_PATH_ENABLED", False)
+    rows = [
+        {"proc_hash": "bad", "proc_definition": PROC, "source_db": "wh_gold"},
+        {"proc_hash": "also_bad", "proc_definition": PROC, "source_db": "wh_gold"},
+    ]
+    results = {r["proc_hash"]: r for r in analyze_procedures(rows, llm=FakeLLM('["a", 1]'), max_workers=2)}
+    assert set(results) == {"bad", "also_bad"}
+    assert all(r["status"] == "error" and r["mappings"] is None for r in results.values())
+
+
+def test_analyze_procedures_sets_target_db(monkeypatch):
+    monkeypatch.setattr(settings, "PARSER_FAST_PATH_ENABLED", False)
+    mapping = (
+        '[{"source_db": "wh_silver", "source_schema": "dbo", "source_table": "dat_customer", '
+        '"source_column": "CustomerID", "target_db": "", "target_schema": "dbo", '
+        '"target_table": "dim_customer", "target_column": "CustomerID", "transform_expr": ""}]'
+    )
+    rows = [{"proc_hash": "good", "proc_definition": PROC, "source_db": "wh_gold"}]
+    [result] = analyze_procedures(rows, llm=FakeLLM(mapping))
+    assert result["status"] == "success"
+    assert result["mappings"][0]["target_db"] == "wh_gold"
@@ -0,0 +1,78 @@
+# backend/tests/test_bulk.py
+#
+# bulk_upsert's dialect-neutral path (INSERT ... WHERE NOT EXISTS) on SQLite.
+#
+#   cd backend && python -m pytest tests
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.services.lineage.bulk import bulk_upsert_column_map, bulk_upsert_table_map, counts
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/main.db")
+
+    @event.listens_for(engine, "connect")
+    def attach(connection, record):
+        connection.execute(f"ATTACH DATABASE '{tmp_path}/aud.db' AS aud")
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE aud.table_map (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, proc_id INTEGER,
+                dest_db TEXT, dest_schema TEXT, dest_table TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE aud.column_map (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, table_source_id INTEGER,
+                dest_column TEXT, src_column TEXT, transform_expr TEXT
+            )
+        """))
+    with Session(engine) as session:
+        yield session
+
+
+def _table(name: str, proc_id=None) -> dict:
+    return {"proc_id": proc_id, "dest_db": "wh_bronze", "dest_schema": "dbo", "dest_table": name}
+
+
+def test_insert_then_matched_and_idempotent(db):
+    rows = [_table("customer"), _table("orders"), _table("customer")]
+    first = bulk_upsert_table_map(db, rows)
+    assert counts(first) == {"inserted": 2, "matched": 0, "updated": 0}
+
+    again = bulk_upsert_table_map(db, rows + [_table("product")])
+    assert counts(again) == {"inserted": 1, "matched": 2, "updated": 0}
+    assert again["ids"][("wh_bronze", "dbo", "customer")] == first["ids"][("wh_bronze", "dbo", "customer")]
+    assert db.execute(text("SELECT COUNT(*) FROM aud.table_map")).scalar() == 3
+
+
+def test_ids_match_null_keys(db):
+    rows = [_table("customer"), _table("customer", proc_id=7)]
+    result = bulk_upsert_table_map(db, rows, with_proc_id=True)
+    assert counts(result)["inserted"] == 2
+    ids = result["ids"]
+    assert set(ids) == {(None, "wh_bronze", "dbo", "customer"), (7, "wh_bronze", "dbo", "customer")}
+    assert len(set(ids.values())) == 2
+
+    # The NULL proc_id row matches itself instead of being inserted again
+    again = bulk_upsert_table_map(db, rows, with_proc_id=True)
+    assert counts(again) == {"inserted": 0, "matched": 2, "updated": 0}
+    assert again["ids"] == ids
+
+
+def test_update_columns_refresh_changed_rows_only(db):
+    bulk_upsert_column_map(db, [
+        {"table_source_id": 1, "dest_column": "Name", "src_column": "name", "transform_expr": ""},
+        {"table_source_id": 1, "dest_column": "Id", "src_column": "id", "transform_expr": ""},
+    ])
+    result = bulk_upsert_column_map(db, [
+        {"table_source_id": 1, "dest_column": "Name", "src_column": "name", "transform_expr": "UPPER(name)"},
+        {"table_source_id": 1, "dest_column": "Id", "src_column": "id", "transform_expr": ""},
+    ])
+    assert counts(result) == {"inserted": 0, "matched": 2, "updated": 1}
+    transforms = dict(db.execute(text("SELECT dest_column, transform_expr FROM aud.column_map")).fetchall())
+    assert transforms == {"Name": "UPPER(name)", "Id": ""}
@@ -0,0 +1,43 @@
+# backend/tests/test_parse.py
+#
+#   cd backend && python -m pytest tests
+from app.services.lineage.parse import extract_column_mappings_from_sql
+
+
+def _pairs(mappings):
+    return {
+        (m["source_table"], m["source_column"], m["target_table"], m["target_column"], m["transform_expr"])
+        for m in mappings
+    }
+
+
+def test_insert_select_resolves_aliases_and_transforms():
+    mappings, unresolved = extract_column_mappings_from_sql("""
+        CREATE PROCEDURE dbo.usp_load_customer
+        AS
+        INSERT INTO dbo.dim_customer (CustomerID, FullName)
+        SELECT c.CustomerID, UPPER(c.Name)
+        FROM wh_silver.dbo.dat_customer c;
+    """, "wh_gold")
+    assert unresolved == []
+    assert _pairs(mappings) == {
+        ("dat_customer", "CustomerID", "dim_customer", "CustomerID", ""),
+        ("dat_customer", "Name", "dim_customer", "FullName", "UPPER(c.Name)"),
+    }
+    assert {(m["source_db"], m["target_db"]) for m in mappings} == {("wh_silver", "wh_gold")}
+
+
+def test_merge_resolves_update_and_insert_branches():
+    mappings, unresolved = extract_column_mappings_from_sql("""
+        CREATE PROCEDURE dbo.usp_merge_product
+        AS
+        MERGE dbo.dim_product AS t
+        USING wh_silver.dbo.dat_product AS s ON t.ProductID = s.ProductID
+        WHEN MATCHED THEN UPDATE SET t.Name = s.Name
+        WHEN NOT MATCHED THEN INSERT (ProductID, Name) VALUES (s.ProductID, s.Name);
+    """, "wh_gold")
+    assert unresolved == []
+    assert _pairs(mappings) == {
+        ("dat_product", "ProductID", "dim_product", "ProductID", ""),
+        ("dat_product", "Name", "dim_product", "Name", ""),
+    }